@@ -20,14 +20,18 @@ import pyrax
 import signal
 import sys
 
+import context
 import version
 from account import Account
+from daemon import CommandLines, Daemon
 from db import DB
 from configuration import Configuration
 from globals import CONFIG_FILE, HOME_DIR, VERSION_FILE  # @UnusedImport
+from httppool import HTTPPool
 from log import start_logging
 from notifier import Notifier
 from pyraxshell import Cmd_Pyraxshell
+from ratelimit import RateLimiter
 from sessions import Sessions
 from utility import check_dir_home, terminate_threads
 
@@ -89,23 +93,46 @@ def main():
     if cfg.pyrax_no_verify_ssl == True:
         # see: https://github.com/rackspace/pyrax/issues/187
         pyrax.set_setting("verify_ssl", False)
+    # pyrax identity and clients in the session context
+    context.install()
+    # API requests over shared keep-alive connections
+    if cfg.pyrax_http_pool_size != None:
+        HTTPPool.Instance().size = cfg.pyrax_http_pool_size  # @UndefinedVariable
+    # API requests within the account rate limits
+    RateLimiter.Instance().install()  # @UndefinedVariable
     # start notifier
     Notifier().start()
     # main loop
-    Cmd_Pyraxshell().cmdloop()
+    if cfg.daemon:
+        Daemon(Cmd_Pyraxshell()).serve()
+        terminate_threads()
+    elif cfg.interactive:
+        Cmd_Pyraxshell().cmdloop()
+    else:
+        # piped commands, the exit status is the number of the first one
+        # which failed (as 'pyraxcli')
+        commands = CommandLines(sys.stdin)
+        sys.stdin = commands
+        try:
+            Cmd_Pyraxshell().cmdloop()
+        except SystemExit as e:
+            if e.code:
+                raise
+        commands.finish()
+        sys.exit(commands.exit_status())
 
 
 def signal_handler(signal, frame):
     '''
-    handle signals (i.e.: SIGINT, SIGTERM), and stop threads 
+    handle signals (i.e.: SIGTERM), and stop threads 
     '''
     terminate_threads()
     sys.exit(0)
 
 
 if __name__ == '__main__':
-    # register SIGINT and SIGTERM handler
-    signal.signal(signal.SIGINT, signal_handler)
+    # register SIGTERM handler, SIGINT (CTRL-C) cancels the foreground
+    # command (see 'Plugin.onecmd')
     signal.signal(signal.SIGTERM, signal_handler)
     
     main()
@@ -19,10 +19,10 @@ import os.path
 
 from baseconfigfile import BaseConfigFile
 from globals import ACCOUNTS_FILE
-from singleton import Singleton
+from singleton import SessionSingleton
 
 
-@Singleton
+@SessionSingleton
 class Account(BaseConfigFile):
     '''
     Account manager
@@ -34,6 +34,7 @@ class Account(BaseConfigFile):
         Constructor
         '''
         self._file = ACCOUNTS_FILE
+        self._mtime = None
         BaseConfigFile.__init__(self, self._file)
     
     # ########################################
@@ -61,3 +62,17 @@ class Account(BaseConfigFile):
                 f.flush()
         else:
             self.logger.debug('found default config file \'%s\'' % self._file)
+    
+    def parse_config_file(self):
+        '''
+        parse configuration file, and remember its modification time
+        '''
+        BaseConfigFile.parse_config_file(self)
+        self._mtime = os.path.getmtime(self._file)
+    
+    def refresh(self):
+        '''
+        parse configuration file again only if it has been modified
+        '''
+        if os.path.getmtime(self._file) != self._mtime:
+            self.parse_config_file()
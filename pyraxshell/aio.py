@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import Queue
+import threading
+import time
+import traceback
+
+from globals import AIO_CONCURRENCY
+from jobs import Job, JobCancelled, JobManager
+from workerpool import WorkerPool
+
+# Libpyraxshell method --> service, whose calls share a bounded pool
+METHODS = {}
+for service, names in (
+    ('auth', ('authenticate', 'list_accounts', 'login', 'switch_account')),
+    ('databases', ('create_db_instance', 'get_db_instance', 'list_databases',
+                   'list_db_flavors', 'list_db_instances')),
+    ('dns', ('create_domain', 'delete_domain', 'delete_records', 'get_domain',
+             'import_records', 'list_domains', 'list_records',
+             'update_records')),
+    ('loadbalancers', ('get_loadbalancer', 'list_algorithms',
+                       'list_loadbalancers', 'list_nodes', 'list_protocols')),
+    ('servers', ('create_server', 'create_servers', 'delete_server',
+                 'get_server', 'list_flavors', 'list_images',
+                 'list_servers'))):
+    for name in names:
+        METHODS[name] = service
+
+
+class Call(Job):
+    '''
+    asynchronous call of AsyncLibpyraxshell, a future of its result
+    
+    Cancelling a call which has not started finishes it at once, a running
+    one is cancelled cooperatively, its WorkerPool tasks included (i.e.:
+    bulk DNS batches stop submitting requests). 'create_servers' returns as
+    soon as requests are queued: cancel its ServerBuildJob to stop them.
+    '''
+    
+    def __init__(self, name):
+        Job.__init__(self, None, name)
+        self._callbacks = []
+        self._started = False
+        self._lock = threading.Lock()
+    
+    def add_done_callback(self, fn):
+        '''
+        call fn(call) once the call is finished, now if it already is
+        '''
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+    
+    def cancel(self):
+        with self._lock:
+            Job.cancel(self)
+            queued = not self._started
+        if queued:
+            self.finish('cancelled')
+    
+    def finish(self, status='done', result=None, exc_info=None):
+        with self._lock:
+            Job.finish(self, status, result, exc_info)
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except:
+                logging.debug(traceback.format_exc())
+    
+    def get(self, timeout=None):
+        '''
+        wait for the call, return its result or raise its exception
+        
+        @raise JobCancelled    if it was cancelled
+        @raise Queue.Empty     if it is not finished in 'timeout' seconds
+        '''
+        if not self.wait(timeout):
+            raise Queue.Empty('%s: not finished' % self.name)
+        if self.status == 'cancelled':
+            raise JobCancelled(self.name)
+        if self.exc_info != None:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+        return self.result
+    
+    def start(self):
+        '''
+        mark the call as running, return False if it was cancelled
+        '''
+        with self._lock:
+            if self.cancelled():
+                return False
+            self._started = True
+            return True
+
+
+class AsyncLibpyraxshell(object):
+    '''
+    asynchronous pyraxshell library
+    
+    Every method of Libpyraxshell listed in METHODS returns a Call at once,
+    the blocking call runs in the bounded pool of its service (see
+    AIO_CONCURRENCY), i.e.:
+    
+        aio = Libpyraxshell().aio
+        calls = [aio.delete_server(s['id']) for s in servers]
+        results = gather(calls)
+    
+    'semaphores' bounds calls across services, i.e.: {'dns': sem}, where
+    'sem' is a threading.BoundedSemaphore shared with other callers.
+    '''
+    
+    def __init__(self, lib, concurrency=None, semaphores=None):
+        '''
+        Constructor
+        
+        lib            Libpyraxshell making the calls
+        concurrency    {service: concurrent calls} (default: AIO_CONCURRENCY)
+        '''
+        self.lib = lib
+        self.concurrency = dict(AIO_CONCURRENCY)
+        self.concurrency.update(concurrency or {})
+        self.semaphores = semaphores or {}
+        self._calls = set()
+        self._pools = {}
+        self._lock = threading.Lock()
+    
+    def __getattr__(self, name):
+        if name not in METHODS:
+            raise AttributeError(name)
+        fn = getattr(self.lib, name)
+        def call(*args, **kwargs):
+            return self.submit(METHODS[name], name, fn, *args, **kwargs)
+        call.__name__ = name
+        call.__doc__ = fn.__doc__
+        return call
+    
+    def cancel_all(self):
+        '''
+        cancel every call not finished yet
+        '''
+        with self._lock:
+            calls = list(self._calls)
+        for c in calls:
+            c.cancel()
+    
+    def close(self, wait=True):
+        '''
+        stop the pools once submitted calls are finished
+        '''
+        with self._lock:
+            pools, self._pools = self._pools.values(), {}
+        for pool in pools:
+            pool.shutdown(wait)
+    
+    def submit(self, service, name, fn, *args, **kwargs):
+        '''
+        run fn(*args, **kwargs) in the pool of 'service', return its Call
+        '''
+        c = Call(name)
+        with self._lock:
+            if service not in self._pools:
+                self._pools[service] = WorkerPool(
+                        self.concurrency.get(service, 1), 'aio-%s' % service)
+            self._calls.add(c)
+            pool = self._pools[service]
+        c.add_done_callback(self._forget)
+        pool.submit(self._run, c, service, fn, args, kwargs)
+        return c
+    
+    def _forget(self, c):
+        with self._lock:
+            self._calls.discard(c)
+    
+    def _run(self, c, service, fn, args, kwargs):
+        # cancelled while queued
+        if c.done():
+            return
+        semaphore = self.semaphores.get(service)
+        if semaphore != None:
+            semaphore.acquire()
+        try:
+            if not c.start():
+                c.finish('cancelled')
+                return
+            JobManager.Instance().run(c, fn, *args, **kwargs)  # @UndefinedVariable
+        finally:
+            if semaphore != None:
+                semaphore.release()
+
+
+def as_completed(calls, timeout=None):
+    '''
+    yield 'calls' as they finish
+    
+    @raise Queue.Empty    if they are not all finished in 'timeout' seconds
+                          (for all of them, not per call)
+    '''
+    finished = Queue.Queue()
+    for c in calls:
+        c.add_done_callback(finished.put)
+    deadline = None if timeout == None else time.time() + timeout
+    for _ in range(len(calls)):
+        # a blocking get without timeout cannot be interrupted by CTRL-C
+        left = 1e9 if deadline == None else deadline - time.time()
+        if left <= 0:
+            raise Queue.Empty('calls not finished')
+        yield finished.get(True, left)
+
+
+def gather(calls, timeout=None, return_exceptions=False):
+    '''
+    wait for 'calls', return their results in order
+    
+    timeout              seconds to wait for all of them, not per call
+    return_exceptions    return exceptions as results instead of raising the
+                         first one
+    '''
+    deadline = None if timeout == None else time.time() + timeout
+    results = []
+    for c in calls:
+        try:
+            results.append(c.get(None if deadline == None else
+                                 max(deadline - time.time(), 0)))
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            results.append(e)
+    return results
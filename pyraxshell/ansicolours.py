@@ -5,10 +5,10 @@ Created on 20 Oct 2013
 '''
 import logging
 
-from singleton import Singleton
+from singleton import SessionSingleton
 
 
-@Singleton
+@SessionSingleton
 class ANSIColours(object):
     '''
     ANSI colours facility
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import traceback
+
+from globals import AUTH_EXPIRY_MARGIN, AUTH_FILE
+
+# format of persisted expiry dates, as 'pyrax.identity.expires' (local time)
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+_lock = threading.Lock()
+
+
+def _encode(obj):
+    '''
+    return 'obj' loaded from JSON with unicode strings encoded as 'str', as
+    expected by pyrax and httplib2
+    '''
+    if isinstance(obj, dict):
+        return dict((_encode(k), _encode(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return [_encode(o) for o in obj]
+    if isinstance(obj, unicode):
+        return obj.encode('utf-8')
+    return obj
+
+
+def digest(value):
+    '''
+    return a short digest of credentials 'value' (i.e.: api-key, content of
+    a credentials file) to be used in keys
+    '''
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return hashlib.sha256(value or '').hexdigest()[:16]
+
+
+class AuthStore(object):
+    '''
+    authentication tokens persisted across pyraxshell launches
+    
+    Every entry holds the token, its expiry and the service catalog of an
+    identity, keyed by how it was obtained (i.e.:
+    'login:rackspace:username:LON:<digest>'), so that a later launch can
+    connect to the services without calling the identity endpoint. Keys hold
+    a digest of the credentials (see 'digest'), changed credentials do not
+    match a stored token. The file is readable and writable by its owner
+    only; passwords and api-keys are never stored.
+    '''
+    
+    def __init__(self, path=AUTH_FILE):
+        '''
+        Constructor
+        '''
+        self.path = path
+        self.margin = AUTH_EXPIRY_MARGIN
+    
+    def _read(self):
+        '''
+        return persisted entries, {} if none
+        '''
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+    
+    def _write(self, entries):
+        '''
+        persist entries, replacing the file atomically
+        '''
+        tmp = '%s.tmp' % self.path
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f)
+        os.chmod(tmp, 0600)
+        os.rename(tmp, self.path)
+    
+    def get(self, key):
+        '''
+        return entry 'key', or None if missing or about to expire
+        '''
+        entry = self._read().get(key)
+        if entry == None:
+            return None
+        try:
+            expires = datetime.datetime.strptime(entry['expires'], TIME_FORMAT)
+        except (KeyError, ValueError):
+            return None
+        if (expires - datetime.datetime.now() <
+            datetime.timedelta(seconds=self.margin)):
+            logging.debug('persisted token \'%s\' is expiring' % key)
+            return None
+        entry = _encode(entry)
+        entry['expires'] = expires
+        return entry
+    
+    def put(self, key, identity, region):
+        '''
+        persist the token and service catalog of authenticated 'identity'
+        '''
+        entry = {'expires': identity.expires.strftime(TIME_FORMAT),
+                 'region': region,
+                 'regions': list(identity.regions),
+                 'services': identity.services,
+                 'tenant_id': identity.tenant_id,
+                 'tenant_name': identity.tenant_name,
+                 'token': identity.token,
+                 'user': getattr(identity, 'user', {}),
+                 'username': identity.username}
+        try:
+            with _lock:
+                entries = self._read()
+                entries[key] = entry
+                self._write(entries)
+            return True
+        except (IOError, OSError):
+            logging.debug(traceback.format_exc())
+            logging.warn('cannot persist token in \'%s\'' % self.path)
+            return False
+    
+    def remove(self, key):
+        '''
+        remove entry 'key'
+        '''
+        try:
+            with _lock:
+                entries = self._read()
+                if entries.pop(key, None) != None:
+                    self._write(entries)
+        except (IOError, OSError):
+            logging.debug(traceback.format_exc())
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import threading
+import time
+
+from collections import OrderedDict
+from globals import CACHE_MAX_ENTRIES, CACHE_TTL
+from singleton import SessionSingleton
+
+# key of the entry holding the whole listing of a collection
+LISTING = '*'
+
+
+@SessionSingleton
+class Cache:
+    '''
+    in-memory cache of API objects shared by 'plugins.lib*' libraries
+    
+    Entries are addressed by (collection, key), i.e.: ('servers', server_id),
+    ('domains', domain_name), and ('servers', LISTING) for the whole listing.
+    Every collection has its own time-to-live (see 'globals.CACHE_TTL'), and
+    least recently used entries are evicted when 'max_entries' is exceeded.
+    
+    Mutating commands are expected to call 'invalidate()' with the affected
+    entry, which drops it together with the listing of its collection.
+    '''
+    
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        self.max_entries = CACHE_MAX_ENTRIES
+        self.ttls = dict(CACHE_TTL)
+        # (collection, key) --> (expiry time, value), in LRU order
+        self._entries = OrderedDict()
+        # collection --> {key --> object}, built from the last listing
+        self._index = {}
+        # collection --> {'hits':..., 'misses':..., ...}
+        self._stats = {}
+        self._lock = threading.RLock()
+    
+    def _counter(self, collection, name, increment=1):
+        '''
+        increment per-collection counter 'name'
+        '''
+        d = self._stats.setdefault(collection, {'hits': 0, 'misses': 0,
+                                                'evictions': 0,
+                                                'invalidations': 0})
+        d[name] += increment
+    
+    def clear(self, collection=None):
+        '''
+        drop every entry, or every entry of 'collection', and reset stats
+        '''
+        with self._lock:
+            if collection == None:
+                self._entries.clear()
+                self._index.clear()
+                self._stats.clear()
+            else:
+                for k in [k for k in self._entries.keys()
+                          if k[0] == collection]:
+                    del self._entries[k]
+                self._index.pop(collection, None)
+                self._stats.pop(collection, None)
+        logging.debug('cache cleared (collection:%s)' % collection)
+    
+    def forget(self, collection, key):
+        '''
+        drop 'key' from the index of 'collection', i.e.: it does not exist
+        anymore
+        '''
+        with self._lock:
+            self._index.get(collection, {}).pop(str(key), None)
+            self._entries.pop((collection, str(key)), None)
+    
+    def get(self, collection, key=LISTING):
+        '''
+        return cached value, or None if missing or expired
+        '''
+        k = (collection, str(key))
+        with self._lock:
+            entry = self._entries.pop(k, None)
+            if entry == None or entry[0] < time.time():
+                self._counter(collection, 'misses')
+                return None
+            # re-insert to mark entry as the most recently used
+            self._entries[k] = entry
+            self._counter(collection, 'hits')
+            return entry[1]
+    
+    def get_or_load(self, collection, key, loader):
+        '''
+        return cached value, call 'loader()' and cache its result on miss
+        '''
+        value = self.get(collection, key)
+        if value == None:
+            value = loader()
+            self.set(collection, key, value)
+        return value
+    
+    def get_ttl(self, collection):
+        '''
+        return time-to-live of 'collection' in seconds
+        '''
+        return self.ttls.get(collection, self.ttls['default'])
+    
+    def index(self, collection, objects, key):
+        '''
+        rebuild the index of 'collection' (key(object) --> object) from its
+        last listing; the index does not expire
+        '''
+        with self._lock:
+            self._index[collection] = dict((str(key(o)), o) for o in objects)
+    
+    def invalidate(self, collection, key=LISTING):
+        '''
+        drop entry (collection, key) and the listing of 'collection'
+        '''
+        with self._lock:
+            for k in set([(collection, str(key)), (collection, LISTING)]):
+                if self._entries.pop(k, None) != None:
+                    self._counter(collection, 'invalidations')
+        logging.debug('cache invalidated collection:%s, key:%s' %
+                      (collection, key))
+    
+    def lookup(self, collection, key):
+        '''
+        return object 'key' from the index of 'collection', or None
+        '''
+        with self._lock:
+            return self._index.get(collection, {}).get(str(key))
+    
+    def set(self, collection, key, value, ttl=None):
+        '''
+        cache value, evict least recently used entries if cache is full
+        '''
+        if ttl == None:
+            ttl = self.get_ttl(collection)
+        k = (collection, str(key))
+        with self._lock:
+            self._entries.pop(k, None)
+            self._entries[k] = (time.time() + ttl, value)
+            while len(self._entries) > self.max_entries:
+                evicted = self._entries.popitem(last=False)
+                self._counter(evicted[0][0], 'evictions')
+    
+    def set_ttl(self, collection, ttl):
+        '''
+        set time-to-live of 'collection' in seconds
+        '''
+        self.ttls[collection] = ttl
+    
+    def stats(self):
+        '''
+        return a list of per-collection dictionaries with keys: collection,
+        ttl, entries, hits, misses, hit_rate, evictions, invalidations
+        '''
+        with self._lock:
+            entries = {}
+            for k in self._entries.keys():
+                entries[k[0]] = entries.get(k[0], 0) + 1
+            out = []
+            for c in sorted(set(entries.keys() + self._stats.keys())):
+                d = dict(self._stats.get(c, {'hits': 0, 'misses': 0,
+                                             'evictions': 0,
+                                             'invalidations': 0}))
+                lookups = d['hits'] + d['misses']
+                d['hit_rate'] = (float(d['hits']) / lookups) if lookups else 0.0
+                d['collection'] = c
+                d['entries'] = entries.get(c, 0)
+                d['ttl'] = self.get_ttl(c)
+                out.append(d)
+            return out
+    
+    def swap(self, state=None):
+        '''
+        replace entries, index and stats with 'state' (as returned by a
+        previous call), or with empty ones, and return the current state
+        
+        used to keep a separate cache per authenticated identity
+        '''
+        with self._lock:
+            old = (self._entries, self._index, self._stats)
+            if state == None:
+                state = (OrderedDict(), {}, {})
+            self._entries, self._index, self._stats = state
+        return old
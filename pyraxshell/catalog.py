@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import logging
+import threading
+import time
+import traceback
+
+from context import current
+from db import DB
+from globals import CATALOG_TTL
+from singleton import SessionSingleton
+
+# catalog entries being refreshed in background, as (region, identity, name)
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+class CatalogItem(object):
+    '''
+    catalog object rebuilt from its JSON representation, attributes mirror
+    the keys of the original API object (i.e.: flavor.id, flavor.name)
+    '''
+    
+    def __init__(self, info):
+        self.__dict__.update(info)
+        self._info = info
+    
+    def __repr__(self):
+        return '<CatalogItem %s>' % self._info
+
+
+class CatalogRefreshThread(threading.Thread):
+    '''
+    thread to refresh a stale catalog entry
+    '''
+    
+    def __init__(self, catalog, name, loader, region, identity):
+        threading.Thread.__init__(self)
+        self.setName('catalog-%s' % name)
+        self.setDaemon(True)
+        self.catalog = catalog
+        self._name = name
+        self.loader = loader
+        self.region = region
+        self.identity = identity
+    
+    def run(self):
+        k = (self.region, self.identity, self._name)
+        try:
+            self.catalog.store(self._name, self.loader(), self.region,
+                               self.identity)
+        except:
+            tb = traceback.format_exc()
+            logging.debug(tb)
+            logging.warn('cannot refresh catalog \'%s\'' % self._name)
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(k)
+
+
+@SessionSingleton
+class Catalog(DB):
+    '''
+    persistent catalog of rarely changing data (i.e.: flavors, images)
+    
+    Entries are stored in 'catalog' table keyed by region, identity and name,
+    with fetch timestamp and time-to-live (see 'globals.CATALOG_TTL').
+    Missing entries are fetched synchronously, stale ones are returned as
+    they are and refreshed in background.
+    '''
+    
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        DB.__init__(self)
+        # databases created by older versions have no 'catalog' table
+        self.create_table_catalog()
+    
+    def create_table_catalog(self):
+        '''
+        create 'catalog' table, if missing
+        '''
+        sql = '''
+CREATE TABLE IF NOT EXISTS catalog (
+region     TEXT NOT NULL,
+identity   TEXT NOT NULL,
+name       TEXT NOT NULL,
+t          INTEGER NOT NULL,
+ttl        INTEGER NOT NULL,
+data       TEXT NOT NULL,
+PRIMARY KEY (region, identity, name)
+);
+'''
+        self.query(sql)
+    
+    def scope(self):
+        '''
+        return (region, identity) of the current authenticated user
+        '''
+        context = current()
+        try:
+            region = (context.identity.region or context.default_region or
+                      '')
+            identity = '%s@%s' % (context.identity.username,
+                                  context.identity.tenant_id)
+        except AttributeError:
+            region, identity = '', ''
+        return (region, identity)
+    
+    def fetch(self, name, loader):
+        '''
+        return catalog 'name'
+        
+        loader    function fetching catalog data from the API, it must return
+                  a list of strings or API objects
+        '''
+        region, identity = self.scope()
+        row = self.query('''
+SELECT t, ttl, data FROM catalog
+WHERE region = ? AND identity = ? AND name = ?
+''', (region, identity, name))
+        if not row:
+            logging.debug('catalog \'%s\' is missing, fetching it' % name)
+            return self.store(name, loader(), region, identity)
+        t, ttl, data = row[0]
+        if t + ttl < time.time():
+            k = (region, identity, name)
+            with _refreshing_lock:
+                if k not in _refreshing:
+                    logging.debug('catalog \'%s\' is stale, refreshing it' %
+                                  name)
+                    _refreshing.add(k)
+                    CatalogRefreshThread(self, name, loader, region,
+                                         identity).start()
+        return _loads(data)
+    
+    def invalidate(self, name):
+        '''
+        drop catalog 'name' of the current authenticated user
+        '''
+        region, identity = self.scope()
+        self.query('''
+DELETE FROM catalog
+WHERE region = ? AND identity = ? AND name = ?
+''', (region, identity, name))
+    
+    def store(self, name, objects, region=None, identity=None):
+        '''
+        store catalog 'name', return it as it will be read back from db
+        '''
+        if region == None or identity == None:
+            region, identity = self.scope()
+        data = _dumps(objects)
+        ttl = CATALOG_TTL.get(name, 3600)
+        # data is not logged, it may be large
+        self.query('''
+INSERT OR REPLACE INTO catalog (region, identity, name, t, ttl, data)
+VALUES (?, ?, ?, ?, ?, ?)''', (region, identity, name, int(time.time()), ttl,
+                               data))
+        return _loads(data)
+
+
+def _dumps(objects):
+    '''
+    serialise a list of strings or API objects to JSON
+    '''
+    return json.dumps([getattr(o, '_info', o) for o in objects])
+
+def _loads(data):
+    '''
+    deserialise JSON written by '_dumps'
+    '''
+    return [CatalogItem(o) if isinstance(o, dict) else o
+            for o in json.loads(data)]
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+import bisect
+import logging
+import threading
+import time
+import traceback
+
+from cache import Cache
+from context import current
+from globals import COMPLETION_MAX
+from singleton import SessionSingleton
+
+
+class CompletionRefreshThread(threading.Thread):
+    '''
+    thread to refresh a stale completion index calling its loader (i.e.:
+    'LibServers().list_cloudservers'), which feeds the index back
+    '''
+    
+    def __init__(self, collection, loader):
+        threading.Thread.__init__(self)
+        self.setName('completion-%s' % collection)
+        self.setDaemon(True)
+        self.collection = collection
+        self.loader = loader
+        self.context = current()
+    
+    def run(self):
+        with self.context:
+            try:
+                self.loader()
+            except:
+                tb = traceback.format_exc()
+                logging.debug(tb)
+                logging.debug('cannot refresh completion of \'%s\'' %
+                              self.collection)
+            finally:
+                Completion.Instance().refreshed(self.collection)  # @UndefinedVariable
+
+
+@SessionSingleton
+class Completion:
+    '''
+    prefix index of resource values (i.e.: server ids and names, domain names)
+    used for tab completion
+    
+    Every (collection, field) pair, i.e.: ('servers', 'name'), is a sorted list
+    fed by the last listing of the collection; completing a prefix is a binary
+    search, so it does not depend on the number of resources, and it never
+    calls the API: stale collections are refreshed in background and the old
+    values are served meanwhile.
+    '''
+    
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        self.max_matches = COMPLETION_MAX
+        # (collection, field) --> sorted list of values
+        self._index = {}
+        # collection --> time of the last feed
+        self._fed = {}
+        # collections being refreshed
+        self._refreshing = set()
+        self._lock = threading.Lock()
+    
+    def complete(self, collection, field, prefix, loader=None):
+        '''
+        return sorted values of 'field' in 'collection' starting with
+        'prefix', at most 'max_matches'
+        
+        loader    callable refreshing the collection, started in background
+                  if the index is missing or stale
+        '''
+        if loader != None and self.is_stale(collection):
+            self.refresh(collection, loader)
+        # lists are replaced, never modified: no locking needed to read them
+        values = self._index.get((collection, field), [])
+        matches = []
+        i = bisect.bisect_left(values, prefix)
+        while (i < len(values) and len(matches) < self.max_matches and
+               values[i].startswith(prefix)):
+            matches.append(values[i])
+            i += 1
+        return matches
+    
+    def feed(self, collection, objects, fields=('id', 'name')):
+        '''
+        rebuild the index of 'collection' from a listing
+        '''
+        index = {}
+        for field in fields:
+            values = set()
+            for o in objects:
+                v = getattr(o, field, None)
+                if v != None and v != '':
+                    values.add(str(v))
+            index[(collection, field)] = sorted(values)
+        with self._lock:
+            self._index.update(index)
+            self._fed[collection] = time.time()
+    
+    def is_stale(self, collection):
+        '''
+        check if the index of 'collection' is missing or older than the cache
+        time-to-live of 'collection'
+        '''
+        fed = self._fed.get(collection)
+        return (fed == None or
+                time.time() - fed > Cache.Instance().get_ttl(collection))  # @UndefinedVariable
+    
+    def refresh(self, collection, loader):
+        '''
+        refresh the index of 'collection' in background, unless a refresh is
+        already running
+        '''
+        with self._lock:
+            if collection in self._refreshing:
+                return
+            self._refreshing.add(collection)
+        CompletionRefreshThread(collection, loader).start()
+    
+    def refreshed(self, collection):
+        '''
+        mark background refresh of 'collection' as done
+        '''
+        with self._lock:
+            self._refreshing.discard(collection)
+            # a failed refresh is not retried on every key press
+            self._fed[collection] = time.time()
+    
+    def swap(self, state=None):
+        '''
+        replace the index with 'state' (as returned by a previous call), or
+        with an empty one, and return the current state
+        '''
+        with self._lock:
+            old = (self._index, self._fed)
+            self._index, self._fed = state or ({}, {})
+        return old
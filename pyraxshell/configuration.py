@@ -16,15 +16,16 @@
 # along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+import ConfigParser
 import logging
 import os.path
 
 from baseconfigfile import BaseConfigFile
-from globals import CONFIG_FILE
-from singleton import Singleton
+from globals import CONFIG_FILE, IDENTITY_POOL_SIZE
+from singleton import SessionSingleton
 
 
-@Singleton
+@SessionSingleton
 class Configuration(BaseConfigFile):
     '''
     CLI params and configuration file settings
@@ -53,6 +54,7 @@ verbose = false
 
 [pyrax]
 http_debug = False
+http_pool_size = 10
 no_verify_ssl = False
 '''
             with open(self._file, 'w') as f:
@@ -75,6 +77,9 @@ no_verify_ssl = False
         parser.add_argument('-c', '--credentials',
                             help='file with credentials')
         parser.add_argument('-k', '--api-key', help='Authentication api-key')
+        parser.add_argument('--daemon', action='store_true',
+                            help=('serve pyraxcli clients on a unix socket'
+                                  ' (see: pyraxcli.py)'))
         parser.add_argument('-i', '--identity-type',
                             help='identity type (default: \'rackspace\'',
                             default='rackspace')
@@ -90,6 +95,9 @@ no_verify_ssl = False
         parser.add_argument('--pyrax-http-debug', nargs='?', const=True,
                             type=bool,
                             help = 'set pyrax http_debug on (default: False)')
+        parser.add_argument('--pyrax-http-pool-size', type=int,
+                            help=('keep-alive connections per API host'
+                                  ' (default: 10)'))
         parser.add_argument('--pyrax-no-verify-ssl', nargs='?', const=True,
                             help = 'set pyrax verify_ssl (default: False)')
         parser.add_argument('-r', '--region', required=False,
@@ -125,6 +133,14 @@ no_verify_ssl = False
     def identity_type(self):
         return self.args.identity_type
     
+    # 'identity_pool_size' in configuration file
+    @property
+    def identity_pool_size(self):
+        try:
+            return int(self.get_param('main', 'identity_pool_size'))
+        except (ConfigParser.Error, ValueError):
+            return IDENTITY_POOL_SIZE
+    
     @property
     def interactive(self):
         return self.interactive
@@ -135,6 +151,11 @@ no_verify_ssl = False
             return None
         return self.args.log_level.upper()
 
+    # --daemon
+    @property
+    def daemon(self):
+        return self.args.daemon
+    
     # --pyrax-http-debug (True)
     @property
     def pyrax_http_debug(self):
@@ -143,6 +164,17 @@ no_verify_ssl = False
         else:
             return self.get_param('pyrax', 'http_debug')
     
+    # --pyrax-http-pool-size
+    @property
+    def pyrax_http_pool_size(self):
+        if self.args.pyrax_http_pool_size != None:
+            return self.args.pyrax_http_pool_size
+        try:
+            return int(self.get_param('pyrax', 'http_pool_size'))
+        except:
+            # config files written before 'http_pool_size'
+            return None
+    
     # --pyrax-no-verify-ssl
     @property
     def pyrax_no_verify_ssl(self):
@@ -186,11 +218,14 @@ no_verify_ssl = False
         return ("%s" %
                 (', '.join( [ 'credentials:%s' % self.credentials,
                              'api-key:%s' % self.api_key,
+                             'daemon:%s' % self.daemon,
                              'identity-type:%s' % self.identity_type,
                              'interactive:%s' % self.interactive,
                              'identity-type:%s' % self.identity_type,
                              'log_level:%s' % self.log_level,
                              'pyrax-http-debug:%s' % self.pyrax_http_debug,
+                             'pyrax-http-pool-size:%s' %
+                             self.pyrax_http_pool_size,
                              'pyrax_no_verify_ssl:%s' % self.pyrax_no_verify_ssl,
                              'region:%s' % self.region,
                              'token:%s' % self.token,
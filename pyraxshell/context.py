@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import copy
+import functools
+import pyrax
+import pyrax.exceptions as exc
+import threading
+
+from httppool import HTTPPool
+from singleton import SessionSingleton
+
+# module attributes of pyrax holding the state of the authenticated identity
+PYRAX_STATE = ('identity', 'regions', 'services', 'default_region',
+               'cloudservers', 'cloudfiles', 'cloud_loadbalancers',
+               'cloud_databases', 'cloud_blockstorage', 'cloud_dns',
+               'cloud_networks', 'cloud_monitoring', 'autoscale')
+
+# clients of the services and the pyrax functions connecting to them
+CLIENTS = (('cloudservers', 'connect_to_cloudservers'),
+           ('cloudfiles', 'connect_to_cloudfiles'),
+           ('cloud_loadbalancers', 'connect_to_cloud_loadbalancers'),
+           ('cloud_databases', 'connect_to_cloud_databases'),
+           ('cloud_blockstorage', 'connect_to_cloud_blockstorage'),
+           ('cloud_dns', 'connect_to_cloud_dns'),
+           ('cloud_networks', 'connect_to_cloud_networks'),
+           ('cloud_monitoring', 'connect_to_cloud_monitoring'),
+           ('autoscale', 'connect_to_autoscale'))
+
+# pyrax settings (i.e.: 'identity_type') are process-wide, authentications
+# are serialized
+_auth_lock = threading.RLock()
+# whether or not 'install' ran
+_installed = False
+# contexts activated in the current thread, innermost last
+_local = threading.local()
+
+
+class Context(object):
+    '''
+    state of a pyraxshell session: configuration, audit writer ('Sessions'),
+    accounts, caches, completion, jobs, pyrax identity and clients
+    
+    Session singletons (see 'SessionSingleton') have one instance per
+    context, and pyrax state lives here instead of pyrax module attributes,
+    so that independent sessions run concurrently in one process. A context
+    is active in a thread while in:
+    
+        with ctx:
+            ...
+    
+    threads started by pyraxshell inherit the context of their creator, and
+    the default context (see 'current') holds the process-wide singletons.
+    pyrax module attributes are proxies to the current context once 'install'
+    ran ('__main__' and 'Libpyraxshell' do).
+    
+    Still shared by all the contexts of the process: pyrax settings (see
+    'authenticating'), the message queue ('msg_queue'), rate limits
+    ('RateLimiter'), keep-alive connections ('HTTPPool'), the DB ('Catalog',
+    'Sessions' tables) and plain singletons (see 'Singleton').
+    '''
+    
+    def __init__(self, name=None, configuration=None, default=False):
+        '''
+        Constructor
+        
+        name             used in logs
+        configuration    'Configuration' of the session (default: a copy of
+                         the one of the context creating it, on first use)
+        '''
+        self.name = name
+        self.default = default
+        self.pyrax = dict.fromkeys(PYRAX_STATE)
+        self.pyrax['regions'] = self.pyrax['services'] = tuple()
+        # class name --> instance of session singletons
+        self._instances = {}
+        # class name --> function returning the instance, default: 'New'
+        self._factories = {}
+        self._lock = threading.RLock()
+        if not default:
+            parent = current()
+            self._factories['Configuration'] = lambda: (
+                copy.copy(parent.configuration) if configuration == None
+                else configuration)
+            self._factories['Sessions'] = self._start_session
+    
+    def __repr__(self):
+        return '<Context %s>' % self.name
+    
+    def __enter__(self):
+        _local.__dict__.setdefault('stack', []).append(self)
+        return self
+    
+    def __exit__(self, *exc_info):
+        _local.stack.pop()
+    
+    def __getattr__(self, name):
+        # pyrax state, i.e.: 'ctx.cloudservers', 'ctx.identity'
+        if name in PYRAX_STATE:
+            return self.__dict__['pyrax'][name]
+        raise AttributeError(name)
+    
+    def instance(self, singleton):
+        '''
+        return the instance of 'singleton' in this context, create it on
+        first use
+        '''
+        if self.default:
+            return singleton.Default()
+        name = singleton._decorated.__name__
+        try:
+            return self._instances[name]
+        except KeyError:
+            with self._lock:
+                if name not in self._instances:
+                    factory = self._factories.get(name, singleton.New)
+                    # constructors may look up other session singletons
+                    with self:
+                        self._instances[name] = factory()
+            return self._instances[name]
+    
+    # ########################################
+    # SESSION SINGLETONS
+    # (imported on use: their modules import this one)
+    
+    @property
+    def account(self):
+        from account import Account
+        return self.instance(Account)
+    
+    @property
+    def cache(self):
+        from cache import Cache
+        return self.instance(Cache)
+    
+    @property
+    def colours(self):
+        from ansicolours import ANSIColours
+        return self.instance(ANSIColours)
+    
+    @property
+    def completion(self):
+        from completion import Completion
+        return self.instance(Completion)
+    
+    @property
+    def configuration(self):
+        from configuration import Configuration
+        return self.instance(Configuration)
+    
+    @property
+    def sessions(self):
+        from sessions import Sessions
+        return self.instance(Sessions)
+    
+    def _start_session(self):
+        '''
+        return the audit writer of this context, its session recorded (as
+        '__main__' does for the default context)
+        '''
+        from sessions import Sessions
+        sessions = Sessions.New()
+        sessions.start_session()
+        return sessions
+    
+    def authenticating(self):
+        '''
+        return a context manager activating this context while holding the
+        process-wide authentication lock, i.e.:
+        
+            with ctx.authenticating():
+                pyrax.set_setting('identity_type', identity_type)
+                pyrax.set_credentials(username, apikey, region=region)
+        '''
+        return _Authenticating(self)
+    
+    # ########################################
+    # PYRAX STATE
+    
+    def clear_credentials(self):
+        '''
+        drop identity and clients, see 'pyrax.clear_credentials'
+        '''
+        for k in PYRAX_STATE:
+            if k != 'default_region':
+                self.pyrax[k] = None
+        self.pyrax['regions'] = self.pyrax['services'] = tuple()
+    
+    def connect_to_services(self, region=None):
+        '''
+        connect to services with the identity of this context, see
+        'pyrax.connect_to_services', clients use the shared HTTP pool
+        '''
+        pool = HTTPPool.Instance()  # @UndefinedVariable
+        identity = self.pyrax['identity']
+        self.pyrax['regions'] = tuple(getattr(identity, 'regions', ()))
+        self.pyrax['services'] = tuple(getattr(identity, 'services', {}))
+        if region != None:
+            self.pyrax['default_region'] = region
+        with self:
+            for name, connect in CLIENTS:
+                self.pyrax[name] = pool.attach(
+                        getattr(pyrax, connect)(region=region))
+    
+    def create_identity(self):
+        '''
+        set a new identity of the current 'identity_type', see
+        'pyrax._create_identity', its requests use the shared HTTP pool
+        '''
+        cls = pyrax.settings.get('identity_class')
+        if not cls:
+            raise exc.IdentityClassNotDefined('No identity class has '
+                    'been defined for the current environment.')
+        self.pyrax['identity'] = HTTPPool.Instance().attach(  # @UndefinedVariable
+            cls(verify_ssl=pyrax.get_setting('verify_ssl')))
+        return self.pyrax['identity']
+    
+    def get_identity(self):
+        '''
+        return the identity of this context, create it if missing
+        '''
+        return self.pyrax['identity'] or self.create_identity()
+
+
+class _Authenticating(object):
+    
+    def __init__(self, context):
+        self.context = context
+    
+    def __enter__(self):
+        _auth_lock.acquire()
+        return self.context.__enter__()
+    
+    def __exit__(self, *exc_info):
+        try:
+            self.context.__exit__(*exc_info)
+        finally:
+            _auth_lock.release()
+
+
+class _StateProxy(object):
+    '''
+    pyrax module attribute (i.e.: 'pyrax.identity') resolved in the context
+    active in the calling thread
+    '''
+    
+    def __init__(self, name):
+        object.__setattr__(self, '_name', name)
+    
+    def _target(self):
+        if self._name == 'identity':
+            return current().get_identity()
+        return current().pyrax[self._name]
+    
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+    
+    def __setattr__(self, name, value):
+        setattr(self._target(), name, value)
+    
+    def __nonzero__(self):
+        return bool(self._target())
+    
+    def __repr__(self):
+        return '<pyrax.%s of %r>' % (self._name, current())
+
+
+def contextual(cls):
+    '''
+    class decorator: public methods of 'cls' run in the context of the
+    instance ('self.context')
+    '''
+    def wrap(fn):
+        @functools.wraps(fn)
+        def wrapped(self, *args, **kwargs):
+            with self.context:
+                return fn(self, *args, **kwargs)
+        return wrapped
+    for name, fn in vars(cls).items():
+        if callable(fn) and not name.startswith('_'):
+            setattr(cls, name, wrap(fn))
+    return cls
+
+
+def current():
+    '''
+    return the context active in the calling thread, the default one if none
+    '''
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else _default
+
+
+def session():
+    '''
+    return the context active in the calling thread, None if the default one
+    '''
+    context = current()
+    return None if context is _default else context
+
+
+def install():
+    '''
+    keep pyrax identity, clients and default region in the current context:
+    module attributes become proxies, and functions assigning them are
+    replaced
+    '''
+    global _installed
+    with _auth_lock:
+        if _installed:
+            return
+        _installed = True
+    _default.pyrax.update((k, getattr(pyrax, k, None)) for k in PYRAX_STATE)
+    pyrax._create_identity = lambda: current().create_identity()
+    pyrax.clear_credentials = lambda: current().clear_credentials()
+    pyrax.connect_to_services = \
+        lambda region=None: current().connect_to_services(region)
+    def set_default_region(region):
+        current().pyrax['default_region'] = region
+    pyrax.set_default_region = set_default_region
+    # pyrax assigns the module attribute 'default_region' while
+    # authenticating: it holds the one of the current context meanwhile
+    auth_and_connect = pyrax._auth_and_connect
+    def _auth_and_connect(region=None, connect=True):
+        context = current()
+        with _auth_lock:
+            pyrax.default_region = context.pyrax['default_region']
+            try:
+                return auth_and_connect(region=region, connect=connect)
+            finally:
+                context.pyrax['default_region'] = pyrax.default_region
+    pyrax._auth_and_connect = _auth_and_connect
+    pyrax.identity = _StateProxy('identity')
+    for name, _ in CLIENTS:
+        setattr(pyrax, name, _StateProxy(name))
+
+
+_default = Context('default', default=True)
+SessionSingleton.scope = staticmethod(session)
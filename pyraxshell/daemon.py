@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import errno
+import fcntl
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+from globals import (DAEMON_IDLE_TIMEOUT, DAEMON_LOCK_FILE, DAEMON_SOCKET,
+                     DAEMON_START_TIMEOUT)
+
+# lines ending a client session, the daemon keeps running
+END_SESSION = ('EOF', 'exit', 'quit')
+
+# control lines framing the output of each command sent by a client:
+# FRAME + 'begin <n> <command>', and FRAME + 'end <n> <status>' where status
+# is 0, or 1 if the command logged errors (i.e.: unknown commands)
+FRAME = '\x1e'
+
+
+class CommandLines(object):
+    '''
+    command lines read from 'rfile', a command failed if it logged errors
+    
+    Nested command loops (i.e.: 'servers' then 'list') read their lines from
+    it as sys.stdin, reading a line means the previous command is over.
+    '''
+    
+    def __init__(self, rfile):
+        self.rfile = rfile
+        self.count = 0
+        # numbers of the commands which failed
+        self.failed = []
+        self._errors = ErrorCounter(threading.current_thread().ident)
+        self._running = False
+    
+    def begin(self, line):
+        '''
+        command 'line' starts
+        '''
+        pass
+    
+    def end(self, status):
+        '''
+        the running command ends, 'status' is 1 if it failed, 0 otherwise
+        '''
+        pass
+    
+    def exit_status(self):
+        '''
+        return the number of the first command which failed, 0 if none did
+        '''
+        return min(self.failed[0], 255) if self.failed else 0
+    
+    def finish(self):
+        '''
+        end the running command
+        '''
+        if not self._running:
+            return
+        self._running = False
+        logging.getLogger().removeHandler(self._errors)
+        status = 1 if self._errors.count else 0
+        if status:
+            self.failed.append(self.count)
+        self.end(status)
+    
+    def readline(self):
+        self.finish()
+        line = self.rfile.readline()
+        if line:
+            self.count += 1
+            self.begin(line)
+            self._errors.count = 0
+            logging.getLogger().addHandler(self._errors)
+            self._running = True
+        return line
+
+
+class Commands(CommandLines):
+    '''
+    command lines read from a client, framing the output of each one
+    
+    While a command runs, sys.stdout and the shell's 'stdout' write to the
+    client (see 'Output').
+    '''
+    
+    def __init__(self, rfile, wfile, shell):
+        CommandLines.__init__(self, rfile)
+        self.wfile = wfile
+        self.shell = shell
+        self._output = Output(wfile)
+        self._stdout = None
+    
+    def begin(self, line):
+        self.wfile.write('%sbegin %d %s\n' % (FRAME, self.count,
+                                               line.strip()))
+        # plugins starting in non-interactive mode point sys.stdout to
+        # os.devnull, redirected again by each command
+        self._stdout = sys.stdout, self.shell.stdout
+        sys.stdout = self.shell.stdout = self._output
+    
+    def end(self, status):
+        # nested command loops ask for their next line after a prompt
+        self._output.discard()
+        sys.stdout, self.shell.stdout = self._stdout
+        self.wfile.write('%send %d %d\n' % (FRAME, self.count, status))
+
+
+class Output(object):
+    '''
+    sys.stdout of a command, writing to the client
+    
+    Text is written a line at a time, the rest of a line is held until it
+    ends: it is the prompt of a nested command loop if a line is read first.
+    '''
+    
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self._partial = ''
+    
+    def discard(self):
+        '''
+        drop the text held after the last line
+        '''
+        self._partial = ''
+    
+    def flush(self):
+        pass
+    
+    def write(self, text):
+        lines, newline, self._partial = (self._partial + text).rpartition('\n')
+        if newline:
+            self.wfile.write(lines + newline)
+
+
+class ErrorCounter(logging.Handler):
+    '''
+    count errors logged by thread 'ident'
+    '''
+    
+    def __init__(self, ident):
+        logging.Handler.__init__(self, logging.ERROR)
+        self.ident = ident
+        self.count = 0
+    
+    def emit(self, record):
+        if record.thread == self.ident:
+            self.count += 1
+
+
+class Daemon(object):
+    '''
+    warm pyraxshell process serving 'pyraxcli' clients over a unix socket
+    
+    Authentication, caches, plugins and database handles outlive the
+    clients. A client sends command lines (as typed in the shell) and reads
+    the output until the daemon closes the connection. Clients are served
+    one at a time, pyrax state being global.
+    '''
+    
+    def __init__(self, shell, path=DAEMON_SOCKET, lock_file=DAEMON_LOCK_FILE,
+                 idle_timeout=DAEMON_IDLE_TIMEOUT):
+        '''
+        Constructor
+        
+        shell           Cmd_Pyraxshell running the commands
+        idle_timeout    seconds without clients before exiting
+        '''
+        self.shell = shell
+        self.path = path
+        self.lock_file = lock_file
+        self.idle_timeout = idle_timeout
+        self._lock = None
+        self._sock = None
+    
+    def bind(self):
+        '''
+        take the daemon lock and listen on the socket
+        
+        @return    False if another daemon is running
+        '''
+        self._lock = open(self.lock_file, 'a')
+        try:
+            fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError:
+            logging.debug('daemon already running')
+            self._lock.close()
+            return False
+        # left by a daemon which did not exit cleanly
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0077)
+        try:
+            self._sock.bind(self.path)
+        finally:
+            os.umask(umask)
+        self._sock.listen(16)
+        self._sock.settimeout(self.idle_timeout)
+        return True
+    
+    def close(self):
+        if self._sock != None:
+            self._sock.close()
+            self._sock = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        if self._lock != None:
+            self._lock.close()
+            self._lock = None
+    
+    def handle(self, conn):
+        '''
+        run the command lines sent by client 'conn', its output is sent back
+        as soon as it is logged, framed by command (see 'Commands')
+        '''
+        conn.settimeout(None)
+        rfile = conn.makefile('rb')
+        wfile = conn.makefile('wb', 0)
+        commands = Commands(rfile, wfile, self.shell)
+        # console logging handlers --> their stream
+        console = dict((h, h.stream) for h in logging.getLogger().handlers
+                       if isinstance(h, logging.StreamHandler) and
+                       h.stream in (sys.__stdout__, sys.__stderr__))
+        stdin = sys.stdin
+        sys.stdin = commands
+        for h in console:
+            h.stream = wfile
+        try:
+            while True:
+                line = commands.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if line in END_SESSION:
+                    break
+                # a failing command ends its frame, not the session
+                try:
+                    line = self.shell.precmd(line)
+                    self.shell.postcmd(self.shell.onecmd(line), line)
+                except SystemExit:
+                    break
+                except Exception:
+                    logging.error(traceback.format_exc())
+        except (socket.error, IOError):
+            # client gone
+            logging.debug(traceback.format_exc())
+        finally:
+            try:
+                commands.finish()
+            except (socket.error, IOError):
+                pass
+            sys.stdin = stdin
+            for h, stream in console.items():
+                h.stream = stream
+            for f in (wfile, rfile):
+                f.close()
+    
+    def serve(self):
+        '''
+        serve clients until none connects for 'idle_timeout' seconds
+        '''
+        if not self.bind():
+            return False
+        logging.debug('daemon listening on %s' % self.path)
+        try:
+            # authentication, once
+            self.shell.preloop()
+            while True:
+                try:
+                    conn, _ = self._sock.accept()
+                except socket.timeout:
+                    logging.debug('daemon idle, exiting')
+                    break
+                try:
+                    self.handle(conn)
+                finally:
+                    conn.close()
+        finally:
+            self.close()
+        return True
+
+
+def connect(path=DAEMON_SOCKET):
+    '''
+    return a socket connected to the daemon, or None
+    '''
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return sock
+    except socket.error as e:
+        if e.errno not in (errno.ENOENT, errno.ECONNREFUSED):
+            raise
+        sock.close()
+        return None
+
+
+def start(path=DAEMON_SOCKET, timeout=DAEMON_START_TIMEOUT):
+    '''
+    connect to the daemon, start it first if it is not running
+    
+    @return    connected socket, or None if it did not start in 'timeout'
+               seconds
+    '''
+    sock = connect(path)
+    if sock != None:
+        return sock
+    this_dir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.devnull, 'r+') as devnull:
+        subprocess.Popen([sys.executable, this_dir, '--daemon'],
+                         stdin=devnull, stdout=devnull, stderr=devnull,
+                         close_fds=True, preexec_fn=os.setsid)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        time.sleep(0.1)
+        sock = connect(path)
+        if sock != None:
+            return sock
+    return None
+
+
+def send(sock, lines, out=sys.stdout):
+    '''
+    send command 'lines' to the daemon, and stream its output to 'out' as it
+    comes, each command's output after a '==> <command> <==' header
+    
+    @return    numbers (1..) of the commands which failed
+    '''
+    for line in lines:
+        sock.sendall('%s\n' % line.strip())
+    sock.shutdown(socket.SHUT_WR)
+    failed = []
+    rfile = sock.makefile('rb')
+    for line in iter(rfile.readline, ''):
+        if line.startswith(FRAME):
+            frame = line[1:].rstrip('\n').split(' ', 2)
+            if frame[0] == 'begin':
+                out.write('==> %s <==\n' % frame[2])
+            elif frame[0] == 'end' and frame[2] != '0':
+                failed.append(int(frame[1]))
+        else:
+            out.write(line)
+        out.flush()
+    rfile.close()
+    sock.close()
+    return failed
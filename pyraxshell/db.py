@@ -18,6 +18,7 @@
 import logging
 import os.path
 import sqlite3
+import threading
 import traceback
 
 from globals import SQLITE_DB, ERROR
@@ -48,16 +49,20 @@ class DB:
         self.__con.commit()
         self.__con.close()
     
-    def query(self, sql):
+    def query(self, sql, params=()):
         '''
         query db
+        
+        params    values of the '?' placeholders of 'sql', not logged
         '''
         logging.debug('sql:%s' % sql)
         try:
-            cur = self.__con.cursor()
-            cur.execute(sql)
-            self.__con.commit()
-            return cur.fetchall()
+            # i.e.: 'Sessions' records commands run by background jobs
+            with self.__lock:
+                cur = self.__con.cursor()
+                cur.execute(sql, params)
+                self.__con.commit()
+                return cur.fetchall()
         except:
             tb = traceback.format_exc()
             logging.error(tb)
@@ -66,10 +71,13 @@ class DB:
     def start_db(self):
         '''access db, create a new db if it is missing'''
         dbfilename = os.path.expanduser(SQLITE_DB)
+        self.__lock = threading.Lock()
         if not os.path.isfile(dbfilename):
             logging.info("db file '%s' is missing, creating it" % dbfilename)
-            self.__con = sqlite3.connect(dbfilename)  # @UndefinedVariable
+            self.__con = sqlite3.connect(dbfilename,  # @UndefinedVariable
+                                         check_same_thread=False)
 #             self.create_db_schema()
         else:
             logging.debug('database found (\'%s\')' % dbfilename)
-            self.__con = sqlite3.connect(dbfilename)  # @UndefinedVariable
+            self.__con = sqlite3.connect(dbfilename,  # @UndefinedVariable
+                                         check_same_thread=False)
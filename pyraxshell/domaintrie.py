@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+
+
+class DomainTrie(object):
+    '''
+    suffix trie of domain names, labels are stored reversed, i.e.:
+    
+        'bar.example.com' --> com -> example -> bar
+    
+    so that the domains containing a record are found walking the record
+    labels from the rightmost one, in O(labels)
+    '''
+    
+    def __init__(self, domains=None):
+        '''
+        Constructor
+        
+        domains    iterable of domain names
+        '''
+        # node: {label --> node}, key None marks the end of a domain name
+        self._root = {}
+        self._lock = threading.Lock()
+        self._len = 0
+        for d in domains or []:
+            self.add(d)
+    
+    def __contains__(self, domain):
+        node = self._walk(domain)
+        return node != None and None in node
+    
+    def __len__(self):
+        return self._len
+    
+    def _labels(self, name):
+        '''
+        return reversed labels of name
+        '''
+        labels = name.lower().rstrip('.').split('.')
+        labels.reverse()
+        return labels
+    
+    def _walk(self, name):
+        '''
+        return the node of 'name', or None
+        '''
+        node = self._root
+        for label in self._labels(name):
+            node = node.get(label)
+            if node == None:
+                return None
+        return node
+    
+    def add(self, domain):
+        '''
+        add domain name
+        '''
+        with self._lock:
+            node = self._root
+            for label in self._labels(domain):
+                node = node.setdefault(label, {})
+            if None not in node:
+                self._len += 1
+            node[None] = domain
+    
+    def nearest(self, record):
+        '''
+        return the longest domain name containing 'record' (record itself
+        included), or None
+        '''
+        nearest = None
+        node = self._root
+        for label in self._labels(record):
+            node = node.get(label)
+            if node == None:
+                break
+            nearest = node.get(None, nearest)
+        return nearest
+    
+    def remove(self, domain):
+        '''
+        remove domain name, prune empty nodes
+        '''
+        labels = self._labels(domain)
+        with self._lock:
+            # path[i] is the node of labels[:i]
+            path = [self._root]
+            for label in labels:
+                node = path[-1].get(label)
+                if node == None:
+                    return
+                path.append(node)
+            if path[-1].pop(None, None) == None:
+                return
+            self._len -= 1
+            for i in range(len(labels), 0, -1):
+                if path[i]:
+                    break
+                del path[i - 1][labels[i - 1]]
@@ -17,7 +17,7 @@
 
 import os.path
 
-import Queue
+from msgbox import Mailbox
 
 
 # ########################################
@@ -26,6 +26,9 @@ import Queue
 # base pyraxshell dir
 BASE_DIR = os.path.expanduser('~/.pyraxshell')
 
+# authentication tokens and service catalogs, reused across launches
+AUTH_FILE = os.path.expanduser('~/.pyraxshell/auth.json')
+
 # accounts file
 ACCOUNTS_FILE = os.path.expanduser('~/.pyraxshell/accounts.conf')
 
@@ -35,6 +38,10 @@ CONFIG_FILE = os.path.expanduser('~/.pyraxshell/pyraxshell.conf')
 # home directory
 HOME_DIR = os.path.expanduser('~/.pyraxshell')
 
+# daemon serving 'pyraxcli' (see 'daemon'): unix socket, and its lock file
+DAEMON_SOCKET = os.path.expanduser('~/.pyraxshell/daemon.sock')
+DAEMON_LOCK_FILE = os.path.expanduser('~/.pyraxshell/daemon.lock')
+
 # logging configuration file
 LOG_CONF_FILE = os.path.expanduser('~/.pyraxshell/logging.conf')
 
@@ -58,7 +65,127 @@ log_levels = (DEBUG, INFO, WARN, ERROR, CRITICAL)
 
 # ########################################
 # MESSAGE QUEUE
-msg_queue = Queue.Queue()
+
+# maximum number of pending notifications, only the latest one per key (i.e.:
+# server being built) is kept
+MSG_QUEUE_SIZE = 100
+msg_queue = Mailbox(MSG_QUEUE_SIZE)
+
+# ########################################
+# JOBS
+
+# number of finished jobs listed by 'jobs'
+JOBS_HISTORY = 20
+
+# concurrent calls per service of the asynchronous API (see 'aio')
+AIO_CONCURRENCY = {
+    'auth'          : 1,
+    'databases'     : 4,
+    'dns'           : 4,
+    'loadbalancers' : 4,
+    'servers'       : 10,
+}
 
 # polling time in seconds
 POLL_TIME = 30
+
+# polling time of a resource whose state does not change is multiplied by
+# POLL_BACKOFF after every poll, up to POLL_MAX_TIME seconds
+POLL_BACKOFF = 2
+POLL_MAX_TIME = 240
+
+# a watched resource missing from this many consecutive listings is gone
+POLL_MAX_MISSES = 3
+
+# maximum number of concurrent creation requests of bulk commands, i.e.:
+# 'servers create count:N'
+BULK_CONCURRENCY = 10
+
+# maximum number of accounts running a command at the same time, i.e.:
+# 'each_account servers list'
+EACH_ACCOUNT_CONCURRENCY = 8
+
+# bulk DNS record operations: records per batched API request, and concurrent
+# requests
+DNS_BATCH_SIZE = 100
+DNS_BULK_CONCURRENCY = 4
+
+# ########################################
+# RATE LIMITS
+
+# requests refused with 413 or 503 are retried up to RATE_LIMIT_MAX_RETRIES
+# times, after 'Retry-After' seconds or RATE_LIMIT_BACKOFF seconds doubled at
+# every retry, plus up to RATE_LIMIT_JITTER of random jitter
+RATE_LIMIT_BACKOFF = 1
+RATE_LIMIT_JITTER = 0.25
+RATE_LIMIT_MAX_RETRIES = 5
+# maximum seconds a request waits for a token, or before a retry
+RATE_LIMIT_MAX_WAIT = 60
+
+# ########################################
+# DAEMON
+
+# seconds without clients before the daemon exits
+DAEMON_IDLE_TIMEOUT = 1800
+# seconds 'pyraxcli' waits for a daemon it started
+DAEMON_START_TIMEOUT = 30
+
+# ########################################
+# HTTP CONNECTIONS
+
+# keep-alive connections kept per API endpoint host, grown to the size of the
+# largest worker pool (see 'httppool')
+HTTP_POOL_SIZE = 10
+
+# ########################################
+# CACHE
+# time-to-live of cached API objects in seconds, per collection ('default' is
+# used for collections which are not listed)
+CACHE_TTL = {
+    'default'       : 60,
+    'db_flavors'    : 3600,
+    'db_instances'  : 30,
+    'domains'       : 300,
+    'flavors'       : 3600,
+    'images'        : 900,
+    'limits'        : 60,
+    'loadbalancers' : 30,
+    'region_clients': 3600,
+    'servers'       : 30,
+}
+
+# maximum number of cached entries, least recently used ones are evicted first
+CACHE_MAX_ENTRIES = 4096
+
+# ########################################
+# CATALOG
+# time-to-live of catalog data persisted in SQLITE_DB in seconds; stale data is
+# still returned while it is refreshed in background
+CATALOG_TTL = {
+    'db_flavors'    : 86400,
+    'flavors'       : 86400,
+    'images'        : 21600,
+    'lb_algorithms' : 604800,
+    'lb_protocols'  : 604800,
+}
+
+# ########################################
+# COMPLETION
+# maximum number of values suggested by tab completion
+COMPLETION_MAX = 200
+
+# ########################################
+# AUTHENTICATION
+# persisted tokens are not reused when they expire within this many seconds
+AUTH_EXPIRY_MARGIN = 300
+
+# tokens are refreshed in background this many seconds before they expire
+AUTH_REFRESH_AHEAD = 600
+
+# re-authentication requests arriving within this many seconds from the last
+# refresh reuse its token
+AUTH_REFRESH_COALESCE = 10
+
+# maximum number of authenticated accounts kept for 'account' switching, least
+# recently used ones are evicted first ('identity_pool_size' in CONFIG_FILE)
+IDENTITY_POOL_SIZE = 12
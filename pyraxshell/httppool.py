@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import httplib
+import httplib2
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+import threading
+import urlparse
+
+from collections import OrderedDict
+from globals import HTTP_POOL_SIZE
+from singleton import Singleton
+
+
+@Singleton
+class HTTPPool:
+    '''
+    keep-alive HTTP sessions shared by all API clients, one per endpoint host
+    
+    pyrax clients (httplib2), novaclient clients and identity requests open
+    fresh connections, paying a TLS handshake per client or per request.
+    Once attached (see 'attach'), their requests go through a
+    requests.Session per 'scheme://host:port', keeping up to 'size'
+    connections open, and the pool grows with the largest WorkerPool (see
+    'fit').
+    '''
+    
+    def __init__(self):
+        self.size = HTTP_POOL_SIZE
+        # 'scheme://netloc' --> requests.Session
+        self._sessions = OrderedDict()
+        # 'scheme://netloc' --> {'requests', 'errors', 'connections'}, the
+        # connections of replaced adapters included
+        self._stats = {}
+        self._lock = threading.Lock()
+    
+    def fit(self, size):
+        '''
+        grow the pool of every host to 'size' connections, i.e.: the
+        concurrency of a job
+        '''
+        with self._lock:
+            if size <= self.size:
+                return
+            logging.debug('http pool size %d --> %d' % (self.size, size))
+            self.size = size
+            for host, session in self._sessions.items():
+                self._mount(host, session)
+    
+    def request(self, method, url, **kwargs):
+        '''
+        make request 'method url' with the session of the host of 'url'
+        
+        @return    requests.Response
+        '''
+        host, session = self.session(url)
+        try:
+            resp = session.request(method, url, **kwargs)
+        except:
+            self._count(host, 'errors')
+            raise
+        finally:
+            self._count(host, 'requests')
+        return resp
+    
+    def session(self, url):
+        '''
+        return (host, session) of the endpoint host of 'url'
+        '''
+        u = urlparse.urlsplit(url)
+        host = '%s://%s' % (u.scheme, u.netloc)
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                self._mount(host, session)
+                self._sessions[host] = session
+                self._stats[host] = {'requests': 0, 'errors': 0,
+                                     'connections': 0}
+            return host, self._sessions[host]
+    
+    def stats(self):
+        '''
+        return {host: {'requests', 'errors', 'connections', 'reused'}}, where
+        'connections' is the number of connections opened, and 'reused' the
+        number of requests made on an already open connection
+        '''
+        with self._lock:
+            out = OrderedDict()
+            for host, session in self._sessions.items():
+                d = dict(self._stats[host])
+                d['connections'] += self._connections(session.adapters[host])
+                d['reused'] = max(d['requests'] - d['connections'], 0)
+                out[host] = d
+            return out
+    
+    def _connections(self, adapter):
+        pools = adapter.poolmanager.pools
+        return sum(pools[k].num_connections for k in pools.keys())
+    
+    def _count(self, host, name):
+        with self._lock:
+            self._stats[host][name] += 1
+    
+    def _mount(self, host, session):
+        '''
+        mount an adapter keeping 'size' connections to 'host' on 'session',
+        replacing the previous one (its idle connections are closed)
+        '''
+        old = session.adapters.get(host)
+        if old != None:
+            self._stats[host]['connections'] += self._connections(old)
+            old.close()
+        session.mount(host, HTTPAdapter(pool_connections=1,
+                                        pool_maxsize=self.size))
+    
+    # ########################################
+    # CLIENTS
+    
+    def attach(self, client):
+        '''
+        route the requests of 'client' (pyrax client, novaclient client or
+        identity) through the pool, return 'client'
+        
+        Only this instance is changed: clients created by pyraxshell are
+        attached when created (see 'Context.connect_to_services').
+        '''
+        import pyrax.base_identity
+        if client == None:
+            return client
+        if getattr(getattr(client, 'client', None), 'http', None) != None:
+            # novaclient clients have a session each
+            client.client.http = self
+        elif isinstance(client, httplib2.Http):
+            # pyrax clients are httplib2.Http objects, replace the connection
+            client._conn_request = self._conn_request(client)
+        elif isinstance(client, pyrax.base_identity.BaseAuth):
+            # identity calls requests.get(), requests.post(), ...
+            client._call = self._call(client._call)
+        return client
+    
+    def _call(self, call):
+        requests = Requests(self)
+        def pooled_call(mthd, *args, **kwargs):
+            return call(getattr(requests, mthd.__name__, mthd),
+                        *args, **kwargs)
+        return pooled_call
+    
+    def _conn_request(self, client):
+        def conn_request(conn, request_uri, method, body, headers):
+            scheme = ('https' if isinstance(conn, httplib.HTTPSConnection)
+                      else 'http')
+            netloc = conn.host
+            if conn.port != {'http': 80, 'https': 443}[scheme]:
+                netloc = '%s:%d' % (conn.host, conn.port)
+            resp = self.request(
+                    method, '%s://%s%s' % (scheme, netloc, request_uri),
+                    data=body, headers=headers, allow_redirects=False,
+                    timeout=client.timeout,
+                    verify=not client.disable_ssl_certificate_validation)
+            info = dict(resp.headers)
+            info['status'] = resp.status_code
+            info['reason'] = resp.reason
+            return httplib2.Response(info), resp.content
+        return conn_request
+
+
+class Requests(object):
+    '''
+    stand-in for the 'requests' module making get(), post(), ... requests
+    through 'pool'
+    '''
+    
+    def __init__(self, pool):
+        for verb in ('delete', 'get', 'head', 'patch', 'post', 'put'):
+            setattr(self, verb, self._verb(pool, verb))
+    
+    def __getattr__(self, name):
+        return getattr(requests, name)
+    
+    def _verb(self, pool, verb):
+        def request(url, **kwargs):
+            return pool.request(verb.upper(), url, **kwargs)
+        request.__name__ = verb
+        return request
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+import datetime
+import logging
+import pyrax
+import threading
+import time
+
+from cache import Cache
+from collections import OrderedDict
+from completion import Completion
+from context import current
+from globals import AUTH_EXPIRY_MARGIN, IDENTITY_POOL_SIZE
+from singleton import SessionSingleton
+from tokenrefresh import TokenRefresh
+
+
+class IdentityContext(object):
+    '''
+    authenticated identity of an account: pyrax identity, clients and caches
+    '''
+    
+    def __init__(self, name, on_refresh=None):
+        '''
+        Constructor
+        
+        name          account alias
+        on_refresh    called after the token has been refreshed
+        '''
+        self.name = name
+        self.on_refresh = on_refresh
+        self.identity_type = None
+        self.pyrax = {}
+        # cache and completion states while the context is not active
+        self.cache = None
+        self.completion = None
+        self.used = time.time()
+    
+    def activate(self):
+        '''
+        make this context the pyrax state of the current session
+        '''
+        if self.identity_type != None:
+            pyrax.set_setting('identity_type', self.identity_type)
+        current().pyrax.update(self.pyrax)
+        self.used = time.time()
+    
+    def capture(self):
+        '''
+        save the pyrax state of the current session in this context
+        '''
+        self.identity_type = pyrax.get_setting('identity_type')
+        self.pyrax = dict(current().pyrax)
+    
+    def is_valid(self):
+        '''
+        check if the token is not about to expire
+        '''
+        identity = self.pyrax.get('identity')
+        if identity == None or not identity.authenticated:
+            return False
+        if not isinstance(identity.expires, datetime.datetime):
+            return True
+        return (identity.expires - datetime.datetime.now() >
+                datetime.timedelta(seconds=AUTH_EXPIRY_MARGIN))
+
+
+@SessionSingleton
+class IdentityPool:
+    '''
+    pool of authenticated accounts, to switch among them without calling the
+    API
+    
+    The active context lives in the pyrax state of the session (see
+    'context.Context'), 'Cache' and 'Completion'; switching swaps them with
+    the ones saved in the target context. At most 'max_size' contexts are
+    kept, least recently used ones are evicted first.
+    '''
+    
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        self.max_size = IDENTITY_POOL_SIZE
+        self.current = None
+        # name --> IdentityContext, in LRU order
+        self._contexts = OrderedDict()
+        # pyrax state saved while an account which is not pooled
+        # authenticates (see 'switch')
+        self._previous = None
+        self._lock = threading.RLock()
+    
+    def __contains__(self, name):
+        return name in self._contexts
+    
+    def __len__(self):
+        return len(self._contexts)
+    
+    def add(self, name, on_refresh=None):
+        '''
+        add the current pyrax state as context 'name', with empty caches, and
+        make it current (see 'switch')
+        '''
+        with self._lock:
+            cache = Cache.Instance().swap()  # @UndefinedVariable
+            completion = Completion.Instance().swap()  # @UndefinedVariable
+            previous = self._contexts.get(self.current)
+            if previous != None:
+                # state before the authentication of 'name'
+                if self._previous != None:
+                    previous.identity_type = self._previous.identity_type
+                    previous.pyrax = self._previous.pyrax
+                previous.cache = cache
+                previous.completion = completion
+            self._previous = None
+            ctx = IdentityContext(name, on_refresh)
+            ctx.capture()
+            self._contexts.pop(name, None)
+            self._contexts[name] = ctx
+            self.current = name
+            while len(self._contexts) > max(self.max_size, 1):
+                evicted, _ = self._contexts.popitem(last=False)
+                logging.debug('identity \'%s\' evicted from pool' % evicted)
+        return ctx
+    
+    def list(self):
+        '''
+        return pooled contexts, least recently used first
+        '''
+        with self._lock:
+            return self._contexts.values()
+    
+    def remove(self, name):
+        '''
+        drop context 'name'
+        '''
+        with self._lock:
+            self._contexts.pop(name, None)
+            if self.current == name:
+                self.current = None
+    
+    def restore(self):
+        '''
+        reinstall the pyrax state saved by 'switch', i.e.: the account which
+        was not pooled failed to authenticate
+        '''
+        with self._lock:
+            if self._previous != None:
+                self._previous.activate()
+                self._previous = None
+    
+    def switch(self, name):
+        '''
+        make context 'name' current, return True
+        
+        If 'name' is not pooled (or its token is about to expire), the pyrax
+        state is saved and False is returned: the caller is expected to
+        authenticate and call 'add', which installs empty caches, or
+        'restore' if the authentication fails.
+        '''
+        with self._lock:
+            if name == self.current and name in self._contexts:
+                return True
+            ctx = self._contexts.get(name)
+            if ctx != None and not ctx.is_valid():
+                logging.debug('identity \'%s\' expired' % name)
+                self.remove(name)
+                ctx = None
+            if ctx == None:
+                self._previous = IdentityContext(self.current)
+                self._previous.capture()
+                return False
+            self._save(ctx)
+            ctx.activate()
+            ctx.cache = ctx.completion = None
+            self._contexts[name] = self._contexts.pop(name)
+            self.current = name
+            TokenRefresh.Instance().install(  # @UndefinedVariable
+                ctx.pyrax['identity'], ctx.on_refresh)
+            logging.debug('switched to identity \'%s\'' % name)
+            return True
+    
+    def _save(self, ctx):
+        '''
+        save the current context, and install caches of 'ctx'
+        '''
+        cache = Cache.Instance().swap(ctx and ctx.cache)  # @UndefinedVariable
+        completion = Completion.Instance().swap(  # @UndefinedVariable
+            ctx and ctx.completion)
+        current = self._contexts.get(self.current)
+        if current != None:
+            current.capture()
+            current.cache = cache
+            current.completion = completion
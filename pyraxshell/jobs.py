@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import itertools
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from context import current
+from globals import JOBS_HISTORY
+from singleton import SessionSingleton
+
+
+class JobCancelled(Exception):
+    '''
+    raised by 'JobManager.check' in a cancelled job
+    '''
+
+
+class Job(object):
+    '''
+    long-running operation owned by the JobManager, i.e.: a command run in
+    background ('&'), the foreground command, a resource being polled
+    
+    Cancellation is cooperative: 'cancel()' sets a flag that the operation
+    checks ('cancelled()', 'JobManager.check'), and calls 'on_cancel' if the
+    operation is not run by a thread of its own (i.e.: a Poller watch).
+    '''
+    
+    def __init__(self, _id, name, on_cancel=None, progress=None):
+        '''
+        Constructor
+        
+        name         description, i.e.: command line
+        on_cancel    callable run by 'cancel()'
+        progress     callable returning a progress description
+        '''
+        self.id = _id
+        self.name = name
+        self.status = 'running'
+        self.result = None
+        self.exc_info = None
+        self.started = time.time()
+        self.finished = None
+        self.on_cancel = on_cancel
+        self._progress = progress
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+    
+    def __repr__(self):
+        return '<Job %s %s %s>' % (self.id, self.name, self.status)
+    
+    def cancel(self):
+        '''
+        request the job to stop
+        '''
+        if self.done():
+            return
+        self._cancel.set()
+        if self.on_cancel != None:
+            try:
+                self.on_cancel()
+            except:
+                logging.debug(traceback.format_exc())
+    
+    def cancelled(self):
+        return self._cancel.is_set()
+    
+    def done(self):
+        return self._done.is_set()
+    
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+    
+    def finish(self, status='done', result=None, exc_info=None):
+        '''
+        mark the job as finished, 'cancelled' if it was cancelled
+        '''
+        if self.done():
+            return
+        self.status = 'cancelled' if self.cancelled() else status
+        self.result = result
+        self.exc_info = exc_info
+        self.finished = time.time()
+        self._done.set()
+    
+    def progress(self):
+        if self._progress == None:
+            return ''
+        try:
+            return self._progress()
+        except:
+            return '?'
+    
+    def wait(self, timeout=None):
+        '''
+        wait for the job, return True if it is finished
+        
+        The wait is made of short waits, so that CTRL-C interrupts it.
+        '''
+        deadline = None if timeout == None else time.time() + timeout
+        while not self._done.is_set():
+            left = 0.2 if deadline == None else min(deadline - time.time(),
+                                                    0.2)
+            if left <= 0:
+                break
+            self._done.wait(left)
+        return self._done.is_set()
+
+
+class JobThread(threading.Thread):
+    '''
+    thread running a background job
+    '''
+    
+    def __init__(self, manager, job, fn, args, kwargs):
+        threading.Thread.__init__(self)
+        self.setName('job-%d' % job.id)
+        self.setDaemon(True)
+        self.manager = manager
+        self.job = job
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.context = current()
+    
+    def run(self):
+        with self.context:
+            self.manager.run(self.job, self.fn, *self.args, **self.kwargs)
+        if self.job.exc_info != None:
+            logging.error(''.join(traceback.format_exception(
+                                                        *self.job.exc_info)))
+
+
+@SessionSingleton
+class JobManager:
+    '''
+    registry of the long-running operations of the session
+    
+    i.e.:
+    
+        job = JobManager.Instance().start('servers list', lib.list)
+        job.wait()
+    
+    Operations run elsewhere (i.e.: Poller watches) are registered with
+    'track()' and finished by their owner. Finished jobs are listed until
+    JOBS_HISTORY more recent ones have finished.
+    '''
+    
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        # job of the current thread
+        self._local = threading.local()
+    
+    def attach(self, job):
+        '''
+        make 'job' the job of the current thread (i.e.: a WorkerPool task
+        run for it), return the previous one
+        '''
+        previous = self.current()
+        self._local.job = job
+        return previous
+    
+    def cancel(self, _id):
+        '''
+        cancel job '_id', return False if it does not exist
+        '''
+        job = self.get(_id)
+        if job == None:
+            return False
+        job.cancel()
+        return True
+    
+    def cancel_all(self):
+        for job in self.list():
+            job.cancel()
+    
+    def check(self):
+        '''
+        raise JobCancelled if the job of the current thread is cancelled
+        '''
+        job = self.current()
+        if job != None and job.cancelled():
+            raise JobCancelled(job.name)
+    
+    def current(self):
+        '''
+        return the job run by the current thread, or None
+        '''
+        return getattr(self._local, 'job', None)
+    
+    def foreground(self, name):
+        '''
+        return a job run by the current thread until it is released, i.e.:
+        the command being typed; it is not listed, CTRL-C cancels it
+        '''
+        job = Job(None, name)
+        job.previous = self.current()
+        self._local.job = job
+        return job
+    
+    def get(self, _id):
+        with self._lock:
+            return self._jobs.get(int(_id))
+    
+    def list(self):
+        '''
+        return jobs sorted by id, finished ones included
+        '''
+        with self._lock:
+            return [self._jobs[k] for k in sorted(self._jobs)]
+    
+    def release(self, job):
+        '''
+        finish foreground 'job'
+        '''
+        job.finish()
+        if self.current() is job:
+            self._local.job = getattr(job, 'previous', None)
+    
+    def run(self, job, fn, *args, **kwargs):
+        '''
+        run fn(*args, **kwargs) as 'job' in the current thread, and finish it
+        with its outcome
+        '''
+        previous = self.current()
+        self._local.job = job
+        try:
+            result = fn(*args, **kwargs)
+            job.finish('done', result)
+        except JobCancelled:
+            job.finish('cancelled')
+        except:
+            logging.debug(traceback.format_exc())
+            job.finish('failed', exc_info=sys.exc_info())
+        finally:
+            self._local.job = previous
+    
+    def start(self, name, fn, *args, **kwargs):
+        '''
+        run fn(*args, **kwargs) in a thread of its own, return its Job
+        '''
+        job = self.track(name)
+        JobThread(self, job, fn, args, kwargs).start()
+        return job
+    
+    def track(self, name, on_cancel=None, progress=None):
+        '''
+        register an operation run by the caller, who calls 'finish()' on
+        the returned Job
+        '''
+        with self._lock:
+            job = Job(next(self._ids), name, on_cancel, progress)
+            self._jobs[job.id] = job
+            finished = sorted(j.id for j in self._jobs.values() if j.done())
+            for _id in finished[:max(len(finished) - JOBS_HISTORY, 0)]:
+                del self._jobs[_id]
+        return job
@@ -15,14 +15,344 @@
 # You should have received a copy of the GNU General Public License
 # along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
 
+import copy
+import logging
+import pyrax
 
+from context import contextual, current, install
+from globals import BULK_CONCURRENCY, DNS_BULK_CONCURRENCY
+from plugins.libauth import LibAuth
+from plugins.libdatabases import LibDatabases
+from plugins.libdns import LibDNS
+from plugins.libloadbalancers import LibLoadBalancers
+from plugins.libservers import LibServers
+import zonefile
+
+
+class LibpyraxshellError(Exception):
+    '''
+    raised when an operation of Libpyraxshell fails
+    '''
+
+
+def to_dict(obj):
+    '''
+    return the attributes of API object 'obj' as a dictionary (pyrax and
+    novaclient resources keep them in '_info')
+    '''
+    if obj == None or isinstance(obj, dict):
+        return obj
+    info = getattr(obj, '_info', None)
+    if isinstance(info, dict):
+        return copy.deepcopy(info)
+    return dict((k, v) for k, v in vars(obj).items()
+                if not k.startswith('_') and k not in ('manager', 'parent'))
+
+
+@contextual
 class Libpyraxshell:
     '''
     pyraxshell library
+    
+    In-process API over the plugin libraries, returning dictionaries instead
+    of printing tables. Caches and authentication are the ones of the session
+    context (see 'context.Context'), by default the one of the shell running
+    in the same process, i.e.:
+    
+        lib = Libpyraxshell()
+        lib.switch_account('acme')
+        for s in lib.list_servers():
+            print s['name'], s['status']
+    
+    independent sessions have a context each:
+    
+        acme = Libpyraxshell(Context('acme'))
+        acme.switch_account('acme')
+        other = Libpyraxshell(Context('other'))
+        other.switch_account('other')
     '''
 
-    def __init__(self):
+    def __init__(self, context=None):
         '''
         Constructor
+        
+        context    session context, methods run in it (default: the current
+                   one)
+        '''
+        install()
+        self.context = context or current()
+        self.auth = LibAuth(self.context)
+        self.databases = LibDatabases(self.context)
+        self.dns = LibDNS(self.context)
+        self.loadbalancers = LibLoadBalancers(self.context)
+        self.servers = LibServers(self.context)
+        # messages of the libraries are logged, not printed
+        for lib in (self.auth, self.databases, self.dns, self.loadbalancers,
+                    self.servers):
+            lib.r = self._r
+    
+    @property
+    def aio(self):
+        '''
+        asynchronous version of this library (see 'aio'), its methods
+        return Call futures
+        '''
+        if getattr(self, '_aio', None) == None:
+            from aio import AsyncLibpyraxshell
+            self._aio = AsyncLibpyraxshell(self)
+        return self._aio
+    
+    def _r(self, retcode, msg, log_level):
+        logging.debug('libpyraxshell: %s (retcode:%s)' % (msg, retcode))
+    
+    def _check(self, result, msg):
+        if not result:
+            raise LibpyraxshellError(msg)
+        return result
+    
+    # ########################################
+    # AUTHENTICATION
+    
+    def authenticate(self, credentials_file=None):
+        '''
+        authenticate with a pyrax credentials file (default: ~/.pyrax.cfg)
+        
+        @raise LibpyraxshellError
+        '''
+        self._check(self.auth.authenticate_credentials_file(credentials_file),
+                    'authentication with credentials file failed')
+    
+    def identity(self):
+        '''
+        return the current identity: username, tenant_id, tenant_name,
+        region, regions, authenticated; None if not authenticated
+        '''
+        i = self.context.identity
+        if i == None or not i.authenticated:
+            return None
+        return {'username': i.username, 'tenant_id': i.tenant_id,
+                'tenant_name': i.tenant_name, 'region': i.region,
+                'regions': list(i.regions), 'authenticated': i.authenticated}
+    
+    def is_authenticated(self):
+        return self.identity() != None
+    
+    def list_accounts(self):
+        '''
+        return the accounts of ACCOUNTS_FILE
+        '''
+        return self.auth.list_accounts()
+    
+    def login(self, username, apikey, region=pyrax.default_region,
+              identity_type='rackspace'):
+        '''
+        authenticate with username and api-key
+        
+        @raise LibpyraxshellError
+        '''
+        self._check(self.auth.authenticate_login(identity_type, username,
+                                                 apikey, region),
+                    'authentication with login failed')
+    
+    def switch_account(self, stanza):
+        '''
+        make account 'stanza' of ACCOUNTS_FILE current (see 'auth account')
+        
+        @raise LibpyraxshellError
+        '''
+        self._check(self.auth.switch_account(stanza),
+                    "cannot switch to account '%s'" % stanza)
+    
+    # ########################################
+    # SERVERS
+    
+    def create_server(self, name, flavor_id, image_id, notify=None):
+        '''
+        create a server, return it ('adminPass' included)
+        
+        notify    called with (server, old_state, state) while it builds
+        '''
+        server = self.servers.create_server(
+                        name, flavor_id, image_id,
+                        notify=notify or (lambda server, old, state: None))
+        d = to_dict(server)
+        d['adminPass'] = server.adminPass
+        return d
+    
+    def create_servers(self, names, flavor_id, image_id,
+                       concurrency=BULK_CONCURRENCY):
+        '''
+        create servers 'names', return the ServerBuildJob tracking them (see
+        its 'servers' and 'done()')
+        
+        @raise AdmissionError
+        '''
+        return self.servers.create_servers(names, flavor_id, image_id,
+                                           concurrency)
+    
+    def delete_server(self, _id):
+        self.servers.delete_server(_id)
+    
+    def get_server(self, _id):
+        '''
+        return server '_id', None if it does not exist
+        '''
+        try:
+            return to_dict(self.servers.get_by_id(_id))
+        except IndexError:
+            return None
+    
+    def list_flavors(self):
+        return [to_dict(f) for f in self.servers.list_cloudservers_flavors()]
+    
+    def list_images(self):
+        return [to_dict(i) for i in self.servers.list_cloudservers_images()]
+    
+    def list_servers(self):
+        return [to_dict(s) for s in self.servers.list_cloudservers()]
+    
+    # ########################################
+    # DNS
+    
+    def create_domain(self, name, email_address, ttl=900, comment=''):
+        '''
+        create domain 'name', return it
+        
+        @raise LibpyraxshellError
+        '''
+        return to_dict(self._check(
+                    self.dns.create_domain(name, email_address, ttl, comment),
+                    "cannot create domain '%s'" % name))
+    
+    def delete_domain(self, name):
+        '''
+        @raise LibpyraxshellError
+        '''
+        self._check(self.dns.delete_domain(name),
+                    "cannot delete domain '%s'" % name)
+    
+    def delete_records(self, domain, _type=None, name=None, data=None,
+                       concurrency=DNS_BULK_CONCURRENCY):
+        '''
+        delete the records of 'domain' matching every given attribute (all
+        but SOA and NS records if none is given), return the outcome (see
+        'record_job')
+        '''
+        dom = self._domain(domain)
+        exclude = () if _type or name or data else ('SOA', 'NS')
+        records = self.dns.find_records(dom, _type, name, data, exclude)
+        return self.record_job(self.dns.bulk_records('delete', dom, records,
+                                                     concurrency))
+    
+    def get_domain(self, name):
+        '''
+        return domain 'name', None if it does not exist
+        '''
+        return to_dict(self.dns.get_domain_by_name(name) or None)
+    
+    def import_records(self, path, origin=None, ttl=None,
+                       concurrency=DNS_BULK_CONCURRENCY):
+        '''
+        add the records of zone or CSV file 'path' (see 'zonefile'), return
+        the outcome (see 'record_job')
+        
+        @raise AdmissionError, IOError, ValueError
+        '''
+        records = zonefile.read_records(path, origin, ttl)
+        return self.record_job(self.dns.import_records(records, concurrency))
+    
+    def list_domains(self):
+        return [to_dict(d) for d in self.dns.list_domains()]
+    
+    def list_records(self, domain, _type=None, name=None, data=None):
+        '''
+        return the records of 'domain' matching every given attribute
+        '''
+        return [to_dict(r) for r in self.dns.find_records(
+                                    self._domain(domain), _type, name, data)]
+    
+    def record_job(self, job):
+        '''
+        return the outcome of RecordJob 'job': {'action', 'target',
+        'requests', 'succeeded': [record], 'failed': [(record, error)]}
+        '''
+        return {'action': job.action, 'target': job.target,
+                'requests': job.requests,
+                'succeeded': [to_dict(r) for r in job.succeeded()],
+                'failed': [(to_dict(r), str(e)) for r, e in job.failed()]}
+    
+    def update_records(self, domain, _type=None, name=None, data=None,
+                       concurrency=DNS_BULK_CONCURRENCY, **changes):
+        '''
+        update the records of 'domain' matching every given attribute with
+        'changes' (i.e.: ttl=300), return the outcome (see 'record_job')
+        '''
+        dom = self._domain(domain)
+        records = self.dns.find_records(dom, _type, name, data,
+                                        ('SOA', 'NS'))
+        return self.record_job(self.dns.bulk_records('update', dom, records,
+                                                     concurrency, **changes))
+    
+    def _domain(self, name):
+        return self._check(self.dns.get_domain_by_name(name),
+                           "cannot find domain '%s'" % name)
+    
+    # ########################################
+    # LOAD-BALANCERS
+    
+    def get_loadbalancer(self, _id):
+        '''
+        return load-balancer '_id', None if it does not exist
+        '''
+        return to_dict(self.loadbalancers.get_loadbalancer_by_id(_id))
+    
+    def list_algorithms(self):
+        return list(self.loadbalancers.list_algorithms())
+    
+    def list_loadbalancers(self):
+        return [to_dict(lb) for lb in self.loadbalancers.list_loadbalancers()]
+    
+    def list_nodes(self, _id):
+        '''
+        return the nodes of load-balancer '_id'
+        
+        @raise LibpyraxshellError
+        '''
+        lb = self._check(self.loadbalancers.get_loadbalancer_by_id(_id),
+                         "cannot find load-balancer id:%s" % _id)
+        return [to_dict(n) for n in lb.nodes]
+    
+    def list_protocols(self):
+        return list(self.loadbalancers.list_protocols())
+    
+    # ########################################
+    # DATABASES
+    
+    def create_db_instance(self, name, flavor_id, volume):
+        '''
+        create a Cloud Databases instance, return it
+        '''
+        return to_dict(self.databases.create_instance(name, flavor_id,
+                                                      volume))
+    
+    def get_db_instance(self, _id):
+        '''
+        return Cloud Databases instance '_id', None if it does not exist
+        '''
+        return to_dict(self.databases.get_instance_by_id(_id))
+    
+    def list_databases(self, instance_id):
+        '''
+        return the databases of Cloud Databases instance 'instance_id'
+        
+        @raise LibpyraxshellError
         '''
-        pass
+        instance = self._check(self.databases.get_instance_by_id(instance_id),
+                               "cannot find db instance id:%s" % instance_id)
+        return [to_dict(db) for db in instance.list_databases()]
+    
+    def list_db_flavors(self):
+        return [to_dict(f) for f in self.databases.list_instance_flavors()]
+    
+    def list_db_instances(self):
+        return [to_dict(i) for i in self.databases.list_instances()]
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import itertools
+import threading
+
+from collections import OrderedDict
+
+
+class Mailbox(object):
+    '''
+    bounded message queue keeping only the latest message per key
+    
+    Producers put a message under a key (i.e.: the id of the server being
+    built), a message replaces the pending one with the same key, so the
+    consumer always gets the current state and the queue holds at most one
+    message per job. When the mailbox is full the oldest message is dropped.
+    
+    The consumer blocks in 'get' on a condition variable, and is woken as
+    soon as a message is put.
+    '''
+    
+    def __init__(self, size):
+        '''
+        Constructor
+        
+        size    maximum number of pending messages
+        '''
+        self.size = max(int(size), 1)
+        self._messages = OrderedDict()
+        self._cond = threading.Condition()
+        self._closed = False
+        # unique keys of messages without a key
+        self._counter = itertools.count()
+        self._stats = {'put': 0, 'delivered': 0, 'coalesced': 0, 'dropped': 0,
+                       'max_depth': 0}
+    
+    def close(self):
+        '''
+        wake up consumers, 'get' does not wait any longer
+        '''
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+    
+    def empty(self):
+        return self.qsize() == 0
+    
+    def get(self, timeout=None):
+        '''
+        remove and return the oldest pending message, waiting up to
+        'timeout' seconds (default: until a message is put or the mailbox is
+        closed)
+        
+        @return    message, or None if none is pending
+        '''
+        with self._cond:
+            if not self._messages and not self._closed:
+                self._cond.wait(timeout)
+            if not self._messages:
+                return None
+            self._stats['delivered'] += 1
+            return self._messages.popitem(last=False)[1]
+    
+    def metrics(self):
+        '''
+        return a dictionary with keys: depth, size, put, delivered,
+        coalesced, dropped, max_depth
+        '''
+        with self._cond:
+            d = dict(self._stats)
+            d['depth'] = len(self._messages)
+            d['size'] = self.size
+            return d
+    
+    def put(self, msg, key=None):
+        '''
+        put 'msg', replacing the pending message with the same 'key' (if
+        any), messages without key are never coalesced
+        '''
+        if key == None:
+            key = ('', next(self._counter))
+        with self._cond:
+            self._stats['put'] += 1
+            if key in self._messages:
+                # the pending message keeps its position in the queue
+                self._stats['coalesced'] += 1
+            elif len(self._messages) >= self.size:
+                self._messages.popitem(last=False)
+                self._stats['dropped'] += 1
+            self._messages[key] = msg
+            self._stats['max_depth'] = max(self._stats['max_depth'],
+                                           len(self._messages))
+            self._cond.notify()
+    
+    def qsize(self):
+        with self._cond:
+            return len(self._messages)
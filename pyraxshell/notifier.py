@@ -16,7 +16,6 @@
 # along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
 
 import threading
-import time
 
 from globals import msg_queue
 from utility import print_top_right
@@ -26,14 +25,16 @@ class Notifier(threading.Thread):
     '''
     A consumer class which get stuff from the Message Queue 'msg_queue'
     
-    By default Notifier poll the queue every second, get messages, and
-    print them one at a time. For the time being 'Producers' should not put
-    more that one message per second on the queue
+    Notifier sleeps until a message is put on the queue ('Mailbox'), and
+    prints messages one at a time, each one is displayed for at least
+    'polltime' seconds. Producers put messages with a key, so a job
+    notifying its progress often has one pending message at most
     '''
     def __init__(self, polltime=1):
         self.polltime = polltime
         # 'terminate' causes the thread to stop
         self._terminate = False
+        self._stop = threading.Event()
 #         threading.Thread.setName('notifier')
         threading.Thread.__init__(self)
  
@@ -44,14 +45,16 @@ class Notifier(threading.Thread):
     @terminate.setter
     def terminate(self, value=True):
         self._terminate = value
+        if value:
+            self._stop.set()
+            msg_queue.close()
            
     def run(self):
-        while True:
-            # pop an item from the queue, if any
-            if not msg_queue.empty():
-                print_top_right(msg_queue.get())
-            if self._terminate == True:
-                break
-            time.sleep(self.polltime)
+        while not self._terminate:
+            msg = msg_queue.get()
+            if msg != None:
+                print_top_right(msg)
+                # keep the message on screen, unless terminating
+                self._stop.wait(self.polltime)
         
         
@@ -15,10 +15,164 @@
 # You should have received a copy of the GNU General Public License
 # along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
 
+import logging
+import pyrax
+import pyrax.exceptions as exc
+import traceback
+
+from cache import LISTING
+from catalog import Catalog
+from collections import OrderedDict
+from context import current
+from globals import CATALOG_TTL
+from httppool import HTTPPool
 from utility import l
+from workerpool import WorkerPool
+
+# pyrax functions connecting to a service in a given region
+REGION_CLIENTS = {
+    'cloud_databases'       : 'connect_to_cloud_databases',
+    'cloud_dns'             : 'connect_to_cloud_dns',
+    'cloud_loadbalancers'   : 'connect_to_cloud_loadbalancers',
+    'cloudservers'          : 'connect_to_cloudservers',
+}
 
 
-class Lib():
+class Lib(object):
+    
+    def __init__(self, context=None):
+        '''
+        Constructor
+        
+        context    session context: configuration, identity, clients and
+                   caches (default: the current one)
+        '''
+        self.context = context or current()
+    
+    @property
+    def cache(self):
+        '''
+        cache shared by all libraries of the session
+        '''
+        return self.context.cache
+    
+    def cached(self, collection, key, loader):
+        '''
+        return cached object (collection, key), call 'loader()' on miss
+        '''
+        return self.cache.get_or_load(collection, key, loader)
+    
+    def cache_listing(self, collection, objects, key=lambda o: o.id):
+        '''
+        cache the listing of 'collection', and every object in it by 'key'
+        
+        return objects
+        '''
+        self.cache.set(collection, LISTING, objects)
+        for o in objects:
+            self.cache.set(collection, key(o), o)
+        self.cache.index(collection, objects, key)
+        self.context.completion.feed(collection, objects)
+        return objects
+    
+    def catalog(self, name, loader):
+        '''
+        return catalog 'name' (i.e.: flavors, images), from cache or from the
+        persistent catalog if possible, call 'loader()' otherwise
+        '''
+        def load():
+            catalog = Catalog.Instance()  # @UndefinedVariable
+            objects = catalog.fetch(name, loader)
+            self.context.completion.feed(name, objects)
+            return objects
+        return self.cached(name, LISTING, load)
+    
+    def fan_out(self, service, regions, fn):
+        '''
+        call fn(client) with the client of 'service' in every region of
+        'regions' concurrently
+        
+        return (results, errors), where results is {region: fn(client)} and
+        errors is {region: error message}, both ordered as 'regions'
+        '''
+        pool = WorkerPool(len(regions), 'region')
+        tasks = [(r, pool.submit(
+                  lambda r: fn(self.region_client(service, r)), r))
+                 for r in regions]
+        pool.shutdown()
+        results, errors = OrderedDict(), OrderedDict()
+        for region, task in tasks:
+            try:
+                results[region] = task.get()
+            except Exception as e:
+                logging.debug('region %s: %s' % (region, e))
+                errors[region] = str(e) or e.__class__.__name__
+        return results, errors
+    
+    def invalidate(self, collection, key=LISTING):
+        '''
+        invalidate cached object (collection, key) after a mutation, and the
+        listing of 'collection' (persistent catalog included)
+        '''
+        self.cache.invalidate(collection, key)
+        if collection in CATALOG_TTL:
+            Catalog.Instance().invalidate(collection)  # @UndefinedVariable
+    
+    def list_regions(self, regions):
+        '''
+        return list of regions from a comma separated list of regions, or
+        every region of the service catalog if 'regions' is 'all'
+        '''
+        if regions.lower() == 'all':
+            return sorted(self.context.regions or
+                          self.context.identity.regions)
+        return [r.strip().upper() for r in regions.split(',') if r.strip()]
+    
+    def region_client(self, service, region):
+        '''
+        return the client of 'service' (i.e.: 'cloudservers') in 'region'
+        '''
+        client = self.cache.get('region_clients', '%s:%s' % (service, region))
+        if client == None:
+            connect = getattr(pyrax, REGION_CLIENTS[service])
+            with self.context:
+                client = HTTPPool.Instance().attach(  # @UndefinedVariable
+                        connect(region=region))
+            if client == None:
+                raise exc.ServiceNotAvailable('%s is not available in %s' %
+                                              (service, region))
+            self.cache.set('region_clients', '%s:%s' % (service, region),
+                           client)
+        return client
+    
+    def resolve(self, collection, _id, get, not_found=(exc.NotFound,)):
+        '''
+        return object '_id' of 'collection', or None if it does not exist
+        
+        The cache is searched first, then the object is fetched with a single
+        'get(_id)' request (per-resource GET endpoint); if that request fails,
+        the index built from the last listing is used.
+        
+        not_found    exceptions raised by 'get' when '_id' does not exist
+        '''
+        obj = self.cache.get(collection, _id)
+        if obj != None:
+            return obj
+        try:
+            obj = get(_id)
+        except not_found:
+            self.cache.forget(collection, _id)
+            return None
+        except Exception:
+            logging.debug(traceback.format_exc())
+            obj = self.cache.lookup(collection, _id)
+            if obj == None:
+                raise
+            logging.warn('cannot get %s id:%s, using last listing' %
+                         (collection, _id))
+            return obj
+        self.cache.set(collection, _id, obj)
+        return obj
     
     def r(self, retcode, msg, log_level):
         '''
@@ -15,16 +15,36 @@
 # You should have received a copy of the GNU General Public License
 # along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
 
+import functools
 import logging
 import os.path
 import pprint
 from prettytable import PrettyTable
 import pyrax
+import subprocess
+import sys
+import threading
 import traceback
 
-from account import Account
-from globals import ERROR, INFO, WARN, DEBUG
+from authstore import AuthStore, digest
+from globals import ERROR, INFO, WARN, DEBUG, EACH_ACCOUNT_CONCURRENCY
+from identitypool import IdentityPool
+from jobs import JobCancelled, JobManager
 from plugins.lib import Lib
+from tokenrefresh import TokenRefresh
+from workerpool import WorkerPool
+
+
+def authenticating(fn):
+    '''
+    run method 'fn' in the context of the library, one authentication at a
+    time (pyrax settings are process-wide)
+    '''
+    @functools.wraps(fn)
+    def wrapped(self, *args, **kwargs):
+        with self.context.authenticating():
+            return fn(self, *args, **kwargs)
+    return wrapped
 
 
 class LibAuth(Lib):
@@ -40,26 +60,135 @@ class LibAuth(Lib):
         return dictionary based on stanza alias from ACOUNTS_FILE
         '''
         out = {}
-        a = Account.Instance()
-        a.parse_config_file()
+        a = self.context.account
+        a.refresh()
         out['identity_type'] = a.get_param(stanza, 'OS_AUTH_SYSTEM')
         out['username'] = a.get_param(stanza, 'OS_USERNAME')
         out['apikey'] = a.get_param(stanza, 'OS_PASSWORD')
         out['region'] = a.get_param(stanza, 'OS_REGION_NAME')
         return out
     
+    @authenticating
+    def switch_account(self, stanza):
+        '''
+        make account 'stanza' current, reusing its identity, clients and caches
+        if it is pooled (no API call), authenticating otherwise
+        
+        @return    True if successful, False otherwise
+        '''
+        pool = IdentityPool.Instance()  # @UndefinedVariable
+        if pool.switch(stanza):
+            cmd_out = "switched to account '%s'" % stanza
+            self.r(0, cmd_out, INFO)
+            return True
+        account = self.get_account(stanza)
+        if not self.authenticate_login(**account):
+            # the session goes on with the identity it had
+            pool.restore()
+            return False
+        key = self.login_key(account['identity_type'], account['username'],
+                             account['apikey'], account['region'])
+        pool.add(stanza, on_refresh=lambda: AuthStore().put(
+            key, self.context.identity, account['region']))
+        return True
+    
     def list_accounts(self):
         '''
         return a list of accounts defined in ACCOUNTS_FILE
         '''
-        a = Account.Instance()
-        a.parse_config_file()
+        a = self.context.account
+        a.refresh()
         return a.list_stanzas()
     
     
+    def command_lines(self, command, plugins=()):
+        '''
+        return the shell input running 'command', commands are separated by
+        ',' as in 'pyraxcli', and '<plugin> <cmd>' is expanded to enter and
+        leave the plugin, i.e.:
+        
+        'servers list, dns list_domains' -->
+            ['servers', 'list', 'EOF', 'dns', 'list_domains', 'EOF']
+        '''
+        lines = []
+        for c in command.split(','):
+            words = c.split(None, 1)
+            if not words:
+                continue
+            if len(words) == 2 and words[0] in plugins:
+                lines.extend([words[0], words[1], 'EOF'])
+            else:
+                lines.append(c.strip())
+        return lines
+    
+    def each_account(self, lines, stanzas=None,
+                     concurrency=EACH_ACCOUNT_CONCURRENCY, out=None):
+        '''
+        run shell input 'lines' against every account in 'stanzas' (default:
+        all accounts in ACCOUNTS_FILE), at most 'concurrency' at a time
+        
+        Every account runs in its own pyraxshell process (as 'pyraxcli'
+        does), hence pyrax global state is never shared, and accounts
+        authenticate in parallel. Output lines are passed to
+        out(stanza, line) as soon as they are read.
+        
+        @return    (succeeded, failed), lists of stanzas
+        '''
+        if stanzas == None:
+            stanzas = self.list_accounts()
+        lock = threading.Lock()
+        if out == None:
+            def out(stanza, line):
+                with lock:
+                    sys.__stdout__.write('[%s] %s\n' % (stanza, line))
+                    sys.__stdout__.flush()
+        owner = JobManager.Instance().current()  # @UndefinedVariable
+        
+        def run(stanza):
+            if owner != None and owner.cancelled():
+                raise JobCancelled('cancelled')
+            return self.run_account(stanza, lines, out)
+        pool = WorkerPool(concurrency, 'account')
+        tasks = [(s, pool.submit(run, s)) for s in stanzas]
+        pool.shutdown()
+        succeeded, failed = [], []
+        for stanza, task in tasks:
+            try:
+                ok = task.get()
+            except:
+                # i.e.: cannot start the process, other accounts go on
+                out(stanza, 'failed: %s' % sys.exc_info()[1])
+                ok = False
+            (succeeded if ok else failed).append(stanza)
+        return succeeded, failed
+    
+    def run_account(self, stanza, lines, out):
+        '''
+        authenticate as account 'stanza' in a new pyraxshell process, and
+        feed it 'lines'
+        
+        @return    True if no command failed (exit status 0), False otherwise
+        '''
+        this_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        process = subprocess.Popen([sys.executable, this_dir],
+                                   stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT)
+        process.stdin.write('auth\naccount %s\nEOF\n' % stanza)
+        for line in lines:
+            process.stdin.write('%s\n' % line)
+        process.stdin.close()
+        for line in iter(process.stdout.readline, ''):
+            line = line.rstrip()
+            if line:
+                out(stanza, line)
+        return process.wait() == 0
+    
+    
     # ########################################
     # AUTHENTICATE
     
+    @authenticating
     def authenticate_credentials_file(self, credentials_file=None):
         '''
         authenticate with Rackspace Cloud
@@ -88,9 +217,15 @@ class LibAuth(Lib):
                            % file_locations)
                 self.r(1, cmd_out, WARN)
                 return False
+        key = self.file_key(self.credentials_file)
+        if self.restore_session(key, pyrax.get_setting('identity_type'), None,
+                setup=lambda i: i.set_credential_file(self.credentials_file)):
+            self.r(0, "authenticated", DEBUG)
+            return True
         try:
             pyrax.set_credential_file(self.credentials_file)
             self.r(0, "authenticated", DEBUG)
+            self.save_session(key, None)
             return self.is_authenticated()
         except pyrax.exceptions.AuthenticationFailed:
             cmd_out = 'authentication with credentials file failed'
@@ -106,6 +241,7 @@ class LibAuth(Lib):
             self.r(1, cmd_out, WARN)
         return True
     
+    @authenticating
     def authenticate_login(self,
                            identity_type = "rackspace",
                            username = None,
@@ -117,17 +253,26 @@ class LibAuth(Lib):
         logging.debug('authenticating with login'
                       '(identity_type:%s, username:%s, api-key:%s, region=%s)'
                       % (identity_type, username, apikey, region))
+        key = self.login_key(identity_type, username, apikey, region)
+        if self.restore_session(key, identity_type, region,
+                setup=lambda i: i.set_credentials(username, apikey,
+                                                  region=region)):
+            cmd_out = "authentication with login successful (persisted token)"
+            self.r(0, cmd_out, INFO)
+            return True
         try:
             pyrax.set_setting("identity_type", identity_type)
             pyrax.set_credentials(username, apikey, region = region)
             cmd_out = "authentication with login successful"
             self.r(0, cmd_out, INFO)
+            self.save_session(key, region)
             return self.is_authenticated()
         except pyrax.exceptions.AuthenticationFailed:
             cmd_out = "authentication with login failed"
             self.r(1, cmd_out, WARN)
             return False
     
+    @authenticating
     def authenticate_token(self, token, tenantId, region,
                            identity_type='rackspace'):
         '''authenticate with Rackspace Cloud
@@ -136,20 +281,110 @@ class LibAuth(Lib):
         
         tenantId: see top-right --> NAME (#XXX)
         '''
+        key = 'token:%s:%s' % (tenantId, region)
+        if self.restore_session(key, identity_type, region, token=token):
+            return True
         logging.debug('setting identity_type=%s' % identity_type)
         pyrax.set_setting("identity_type", identity_type)
         logging.debug('authenticating with token:%s, tenantId:%s, region:%s ' %
                       (token, tenantId, region))
         try:
             pyrax.auth_with_token(token, tenantId, region=region)
+            self.save_session(key, region)
         except:
             tb = traceback.format_exc()
             self.r(1, tb, ERROR)
     
+    def file_key(self, credentials_file):
+        '''
+        return the AuthStore entry of 'credentials_file', changing with its
+        content
+        '''
+        try:
+            with open(credentials_file) as f:
+                content = f.read()
+        except IOError:
+            content = ''
+        return 'file:%s:%s' % (os.path.abspath(credentials_file),
+                               digest(content))
+    
+    def login_key(self, identity_type, username, apikey, region):
+        '''
+        return the AuthStore entry of a login, changing with 'apikey'
+        '''
+        return 'login:%s:%s:%s:%s' % (identity_type, username, region,
+                                      digest(apikey))
+    
+    def restore_session(self, key, identity_type, region, setup=None,
+                        token=None):
+        '''
+        authenticate reusing token and service catalog persisted by
+        'save_session', without calling the identity endpoint
+        
+        key         AuthStore entry, see 'login_key' and 'file_key'
+        setup       called with the new identity before connecting to the
+                    services, i.e.: to set credentials used to re-authenticate
+                    when the token expires
+        token       if given, the persisted token must match it
+        
+        @return    True if successful, False otherwise
+        '''
+        entry = AuthStore().get(key)
+        if entry == None or (token != None and entry['token'] != token):
+            return False
+        try:
+            pyrax.set_setting("identity_type", identity_type)
+            # a fresh identity object of 'identity_type'
+            identity = self.context.create_identity()
+            if setup != None:
+                setup(identity)
+            identity.token = entry['token']
+            identity.expires = entry['expires']
+            identity.tenant_id = entry['tenant_id']
+            identity.tenant_name = entry['tenant_name']
+            identity.services = entry['services']
+            identity.user = entry['user']
+            identity.username = entry['username']
+            identity.regions = set(entry['regions'])
+            identity.authenticated = True
+            self.context.connect_to_services(region=region)
+            logging.debug('reusing persisted token \'%s\'' % key)
+            self.start_token_refresh(key, region)
+            return self.is_authenticated()
+        except:
+            tb = traceback.format_exc()
+            logging.debug(tb)
+            logging.warn('cannot reuse persisted token \'%s\'' % key)
+            AuthStore().remove(key)
+            return False
+    
+    def save_session(self, key, region):
+        '''
+        persist token and service catalog of the current identity, see
+        'restore_session', and keep the token refreshed in background
+        '''
+        try:
+            if self.context.identity.authenticated:
+                self.start_token_refresh(key, region)
+                return AuthStore().put(key, self.context.identity, region)
+        except AttributeError:
+            logging.debug(traceback.format_exc())
+        return False
+    
+    def start_token_refresh(self, key, region):
+        '''
+        refresh the token of the current identity before it expires, and
+        persist the new one as 'key' (see 'TokenRefresh')
+        '''
+        identity = self.context.identity
+        TokenRefresh.Instance().install(  # @UndefinedVariable
+            identity,
+            on_refresh=lambda: AuthStore().put(key, identity, region))
+    
     def is_authenticated(self):
         '''whether or not the user is authenticated'''
         try:
-            if pyrax.identity.authenticated:
+            if self.context.identity.authenticated:
                 cmd_out = "user is authenticated"
                 self.r(0, cmd_out, DEBUG)
                 return True
@@ -164,7 +399,7 @@ class LibAuth(Lib):
     
     def get_token(self):
         '''return the token issued by Rackspace Cloud'''
-        return pyrax.identity.auth_token
+        return self.context.identity.auth_token
 
     def print_pt_identity_info(self):
         '''
@@ -174,14 +409,15 @@ class LibAuth(Lib):
 #        interactively: print pt
 #        non-interactively: print JSON
         if self.is_authenticated():
+            identity = self.context.identity
             pt = PrettyTable(['key', 'value'])
-            pt.add_row(['auth token', pyrax.identity.auth_token])
-            pt.add_row(['authenticated', pyrax.identity.authenticated])
-            pt.add_row(['region', pyrax.identity.region])
-            pt.add_row(['regions', ','.join(r for r in pyrax.identity.regions)])
-            pt.add_row(['username', pyrax.identity.username])
-            pt.add_row(['tenant id', pyrax.identity.tenant_id])
-            pt.add_row(['tenant name', pyrax.identity.tenant_name])
+            pt.add_row(['auth token', identity.auth_token])
+            pt.add_row(['authenticated', identity.authenticated])
+            pt.add_row(['region', identity.region])
+            pt.add_row(['regions', ','.join(r for r in identity.regions)])
+            pt.add_row(['username', identity.username])
+            pt.add_row(['tenant id', identity.tenant_id])
+            pt.add_row(['tenant name', identity.tenant_name])
             pt.align['key'] = 'l'
             pt.align['value'] = 'l'
             pt.get_string(sortby='key')
@@ -193,7 +429,7 @@ class LibAuth(Lib):
     # ########################################
     # ENDPOINTS
     def list_endpoints(self):
-        return pyrax.identity.services
+        return self.context.identity.services
     
     # ########################################
     # REGION
@@ -201,7 +437,7 @@ class LibAuth(Lib):
         '''
         return default region defined in pyrax
         '''
-        return pyrax.default_region
+        return self.context.default_region
             
 #     def default_region(self):
 #         '''
@@ -214,9 +450,9 @@ class LibAuth(Lib):
         return the region for which user is currently authenticated
         '''
         try:
-            cmd_out = "region: %s" % pyrax.identity.region
+            cmd_out = "region: %s" % self.context.identity.region
             self.r(0, cmd_out, INFO)
-            return pyrax.identity.region
+            return self.context.identity.region
         except:
             tb = traceback.format_exc()
             self.r(1, tb, ERROR)
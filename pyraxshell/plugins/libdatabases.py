@@ -16,80 +16,55 @@
 # along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
 
 import logging
-import pyrax
-import threading
-import time
 
-from globals import msg_queue, INFO, POLL_TIME
+from globals import msg_queue, ERROR, INFO
+from plugins.lib import Lib
+from poller import Poller
 
 
-class InstanceCreatorThread (threading.Thread):
+class LibDatabases(Lib):
     '''
-    thread to create a Cloud Databases instance
+    pyraxshell database library
     '''
     
-    def __init__(self, _name, flavor_id, volume, poll_time=POLL_TIME):
-        '''
-        Constructor
-        
-        _name       Cloud Databases Instance name
-        flavor_id   Cloud Databases Instance flavour id
-        volume      Cloud Databases Instance volume
-        poll_time   polling server creation progress in seconds
+    # ########################################
+    # CLOUD DATABASES - INSTANCES
+    def create_instance(self, name, flavor_id, volume):
         '''
-        threading.Thread.__init__(self)
-        self._name = _name
-        self.flavor_id = flavor_id
-        self.volume = volume
-        self.poll_time = poll_time
-        logging.debug('thread name:%s, instance name:%s, flavor_id:%s,'
-                      ' volume:%s'
-                      % (self.getName, _name, flavor_id, volume))
-        self._terminate = False
-    
-    def run(self):
+        create a Cloud Databases instance and return it; progress and
+        completion are notified by the Poller
         '''
-        create a server, wait for completion, 
-        aka server status in ('ACTIVE', 'ERROR', 'UNKNOWN')
+        cdb = self.context.cloud_databases
+        cdbi = cdb.create(name, flavor=int(flavor_id), volume=volume)
+        self.invalidate('db_instances', cdbi.id)
         
-        poll_time    polling time waiting for completion in seconds
-        '''
-        logging.debug("Starting %s" % self.name)
-        statuses = ['ACTIVE', 'ERROR', 'UNKNOWN']
-        cdb = pyrax.cloud_databases
-        cdbi = cdb.create(self._name, flavor=int(self.flavor_id),
-                          volume=self.volume)
-        logging.debug('polling Cloud database instance creation progress (%d)' % self.poll_time)
-        while cdbi.status not in statuses:
-            if self._terminate == True:
-                logging.debug("terminating thread %s" % self.name)
+        def notify(cdbi, old_state, state):
+            if cdbi == None:
+                cmd_out = 'Error. db instance \'%s\' disappeared' % name
+                self.r(1, cmd_out, ERROR)
                 return
-            time.sleep(1)
-            if int(time.time()) % self.poll_time == 0:
-                # mitigate polling server creation progress 
-                cdbi.get()
-                logging.debug('server \'%s\', status:%s' % (cdbi.name,
-                                                            cdbi.status))
-            msg_queue.put('db instance \'%s\': %s' % (cdbi.name, cdbi.status))
-        cdbi.get()
-        msg = 'server \'%s\', status:%s' % (cdbi.name, cdbi.status)
-        self.r(0, msg, INFO)
-
-
-class LibDatabases(object):
-    '''
-    pyraxshell database library
-    '''
+            msg_queue.put('db instance \'%s\': %s' % (cdbi.name, cdbi.status),
+                          ('db_instances', cdbi.id))
+            if cdbi.status in ('ACTIVE', 'ERROR', 'UNKNOWN'):
+                self.invalidate('db_instances', cdbi.id)
+                msg = 'db instance \'%s\', status:%s' % (cdbi.name,
+                                                         cdbi.status)
+                self.r(0, msg, INFO)
+        
+        Poller.Instance().watch('db_instances', cdbi.id, notify,  # @UndefinedVariable
+                                cdb.list)
+        return cdbi
     
-    # ########################################
-    # CLOUD DATABASES - INSTANCES
     def get_instance_by_id(self, instance_id):
         '''
         return cloud databases instance specified by id
         '''
-        cdb = pyrax.cloud_databases
+        cdb = self.context.cloud_databases
         try:
-            return [cdbi for cdbi in cdb.list() if cdbi.id == instance_id][0]
+            cdbi = self.resolve('db_instances', instance_id, cdb.get)
+            if cdbi == None:
+                raise IndexError
+            return cdbi
         except IndexError:
             logging.error('cannot find cloud databases instance id:%s' %
                           instance_id)
@@ -103,8 +78,22 @@ class LibDatabases(object):
         '''
         return cloud databases instance flavour by id
         '''
-        cdb = pyrax.cloud_databases
-        return [f for f in cdb.list_flavors() if f.flavor.id == flavor_id][0]
+        return [f for f in self.list_instance_flavors()
+                if str(f.id) == str(flavor_id)][0]
+    
+    def list_instance_flavors(self):
+        '''
+        return cloud databases instance flavours, from catalog if possible
+        '''
+        cdb = self.context.cloud_databases
+        return self.catalog('db_flavors', cdb.list_flavors)
+    
+    def list_instances(self):
+        '''
+        return cloud databases instances, always fetched, and cache them
+        '''
+        cdb = self.context.cloud_databases
+        return self.cache_listing('db_instances', cdb.list())
 
     # ########################################
     # CLOUD DATABASES - DATABASES
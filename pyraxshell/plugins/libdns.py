@@ -16,12 +16,68 @@
 # along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
 
 import logging
-import pyrax
+from prettytable import PrettyTable
 import pyrax.exceptions as exc
+import threading
+import time
 import traceback
 
+from cache import LISTING
+from collections import OrderedDict
+from domaintrie import DomainTrie
+from globals import DNS_BATCH_SIZE, DNS_BULK_CONCURRENCY, ERROR, INFO
+from jobs import JobManager
+from plugins.lib import Lib
+from plugins.liblimits import LibLimits
+from workerpool import WorkerPool
 
-class LibDNS(object):
+
+class RecordJob(object):
+    '''
+    bulk operation ('add', 'delete' or 'update') on DNS records, and its
+    outcome per record
+    '''
+    
+    def __init__(self, action, target, records, changes=None):
+        '''
+        Constructor
+        
+        action     'add', 'delete' or 'update'
+        target     description of the records, i.e.: domain name
+        records    CloudDNSRecord list, or record dictionaries to add
+        changes    attributes to update, i.e.: {'ttl': 300}
+        '''
+        self.action = action
+        self.target = target
+        self.changes = changes or {}
+        self.started = time.time()
+        self.requests = 0
+        # id(record) --> (record, error), error is None on success
+        self.results = OrderedDict((id(r), (r, 'not done')) for r in records)
+        self._lock = threading.Lock()
+        # command running the job, batches are skipped once it is cancelled
+        self.owner = JobManager.Instance().current()  # @UndefinedVariable
+    
+    def cancelled(self):
+        return self.owner != None and self.owner.cancelled()
+    
+    def done(self, records, error=None):
+        with self._lock:
+            for r in records:
+                self.results[id(r)] = (r, error)
+    
+    def failed(self):
+        return [(r, e) for r, e in self.results.values() if e != None]
+    
+    def request(self):
+        with self._lock:
+            self.requests += 1
+    
+    def succeeded(self):
+        return [r for r, e in self.results.values() if e == None]
+
+
+class LibDNS(Lib):
     '''
     pyraxshell DNS library
     '''
@@ -29,35 +85,212 @@ class LibDNS(object):
     # ########################################
     # DNS
     
+    def count_records(self, domain):
+        '''
+        return the number of records of 'domain' with a single request, 0 if
+        it cannot be fetched
+        '''
+        try:
+            resp, body = self.context.cloud_dns.method_get(  # @UnusedVariable
+                    '/domains/%s/records?limit=1' % domain.id)
+            return body['totalEntries']
+        except:
+            logging.debug(traceback.format_exc())
+            logging.warn("cannot count records of domain '%s'" % domain.name)
+            return 0
+    
     def create_domain(self, domain_name, email_address, ttl, comment):
         '''
-        create a domain
+        create a domain, return it or False on failure
         '''
         try:
             logging.debug('creating dns domain name:%s, emailAddress:%s,'
                           'ttl:%s, comment:%s' %
                           (domain_name, email_address, ttl, comment))
-            dns = pyrax.cloud_dns
+            dns = self.context.cloud_dns
             dom = dns.create(name = domain_name,
                              emailAddress = email_address,
                              ttl = ttl,
                              comment = comment)
             logging.info("domain created: %s" % dom)
-            return True
+            self.invalidate('domains', domain_name)
+            self.cache.set('domains', domain_name, dom)
+            self.get_domain_trie().add(domain_name)
+            return dom
         except exc.DomainCreationFailed as e:
             logging.error("domain creation failed: %s" % e)
             return False
         except Exception as e:
             logging.error("error: %s" % e)
             return False
+    
+    def bulk_records(self, action, domain, records,
+                     concurrency=DNS_BULK_CONCURRENCY, **changes):
+        '''
+        delete or update 'records' of 'domain' in batches of DNS_BATCH_SIZE
+        records (one API request each), at most 'concurrency' requests at a
+        time
+        
+        A failing batch is retried one record at a time to find out which
+        records failed.
+        
+        action     'delete' or 'update'
+        changes    update only, i.e.: ttl=300, data='1.2.3.4'
+        
+        @return    RecordJob
+        '''
+        job = RecordJob(action, domain.name, records, changes)
+        self._run_job(job, [(domain, records)], concurrency)
+        return job
+    
+    def _run_job(self, job, records, concurrency):
+        '''
+        run 'job' on [(domain, records)] in batches of DNS_BATCH_SIZE
+        records, at most 'concurrency' batches at a time (fewer when the
+        rate limit headroom is lower)
+        '''
+        if records:
+            method = {'add': 'POST', 'delete': 'DELETE'}.get(job.action, 'PUT')
+            concurrency = LibLimits(self.context).pool_size(
+                    'dns', method, '/domains/%s/records' % records[0][0].id,
+                    concurrency)
+        pool = WorkerPool(concurrency, 'dns')
+        for domain, recs in records:
+            for i in range(0, len(recs), DNS_BATCH_SIZE):
+                pool.submit(self._run_batch, job, domain,
+                            recs[i:i + DNS_BATCH_SIZE])
+        pool.shutdown()
+        for domain, _ in records:
+            self.invalidate('domains', domain.name)
+    
+    def _run_batch(self, job, domain, batch):
+        '''
+        run 'job' on a batch of records with a single request, or a request
+        per record if the batched one fails or cannot be sent
+        
+        A batch timing out may have completed server-side, it is not retried:
+        its records fail with the timeout. A record already gone when deleted
+        on its own counts as deleted.
+        '''
+        if job.cancelled():
+            job.done(batch, 'cancelled')
+            return
+        dns = self.context.cloud_dns
+        if job.action == 'add' or self._async_call(dns) != None:
+            try:
+                if job.action == 'add':
+                    self._request(job, dns.add_records, domain, batch)
+                elif job.action == 'delete':
+                    self._request(job, self._delete_records, dns, domain,
+                                  batch)
+                else:
+                    self._request(job, self._update_records, dns, domain,
+                                  batch, job.changes)
+                job.done(batch)
+                return
+            except exc.DNSCallTimedOut as e:
+                job.done(batch, str(e) or e.__class__.__name__)
+                return
+            except Exception as e:
+                logging.debug('batch of %d records failed: %s' %
+                              (len(batch), e))
+                if len(batch) == 1:
+                    job.done(batch, str(e) or e.__class__.__name__)
+                    return
+        for r in batch:
+            if job.cancelled():
+                job.done([r], 'cancelled')
+                continue
+            try:
+                if job.action == 'add':
+                    self._request(job, dns.add_records, domain, [r])
+                elif job.action == 'delete':
+                    self._request(job, dns.delete_record, domain, r)
+                else:
+                    self._request(job, dns.update_record, domain, r,
+                                **job.changes)
+                job.done([r])
+            except exc.NotFound as e:
+                if job.action == 'delete':
+                    # i.e.: deleted by the batch which failed
+                    job.done([r])
+                else:
+                    job.done([r], str(e) or e.__class__.__name__)
+            except Exception as e:
+                job.done([r], str(e) or e.__class__.__name__)
+    
+    def _request(self, job, fn, *args, **kwargs):
+        '''
+        call fn(*args, **kwargs), counting it as a request of 'job' (rate
+        limits and retries are handled by 'RateLimiter')
+        '''
+        job.request()
+        return fn(*args, **kwargs)
+    
+    def _async_call(self, dns):
+        '''
+        return the function sending the bulk record requests of the Cloud DNS
+        API, or None if 'dns' does not have it
+        
+        pyrax has no public bulk delete or update of records: this is the
+        private 'CloudDNSManager._async_call' of pyrax 1.5.0, without it
+        records are deleted and updated one by one ('delete_record',
+        'update_record').
+        '''
+        try:
+            return dns._manager._async_call
+        except AttributeError:
+            logging.debug('no bulk record requests in this pyrax version')
+            return None
+    
+    def _delete_records(self, dns, domain, records):
+        '''
+        delete records with a single request
+        '''
+        uri = '/domains/%s/records?%s' % (domain.id,
+                                          '&'.join('id=%s' % r.id
+                                                   for r in records))
+        return self._async_call(dns)(
+                    uri, method='DELETE',
+                    error_class=exc.DomainRecordDeletionFailed,
+                    has_response=False)
+    
+    def _update_records(self, dns, domain, records, changes):
+        '''
+        update records with a single request
+        '''
+        body = {'records': [dict(changes, id=r.id, name=r.name)
+                            for r in records]}
+        return self._async_call(dns)(
+                    '/domains/%s/records' % domain.id, method='PUT',
+                    body=body, error_class=exc.DomainRecordUpdateFailed,
+                    has_response=False)
+    
+    def delete_domain(self, domain_name):
+        '''
+        delete a domain, return True, or False if it does not exist
+        '''
+        dom = self.get_domain_by_name(domain_name)
+        if not dom:
+            return False
+        dom.delete()
+        self.invalidate('domains', domain_name)
+        self.cache.forget('domains', domain_name)
+        self.get_domain_trie().remove(domain_name)
+        return True
 
     def get_domain_by_name(self, domain_name):
         '''
         return domain by name
         '''
         try:
-            cdns = pyrax.cloud_dns
-            domain =  [d for d in cdns.list() if d.name == domain_name][0]
+            domain = self.cache.get('domains', domain_name)
+            if domain == None:
+                # listing caches every domain by name
+                self.list_domains()
+                domain = self.cache.get('domains', domain_name)
+            if domain == None:
+                raise IndexError
             return domain
         except IndexError:
             logging.error('cannot find domain name: \'%s\'' % domain_name)
@@ -67,19 +300,102 @@ class LibDNS(object):
             logging.error(tb)
             return False
 
+    def get_domain_trie(self):
+        '''
+        return the suffix trie of the account domain names, from cache if
+        possible
+        '''
+        trie = self.cache.get('domain_trie', LISTING)
+        if trie == None:
+            trie = DomainTrie(self.list_domain_names())
+            self.cache.set('domain_trie', LISTING, trie,
+                           self.cache.get_ttl('domains'))
+        return trie
+    
+    def find_records(self, domain, _type=None, name=None, data=None,
+                     exclude_types=()):
+        '''
+        return records of domain matching every given attribute
+        '''
+        dns = self.context.cloud_dns
+        return [r for r in dns.get_record_iterator(domain)
+                if r.type not in exclude_types and
+                (_type == None or r.type == _type) and
+                (name == None or r.name == name) and
+                (data == None or r.data == data)]
+    
     def get_domains(self):
         '''
+        return domains, from cache if possible
+        '''
+        domains = self.cache.get('domains', LISTING)
+        if domains == None:
+            domains = self.list_domains()
         return domains
+    
+    def import_records(self, records, concurrency=DNS_BULK_CONCURRENCY):
         '''
-        dns = pyrax.cloud_dns
-        return dns.list()
+        add 'records' (dictionaries, see 'zonefile') to their nearest domain,
+        creating missing subdomains once
+        
+        Records are grouped by domain and added in batches of DNS_BATCH_SIZE
+        records per request, i.e.: 5000 records of a domain take 50 requests
+        instead of listing domains and adding records 5000 times.
+        
+        Nothing is created if the new subdomains, or the records of a
+        domain (existing and new ones), exceed the account absolute limits.
+        
+        @raise     AdmissionError
+        @return    RecordJob
+        '''
+        trie = self.get_domain_trie()
+        job = RecordJob('add', '', records)
+        # domain name --> records
+        by_domain = OrderedDict()
+        # missing subdomain --> nearest existing domain
+        subdomains = {}
+        for rec in records:
+            nearest = trie.nearest(rec['name'])
+            if not nearest:
+                job.done([rec], 'no matching domain')
+                continue
+            missing = self.missing_subdomains(rec['name'], nearest)
+            if missing == None:
+                job.done([rec], "not within domain '%s'" % nearest)
+                continue
+            for sub in missing:
+                subdomains[sub] = nearest
+            by_domain.setdefault(missing[0] if missing else nearest,
+                                 []).append(rec)
+        # records of a domain once imported
+        totals = [0]
+        for name, recs in by_domain.items():
+            dom = name not in subdomains and self.get_domain_by_name(name)
+            totals.append(len(recs) + (self.count_records(dom) if dom else 0))
+        LibLimits(self.context).admit('dns', domains=len(subdomains),
+                                      records_per_domain=max(totals))
+        # shallowest first, each subdomain needs its parent
+        for sub in sorted(subdomains, key=lambda d: d.count('.')):
+            parent = self.get_domain_by_name(subdomains[sub])
+            if parent:
+                self.create_domain(sub, parent.emailAddress, parent.ttl, '')
+        batches = []
+        for name, recs in by_domain.items():
+            dom = self.get_domain_by_name(name)
+            if dom:
+                batches.append((dom, recs))
+            else:
+                job.done(recs, "cannot create domain '%s'" % name)
+        job.target = '%d domains' % len(batches)
+        self._run_job(job, batches, concurrency)
+        return job
     
     def is_parent(self, record, domain):
         '''
-        check if record is a child of domain
+        check if record is a child of domain, names are case-insensitive
         '''
-        record_tokens = record.split('.')
-        domain_tokens = domain.split('.')
+        record_tokens = record.lower().split('.')
+        domain_tokens = domain.lower().split('.')
         if len(record_tokens) <= len(domain_tokens):
             return False
         for i in range(1, len(domain_tokens) + 1):
@@ -91,8 +407,19 @@ class LibDNS(object):
         '''
         return list of domain names
         '''
-        dns = pyrax.cloud_dns
-        return [d.name for d in dns.list()]
+        return [d.name for d in self.get_domains()]
+    
+    def list_domains(self):
+        '''
+        return domains, always fetched, and cache them by name
+        '''
+        dns = self.context.cloud_dns
+        domains = self.cache_listing('domains', dns.list(),
+                                     key=lambda d: d.name)
+        self.cache.set('domain_trie', LISTING,
+                       DomainTrie([d.name for d in domains]),
+                       self.cache.get_ttl('domains'))
+        return domains
     
     def missing_subdomains(self, record, domain):
         '''return missing subdomains as a difference between given record and
@@ -103,28 +430,25 @@ class LibDNS(object):
         record    DNS record as string
         domain    domain as string
         
-        return None if record is not within domain
+        return None if record is not within domain, subdomains are lowercase
+        as domain names are case-insensitive
         '''
+        record, domain = record.lower(), domain.lower()
         if record == domain:
             return []
         if not self.is_parent(record, domain):
             return None
-        record_tokens = record.split('.')
-        domain_tokens = domain.split('.')
-        diff = record_tokens[1:]
-        for i in range(1, len(domain_tokens) + 1):
-            if domain_tokens[-i] != record_tokens[-i]:
-                return False
-            diff.pop()
-        for i in range(len(diff)):
-            for j in range(0, i):
-                diff[j] += '.' + diff[-i]
-        for i in range(len(diff)):
-            diff[i] = diff[i] + '.' + domain
+        # labels between record and domain, record label excluded
+        labels = record[:-len(domain) - 1].split('.')[1:]
+        diff = []
+        name = domain
+        for label in reversed(labels):
+            name = '%s.%s' % (label, name)
+            diff.insert(0, name)
         return diff
         
     
-    def nearest_domain(self, record, domains):
+    def nearest_domain(self, record, domains=None):
         '''return the nearest domain in domains for record
         
         
@@ -137,26 +461,38 @@ class LibDNS(object):
         return 'bar.example.com'
         
         record    DNS record as string
-        domains   list of domains as string
-        '''
-        biggest_match = 0
-        actual_domain = ""
-        for domain in domains:
-            domparts = domain.split(".")
-            recparts = record.split(".")
-            domparts.reverse()
-            i = len(recparts)-1
-            matches = 0
-            for dompart in domparts:
-                if recparts[i] == dompart:
-                    matches +=1
-                i -= 1
-            domain_num_tokens = len(domain.split('.'))
-            if (matches >= biggest_match) and (matches >= domain_num_tokens):
-                biggest_match = matches
-                actual_domain = domain
-        msg = lambda s1, s2, s3: ("record '%s', domains:'%s', the nearest "
-                                  "domain:'%s'" % (s1, s2, s3))
-        logging.debug(msg(record, ', '.join([d for d in domains]),
-                          actual_domain))
+        domains   list of domains as string (default: account domains,
+                  looked up in the cached domain trie)
+        '''
+        if domains == None:
+            trie = self.get_domain_trie()
+        else:
+            trie = DomainTrie(domains)
+        actual_domain = trie.nearest(record) or ""
+        logging.debug("record '%s', the nearest domain:'%s'" %
+                      (record, actual_domain))
         return actual_domain
+    
+    def print_pt_record_job(self, job):
+        '''
+        print the outcome of every record of a bulk operation
+        '''
+        pt = PrettyTable(['name', 'type', 'data', 'ttl', 'result'])
+        for r, error in job.results.values():
+            if isinstance(r, dict):
+                # records to add
+                row = [r.get(k, '') for k in ('name', 'type', 'data', 'ttl')]
+            else:
+                row = [r.name, r.type, r.data, r.ttl]
+            pt.add_row(row + ['ok' if error == None else error])
+        pt.align['name'] = 'l'
+        pt.align['data'] = 'l'
+        pt.align['result'] = 'l'
+        failed = job.failed()
+        if job.results:
+            self.r(0, str(pt), INFO)
+        cmd_out = ("%s %d records in '%s': %d ok, %d failed (%d requests, "
+                   "%ds)" % (job.action, len(job.results), job.target,
+                             len(job.results) - len(failed), len(failed),
+                             job.requests, time.time() - job.started))
+        self.r(1 if failed else 0, cmd_out, ERROR if failed else INFO)
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+from prettytable import PrettyTable
+import traceback
+
+from collections import OrderedDict
+from globals import INFO, WARN
+from plugins.lib import Lib
+from ratelimit import RateLimiter
+
+# service --> RateLimiter service name of its client
+RATE_LIMIT_SERVICES = {
+    'compute'       : 'compute',
+    'databases'     : 'rax:database',
+    'dns'           : 'rax:dns',
+    'loadbalancers' : 'rax:load-balancer',
+}
+
+# absolute limits of compute: resource --> (limit name, usage name)
+COMPUTE_LIMITS = OrderedDict([
+    ('instances', ('maxTotalInstances', 'totalInstancesUsed')),
+    ('ram', ('maxTotalRAMSize', 'totalRAMUsed')),
+    ('cores', ('maxTotalCores', 'totalCoresUsed')),
+    ('private_networks', ('maxTotalPrivateNetworks', 'totalPrivateNetworksUsed')),
+])
+
+
+class AdmissionError(Exception):
+    '''
+    raised when a bulk operation would exceed the account absolute limits
+    '''
+
+
+class LibLimits(Lib):
+    '''
+    pyraxshell absolute limits library
+    
+    Absolute limits (quotas) and current usage are fetched per service, and
+    cached ('limits' collection), as {resource: (limit, used)}, where 'used'
+    is None when the API does not report it and limits are None when
+    unlimited.
+    '''
+    
+    SERVICES = ('compute', 'loadbalancers', 'dns', 'databases')
+    
+    def admit(self, service, **needed):
+        '''
+        check that 'needed' resources (i.e.: instances=10, ram=20480) are
+        available in 'service', with fresh limits and usage
+        
+        Resources without limit, or limits which cannot be fetched, are not
+        checked.
+        
+        @raise AdmissionError
+        '''
+        try:
+            limits = self.get_limits(service, refresh=True)
+        except:
+            logging.debug(traceback.format_exc())
+            logging.warn('cannot check %s limits' % service)
+            return
+        short = []
+        for resource, amount in needed.items():
+            limit, used = limits.get(resource, (None, None))
+            if limit == None or limit < 0:
+                continue
+            left = limit - (used or 0)
+            if amount > left:
+                short.append('%s: %s needed, %s left (limit: %s)' %
+                             (resource, amount, max(left, 0), limit))
+        if short:
+            raise AdmissionError('%s limits exceeded, %s' %
+                                 (service, ', '.join(sorted(short))))
+    
+    def get_limits(self, service, refresh=False):
+        '''
+        return absolute limits and usage of 'service' (see SERVICES), from
+        cache unless 'refresh'
+        '''
+        if refresh:
+            self.cache.forget('limits', service)
+        return self.cached('limits', service,
+                           getattr(self, '_%s_limits' % service))
+    
+    def pool_size(self, service, method, path, wanted):
+        '''
+        return the number of concurrent requests 'method path' of 'service'
+        (at most 'wanted'), within the rate limit headroom left
+        '''
+        key = (getattr(self.context.identity, 'tenant_id', None),
+               RATE_LIMIT_SERVICES[service])
+        headroom = RateLimiter.Instance().headroom(key, method,  # @UndefinedVariable
+                                                   path)
+        if headroom == None:
+            return wanted
+        size = max(min(wanted, headroom), 1)
+        if size < wanted:
+            logging.debug('%s %s: pool size %d, rate limit headroom %d' %
+                          (method, path, size, headroom))
+        return size
+    
+    def _compute_limits(self):
+        absolute = dict((l.name, l.value) for l in
+                        self.context.cloudservers.limits.get().absolute)
+        out = OrderedDict()
+        for resource, (limit, used) in COMPUTE_LIMITS.items():
+            if limit in absolute:
+                out[resource] = (absolute[limit], absolute.get(used))
+        return out
+    
+    def _databases_limits(self):
+        cdb = self.context.cloud_databases
+        resp, body = cdb.method_get('/limits')  # @UnusedVariable
+        out = OrderedDict()
+        for l in body.get('limits', []):
+            if l.get('verb') != 'ABSOLUTE':
+                continue
+            for k, v in sorted(l.items()):
+                if k.startswith('max_'):
+                    out[k[4:]] = (v, None)
+        if 'instances' in out:
+            out['instances'] = (out['instances'][0], len(cdb.list()))
+        return out
+    
+    def _dns_limits(self):
+        dns = self.context.cloud_dns
+        absolute = dns.get_absolute_limits() or {}
+        out = OrderedDict()
+        if 'domains' in absolute:
+            out['domains'] = (absolute['domains'], len(dns.list()))
+        if 'records per domain' in absolute:
+            out['records_per_domain'] = (absolute['records per domain'], None)
+        return out
+    
+    def _loadbalancers_limits(self):
+        clb = self.context.cloud_loadbalancers
+        resp, body = clb.method_get(  # @UnusedVariable
+                                    '/loadbalancers/absolutelimits')
+        absolute = dict((l['name'], l['value'])
+                        for l in body.get('absolute', []))
+        out = OrderedDict()
+        if 'LOADBALANCER_LIMIT' in absolute:
+            out['loadbalancers'] = (absolute['LOADBALANCER_LIMIT'],
+                                    len(clb.list()))
+        for name, value in sorted(absolute.items()):
+            if name != 'LOADBALANCER_LIMIT':
+                out[name.lower().replace('_limit', '')] = (value, None)
+        return out
+    
+    def print_pt_limits(self, services=SERVICES):
+        '''
+        print absolute limits and usage of 'services'
+        '''
+        pt = PrettyTable(['service', 'resource', 'limit', 'used', 'left'])
+        for service in services:
+            try:
+                limits = self.get_limits(service)
+            except:
+                logging.debug(traceback.format_exc())
+                self.r(0, 'cannot fetch %s limits' % service, WARN)
+                continue
+            for resource, (limit, used) in limits.items():
+                left = ''
+                if limit != None and limit >= 0 and used != None:
+                    left = limit - used
+                pt.add_row([service, resource, limit,
+                            '' if used == None else used, left])
+        pt.align['service'] = 'l'
+        pt.align['resource'] = 'l'
+        self.r(0, str(pt), INFO)
@@ -16,10 +16,12 @@
 # along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
 
 import logging
-import pyrax
 import pyrax.exceptions as exc
 
-class LibLoadBalancers(object):
+from plugins.lib import Lib
+
+
+class LibLoadBalancers(Lib):
     '''
     pyraxshell load-balancers library
     '''
@@ -30,14 +32,13 @@ class LibLoadBalancers(object):
     def get_loadbalancer_by_id(self, _id):
         '''
         return Cloud load-balancer instance specified by id
-        
-        this should be replaced by 'clb.get(id)'
-        see: https://github.com/rackspace/pyrax/blob/master/docs/cloud_loadbalancers.md#working-with-load-balancers
-        but problems with 'do_details'
         '''
-        clb = pyrax.cloud_loadbalancers
+        clb = self.context.cloud_loadbalancers
         try:
-            return [lb for lb in clb.list() if lb.id == int(_id)][0]
+            lb = self.resolve('loadbalancers', int(_id), clb.get)
+            if lb == None:
+                raise IndexError
+            return lb
         except IndexError:
             logging.error('cannot find Cloud loadbalancer with id:%s' % _id)
             return None
@@ -45,12 +46,44 @@ class LibLoadBalancers(object):
             logging.error('error searching Cloud loadbalancer by id:%s' % _id)
             return None
     
+    def get_node_count(self, lb):
+        '''
+        return the number of nodes of Cloud load-balancer 'lb'
+        
+        listed load-balancers carry 'nodeCount', whereas the ones returned by
+        'clb.get(id)' carry the whole 'nodes' list
+        '''
+        if hasattr(lb, 'nodeCount'):
+            return lb.nodeCount
+        return len(getattr(lb, 'nodes', []))
+    
+    def list_algorithms(self):
+        '''
+        return Cloud load-balancers algorithms, from catalog if possible
+        '''
+        clb = self.context.cloud_loadbalancers
+        return self.catalog('lb_algorithms', lambda: clb.algorithms)
+    
+    def list_protocols(self):
+        '''
+        return Cloud load-balancers protocols, from catalog if possible
+        '''
+        clb = self.context.cloud_loadbalancers
+        return self.catalog('lb_protocols', lambda: clb.protocols)
+    
+    def list_loadbalancers(self):
+        '''
+        return Cloud load-balancers, always fetched, and cache them
+        '''
+        clb = self.context.cloud_loadbalancers
+        return self.cache_listing('loadbalancers', clb.list())
+    
     def get_node_by_id(self, loadbalancer_id, node_id):
         '''
         return Cloud load-balancer node
         '''
         try:
-            clb = pyrax.cloud_loadbalancers
+            clb = self.context.cloud_loadbalancers
             lb = clb.get(loadbalancer_id)
             return [node for node in lb.nodes if node.id == int(node_id)][0]
         except IndexError:
@@ -17,103 +17,135 @@
 
 import logging
 from prettytable import PrettyTable
-import pyrax
+import pyrax.exceptions as exc
 import threading
 import time
 
+from collections import OrderedDict
 from globals import msg_queue, INFO, ERROR
+from jobs import JobManager
 from plugins.lib import Lib
-from utility import get_ip_family, get_uuid
+from plugins.liblimits import LibLimits
+from poller import Poller, status_progress
+from utility import get_ip_family, is_ipv4
+from workerpool import WorkerPool
 
 
-class ServerCreatorThread (threading.Thread):
+class ServerBuildJob(object):
     '''
-    thread to create a CouldServers
+    bulk creation of servers, tracked as a single job with aggregated
+    progress and a final summary
     '''
     
-    def __init__(self, name, flavor_id, image_id, poll_time,
-                 threadID = get_uuid()):
+    # statuses of servers which are not going to change
+    FINAL = ('ACTIVE', 'ERROR', 'UNKNOWN', 'FAILED', 'GONE')
+    
+    def __init__(self, names, lib):
         '''
         Constructor
         
-        name        CloudServer name
-        flavor_id   CloudServer flavour id
-        image_id    CloudServer image id
-        poll_time   polling server creation progress in seconds
-        '''
-        threading.Thread.__init__(self)
-        self.threadID = threadID
-        self.name = name
-        self.flavor_id = flavor_id
-        self.image_id = image_id
-        self.poll_time = poll_time
-        logging.debug('thread id:%s, server name:%s, flavor_id:%s, image_id:%s'
-                      % (threadID, name, flavor_id, image_id))
-        # 'terminate' causes the thread to stop
-        self._terminate = False
-    
-    def run(self):
-        '''
-        create a server, wait for completion, 
-        aka server status in ('ACTIVE', 'ERROR', 'UNKNOWN')
-        
-        poll_time    polling time waiting for completion in seconds
-        '''
-        logging.debug("Starting %s" % self.threadID)
-        statuses = ['ACTIVE', 'ERROR', 'UNKNOWN']
-        cs = pyrax.cloudservers
-        server = cs.servers.create(self.name, self.image_id, self.flavor_id)
-        logging.debug('polling server creation progress (%d)' % self.poll_time)
-        while server.status not in statuses:
-            if self._terminate == True:
-                logging.debug("terminating thread %s" % self.name)
-                return
-            time.sleep(1)
-            if int(time.time()) % self.poll_time == 0:
-                # mitigate polling server creation progress 
-                server.get()
-                logging.debug('server \'%s\', status:%s, progress:%s' %
-                          (server.name, server.status, server.progress))
-            msg_queue.put('server \'%s\': %s %s' %
-                          (server.name, server.status, server.progress))
-        if server.status == 'ACTIVE':
-            d = {
-                'name'      : server.name,
-                'id'        : server.id,
-                'status'    : server.status,
-                'adminPass' : server.adminPass,
-                'networks'  : server.networks
-                }
-            # print info
-            pt = PrettyTable(['key', 'value'])
-            pt.add_row(['name', d['name']])
-            pt.add_row(['id', d['id']])
-            pt.add_row(['status', d['status']])
-            pt.add_row(['adminPass', d['adminPass']])
-            for srv_net in d['networks']['public']:
-                pt.add_row(['network public (%s)' % get_ip_family(srv_net), srv_net])
-            for srv_net in server.networks['private']:
-                pt.add_row(['network private (%s)' % get_ip_family(srv_net), srv_net])
-            pt.align['key'] = 'l'
-            pt.align['value'] = 'l'
-            self.r(0, str(pt), INFO)
-            print
-            # return info
-        else:
-            cmd_out = ('Error. Cannot create server \'%s\' (status:%s)' %
-                       (server.name, server.status))
-            msg_queue.put(cmd_out)
-            self.r(1, cmd_out, ERROR)
-            return None
-        logging.debug("Exiting %s" % self.name)
+        names    names of the servers to create
+        lib      LibServers printing the summary
+        '''
+        self.lib = lib
+        self.started = time.time()
+        self.servers = OrderedDict((n, {'id': '', 'status': 'QUEUED',
+                                        'progress': 0, 'adminPass': '',
+                                        'networks': {}, 'error': ''})
+                                   for n in names)
+        self._lock = threading.Lock()
+        self._reported = False
+        self._cancel = threading.Event()
+        # command creating the servers, requests are not submitted once it
+        # is cancelled
+        self.owner = JobManager.Instance().current()  # @UndefinedVariable
+    
+    def cancel(self):
+        '''
+        stop submitting creation requests
+        '''
+        self._cancel.set()
+    
+    def cancelled(self):
+        return (self._cancel.is_set() or
+                (self.owner != None and self.owner.cancelled()))
+    
+    def counts(self):
+        '''
+        return {status: number of servers}
+        '''
+        counts = {}
+        with self._lock:
+            for s in self.servers.values():
+                counts[s['status']] = counts.get(s['status'], 0) + 1
+        return counts
+    
+    def created(self, name, server):
+        '''
+        creation request of 'name' accepted
+        '''
+        with self._lock:
+            s = self.servers[name]
+            s['id'] = server.id
+            s['adminPass'] = server.adminPass
+            if s['status'] == 'QUEUED':
+                s['status'] = 'BUILD'
+        self._progress()
+    
+    def done(self):
+        with self._lock:
+            return all(s['status'] in self.FINAL
+                       for s in self.servers.values())
+    
+    def failed(self, name, error):
+        '''
+        creation request of 'name' refused
+        '''
+        with self._lock:
+            self.servers[name]['status'] = 'FAILED'
+            self.servers[name]['error'] = str(error)
+        self._progress()
     
-    @property
-    def terminate(self):
-        return self._terminate
+    def notify(self, name):
+        '''
+        return the Poller callback of server 'name'
+        '''
+        def callback(server, old_state, state):
+            with self._lock:
+                s = self.servers[name]
+                if server == None:
+                    s['status'] = 'GONE'
+                else:
+                    s['status'] = server.status
+                    s['progress'] = server.progress or 0
+                    s['networks'] = server.networks
+            self._progress()
+        return callback
     
-    @terminate.setter
-    def terminate(self, value=True):
-        self._terminate = value
+    def _progress(self):
+        '''
+        publish aggregated progress, and the summary once done
+        '''
+        with self._lock:
+            total = len(self.servers)
+            progress = sum(s['progress'] for s in self.servers.values())
+            active = len([s for s in self.servers.values()
+                          if s['status'] == 'ACTIVE'])
+            failed = len([s for s in self.servers.values()
+                          if s['status'] in self.FINAL and
+                          s['status'] != 'ACTIVE'])
+            # the summary is printed by one thread only
+            report = (not self._reported and
+                      all(s['status'] in self.FINAL
+                          for s in self.servers.values()))
+            if report:
+                self._reported = True
+        msg_queue.put('bulk create: %d/%d active, %d failed, progress %d%%' %
+                      (active, total, failed,
+                       progress / total if total else 100),
+                      ('bulk', id(self)))
+        if report:
+            self.lib.print_pt_server_build_job(self)
 
 
 class LibServers(Lib):
@@ -127,26 +159,122 @@ class LibServers(Lib):
         '''
         return a CloudServer object specified by id
         '''
-        cs = pyrax.cloudservers
-        return [s for s in cs.list() if s.id == server_id][0]
+        cs = self.context.cloudservers
+        server = self.resolve('servers', server_id, cs.servers.get,
+                              (exc.ServerNotFound,))
+        if server == None:
+            raise IndexError('cannot find server id:%s' % server_id)
+        return server
     
     def list_cloudservers(self):
-        cs = pyrax.cloudservers
-        return cs.list()
+        '''
+        return CloudServers, always fetched, and cache them
+        '''
+        cs = self.context.cloudservers
+        return self.cache_listing('servers', cs.list())
     
     def list_cloudservers_flavors(self):
-        return pyrax.cloudservers.list_flavors()
+        return self.catalog('flavors', self.context.cloudservers.list_flavors)
     
     def list_cloudservers_images(self):
-        return pyrax.cloudservers.list_images()
+        return self.catalog('images', self.context.cloudservers.list_images)
+    
+    def create_server(self, name, flavor_id, image_id, notify=None):
+        '''
+        create a server and return it; progress and completion are notified
+        by the Poller
+        
+        notify    Poller callback (default: print progress and details)
+        '''
+        cs = self.context.cloudservers
+        server = cs.servers.create(name, image_id, flavor_id)
+        self.invalidate('servers', server.id)
+        # 'adminPass' is returned by the creation request only
+        admin_pass = server.adminPass
+        server_id = server.id
+        
+        def print_progress(server, old_state, state):
+            if server == None:
+                cmd_out = 'Error. Server \'%s\' disappeared' % name
+                msg_queue.put(cmd_out, ('servers', server_id))
+                self.r(1, cmd_out, ERROR)
+                return
+            if server.status not in ('ACTIVE', 'ERROR', 'UNKNOWN'):
+                msg_queue.put('server \'%s\': %s %s' %
+                              (server.name, server.status, server.progress),
+                              ('servers', server_id))
+                return
+            self.invalidate('servers', server.id)
+            if server.status == 'ACTIVE':
+                self.print_pt_new_server(server, admin_pass)
+            else:
+                cmd_out = ('Error. Cannot create server \'%s\' (status:%s)' %
+                           (server.name, server.status))
+                msg_queue.put(cmd_out, ('servers', server_id))
+                self.r(1, cmd_out, ERROR)
+        
+        Poller.Instance().watch('servers', server.id,  # @UndefinedVariable
+                                notify or print_progress, cs.servers.list,
+                                state=status_progress)
+        return server
+    
+    def create_servers(self, names, flavor_id, image_id, concurrency):
+        '''
+        create servers 'names' submitting at most 'concurrency' requests at a
+        time (fewer when the rate limit headroom is lower), return the
+        ServerBuildJob tracking them
+        
+        Nothing is created if the servers exceed the account absolute limits.
+        
+        @raise AdmissionError
+        '''
+        n = len(names)
+        flavor = self.get_cloudserver_flavor(flavor_id)
+        needed = {'instances': n}
+        if flavor != None:
+            needed.update(ram=n * flavor.ram, cores=n * flavor.vcpus)
+        limits = LibLimits(self.context)
+        limits.admit('compute', **needed)
+        concurrency = limits.pool_size('compute', 'POST', '/servers',
+                                       concurrency)
+        job = ServerBuildJob(names, self)
+        job.concurrency = concurrency
+        pool = WorkerPool(concurrency, 'create')
+        for name in names:
+            pool.submit(self._create_job_server, job, name, flavor_id,
+                        image_id)
+        # threads exit once every request is submitted
+        pool.shutdown(wait=False)
+        return job
+    
+    def _create_job_server(self, job, name, flavor_id, image_id):
+        if job.cancelled():
+            job.failed(name, 'cancelled')
+            return
+        try:
+            server = self.create_server(name, flavor_id, image_id,
+                                        notify=job.notify(name))
+            job.created(name, server)
+        except Exception as e:
+            logging.error('cannot create server \'%s\': %s' % (name, e))
+            job.failed(name, e)
     
     def delete_server(self, _id=None, name=None):
-        cs = pyrax.cloudservers
-        server = cs.servers.get(_id)
+        server = self.get_by_id(_id)
         server.delete()
+        self.invalidate('servers', _id)
     
     def details_server(self, _id=None, name=None):
-        cs = self.list_cloudservers()
+        '''
+        print details of server specified by id (a single request), or name
+        (the whole servers listing is searched)
+        '''
+        if _id != None:
+            cs = [self.get_by_id(_id)]
+        else:
+            cs = self.list_cloudservers()
+        flavors = self.get_cloudserver_flavors_map()
+        images = self.get_cloudserver_images_map()
         for server in cs:
             if server.id == _id or server.name == name:
                 pt = PrettyTable(['key', 'value'])
@@ -159,9 +287,8 @@ class LibServers(Lib):
                 attrs_to_show = ['status', 'id']
                 for a in attrs_to_show:
                     pt.add_row([a, getattr(server, a)])
-#TODO -- display image info
-#                  pt.add_row(['image', self.get_cloudserver_flavor(server.image['id']).name])
-                pt.add_row(['flavor', self.get_cloudserver_flavor(server.flavor['id']).name])
+                pt.add_row(['image', self.resolve_name(server.image, images)])
+                pt.add_row(['flavor', self.resolve_name(server.flavor, flavors)])
 #                 pt.add_row(['password', server.get_password()])
                 pt.add_row(['progress', server.progress])
 #                 pt.add_row(['adminPass', server.get_password()])
@@ -172,44 +299,146 @@ class LibServers(Lib):
                 pt.add_row(['created on', server.created])
                 self.r(0, str(pt), INFO)
     
-    def get_cloudserver_flavor(self, _id):
-        csf = self.list_cloudservers_flavors()
-        for f in csf:
-            if f.id == _id:
-                return f
-        return None
+    def get_cloudserver_flavor(self, _id, flavors=None):
+        '''
+        return the CloudServer flavor specified by id
+        
+        flavors    flavors map (see: get_cloudserver_flavors_map), fetched if
+                   missing
+        '''
+        if flavors == None:
+            flavors = self.get_cloudserver_flavors_map()
+        return flavors.get(_id)
 
-    def get_cloudserver_image(self, _id):
-        csi = self.list_cloudservers_image()
-        for f in csi:
-            if f.id == _id:
-                return f
-        return None
-    
-    def print_pt_cloudservers(self):
-        '''print cloud servers flavors with PrettyTable'''
-        cs = self.list_cloudservers()
-        pt = PrettyTable(['id', 'name', 'status', 'progress', 'flavor id',
-                          'flavor'])
-        for csf in cs:
-            try:
-                pt.add_row([csf.id, csf.name, csf.status, csf.progress,
-                            csf.flavor['id'],
-                            # it seems that iterating this request slows down a
-                            # lot, maybe caching flavors?
-                            self.get_cloudserver_flavor(csf.flavor['id']).name
-                            ])
-            except AttributeError:
-                logging.warn('cannot fetch info of id:\'%s\' name:\'%s\'' %
-                             (csf.id, csf.name))
-                pt.add_row([csf.id, csf.name, csf.status, '-',
-                            csf.flavor['id'],
-                            # it seems that iterating this request slows down a
-                            # lot, maybe caching flavors?
-                            self.get_cloudserver_flavor(csf.flavor['id']).name
-                            ])
+    def get_cloudserver_image(self, _id, images=None):
+        '''
+        return the CloudServer image specified by id
+        
+        images     images map (see: get_cloudserver_images_map), fetched if
+                   missing
+        '''
+        if images == None:
+            images = self.get_cloudserver_images_map()
+        return images.get(_id)
+    
+    def get_cloudserver_flavors_map(self):
+        '''
+        return CloudServer flavors as a dictionary keyed by flavor id
+        '''
+        return dict((f.id, f) for f in self.list_cloudservers_flavors())
+    
+    def get_cloudserver_images_map(self):
+        '''
+        return CloudServer images as a dictionary keyed by image id
+        '''
+        return dict((i.id, i) for i in self.list_cloudservers_images())
+    
+    def resolve_name(self, ref, objects):
+        '''
+        return the name of the object referenced by 'ref' (a dictionary
+        holding an 'id', i.e.: server.flavor, server.image), looking it up in
+        'objects' (a dictionary keyed by id), or '-' if it cannot be resolved
+        '''
+        try:
+            return objects[ref['id']].name
+        except (KeyError, TypeError):
+            return '-'
+    
+    def print_pt_cloudservers(self, regions=None):
+        '''print cloud servers with PrettyTable
+        
+        flavors and images are fetched once, and joined to the servers by id
+        
+        regions    list of regions to query concurrently (default: current
+                   region only), adds the 'region' column'''
+        if regions == None:
+            listings = {None: (self.list_cloudservers(),
+                               self.get_cloudserver_flavors_map(),
+                               self.get_cloudserver_images_map())}
+            errors = {}
+        else:
+            listings, errors = self.fan_out('cloudservers', regions,
+                                            self._list_region_cloudservers)
+        columns = ['id', 'name', 'status', 'progress', 'flavor id', 'flavor',
+                   'image']
+        if regions != None:
+            columns.insert(0, 'region')
+        pt = PrettyTable(columns)
+        for region, (cs, flavors, images) in listings.items():
+            for csf in cs:
+                try:
+                    progress = csf.progress
+                except AttributeError:
+                    logging.warn('cannot fetch info of id:\'%s\' name:\'%s\'' %
+                                 (csf.id, csf.name))
+                    progress = '-'
+                row = [csf.id, csf.name, csf.status, progress,
+                       csf.flavor['id'],
+                       self.resolve_name(csf.flavor, flavors),
+                       self.resolve_name(csf.image, images)
+                       ]
+                if regions != None:
+                    row.insert(0, region)
+                pt.add_row(row)
         pt.get_string(sortby='name')
+        for region, error in errors.items():
+            self.r(1, 'cannot list servers in %s: %s' % (region, error), ERROR)
+        self.r(0, str(pt), INFO)
+    
+    def _list_region_cloudservers(self, cs):
+        '''
+        return (servers, flavors map, images map) of the region of client
+        'cs', catalogs are cached per region
+        '''
+        region = cs.client.region_name
+        flavors = self.cached('flavors', 'region:%s' % region,
+                              lambda: dict((f.id, f) for f in cs.flavors.list()))
+        images = self.cached('images', 'region:%s' % region,
+                             lambda: dict((i.id, i) for i in cs.images.list()))
+        return cs.servers.list(), flavors, images
+    
+    def print_pt_new_server(self, server, admin_pass):
+        '''
+        print details of a server just created
+        '''
+        pt = PrettyTable(['key', 'value'])
+        pt.add_row(['name', server.name])
+        pt.add_row(['id', server.id])
+        pt.add_row(['status', server.status])
+        pt.add_row(['adminPass', admin_pass])
+        for srv_net in server.networks.get('public', []):
+            pt.add_row(['network public (%s)' % get_ip_family(srv_net),
+                        srv_net])
+        for srv_net in server.networks.get('private', []):
+            pt.add_row(['network private (%s)' % get_ip_family(srv_net),
+                        srv_net])
+        pt.align['key'] = 'l'
+        pt.align['value'] = 'l'
         self.r(0, str(pt), INFO)
+        print
+    
+    def print_pt_server_build_job(self, job):
+        '''
+        print the summary of a bulk creation
+        '''
+        pt = PrettyTable(['name', 'id', 'status', 'adminPass', 'public ip',
+                          'error'])
+        for name, s in job.servers.items():
+            ips = [ip for ip in s['networks'].get('public', [])
+                   if is_ipv4(ip)]
+            pt.add_row([name, s['id'], s['status'], s['adminPass'],
+                        ', '.join(ips), s['error']])
+        pt.align['name'] = 'l'
+        counts = job.counts()
+        cmd_out = ('bulk create done in %ds: %s\n%s' %
+                   (time.time() - job.started,
+                    ', '.join('%s:%d' % (k, v)
+                              for k, v in sorted(counts.items())),
+                    pt))
+        if counts.get('ACTIVE', 0) == len(job.servers):
+            self.r(0, cmd_out, INFO)
+        else:
+            self.r(1, cmd_out, ERROR)
     
     def print_pt_cloudservers_flavors(self):
         '''print cloud servers flavors with PrettyTable'''
@@ -233,3 +462,29 @@ class LibServers(Lib):
             self.r(0, pt.get_string(sortby=sortby), INFO)
         else:
             self.r(0, str(pt), INFO)
+    
+    def watch_snapshot(self, snapshot_id, name):
+        '''
+        notify progress and completion of snapshot 'snapshot_id' (see Poller)
+        '''
+        def notify(snapshot, old_state, state):
+            if snapshot == None:
+                cmd_out = 'Error. Snapshot \'%s\' disappeared' % name
+                self.r(1, cmd_out, ERROR)
+                return
+            msg_queue.put('snapshot \'%s\': %s %s' %
+                          (snapshot.name, snapshot.status, snapshot.progress),
+                          ('images', snapshot.id))
+            if snapshot.status not in ('ACTIVE', 'ERROR', 'UNKNOWN'):
+                return
+            self.invalidate('images', snapshot.id)
+            cmd_out = ('snapshot \'%s\', status:%s' %
+                       (snapshot.name, snapshot.status))
+            if snapshot.status == 'ACTIVE':
+                self.r(0, cmd_out, INFO)
+            else:
+                self.r(1, cmd_out, ERROR)
+        
+        Poller.Instance().watch('snapshots', snapshot_id, notify,  # @UndefinedVariable
+                                self.context.cloudservers.list_snapshots,
+                                state=status_progress)
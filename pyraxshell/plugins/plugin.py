@@ -16,15 +16,18 @@
 # along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
 
 import cmd
+import copy
+from prettytable import PrettyTable
 import logging
 import pprint
 import re
 import sys
 import traceback
 
-from configuration import Configuration
+from completion import Completion
+from context import current
 from globals import *  # @UnusedWildImport
-from sessions import Sessions
+from jobs import JobManager
 from utility import l
 
 name = 'none'
@@ -37,12 +40,21 @@ class Plugin(cmd.Cmd):
     
     prompt = "RS %s>" % name    # default prompt
     
-    def __init__(self):
+    # completion of parameter values, 'key' --> (collection, field, loader),
+    # i.e.: 'id' --> ('servers', 'id', 'list_cloudservers'), where 'loader' is
+    # the 'self.libplugin' method refreshing the collection
+    completion = {}
+    
+    def __init__(self, context=None):
         '''
         Constructor
+        
+        context    session context of the plugin, its commands run in it
+                   (default: the current one)
         '''
         cmd.Cmd.__init__(self)
-        self.cfg = Configuration.Instance()  # @UndefinedVariable
+        self.context = context or current()
+        self.cfg = self.context.configuration
         # current command
         self.cmd = None
         self.arg = None
@@ -54,6 +66,51 @@ class Plugin(cmd.Cmd):
             f = open(os.devnull, 'w')
             sys.stdout = f
     
+    def complete(self, text, state):
+        '''
+        override 'cmd.Cmd.complete' to complete parameter values (see
+        'complete_value'), parameter keys are still completed by
+        'complete_*' methods
+        '''
+        if state == 0:
+            import readline
+            origline = readline.get_line_buffer()
+            line = origline.lstrip()
+            endidx = readline.get_endidx() - (len(origline) - len(line))
+            matches = self.complete_value(text, line, endidx)
+            if matches != None:
+                self.completion_matches = matches
+                return matches and matches[0] or None
+        return cmd.Cmd.complete(self, text, state)
+    
+    def complete_value(self, text, line, endidx):
+        '''
+        return completions of the value of a 'key:value' parameter, i.e.:
+        'details name:we<TAB>' --> names of servers starting with 'we', or
+        None if the word being completed is not a value listed in
+        'self.completion'
+        
+        Values are looked up in the in-memory prefix index ('Completion'),
+        the API is never called from here.
+        '''
+        words = line[:endidx].split(' ')
+        if len(words) < 2:
+            return None
+        word = words[-1].replace('=', ':')
+        if ':' not in word:
+            return None
+        key, prefix = word.split(':', 1)
+        if key not in self.completion:
+            return None
+        collection, field, loader = self.completion[key]
+        loader = getattr(getattr(self, 'libplugin', None), loader, None)
+        values = Completion.Instance().complete(collection, field,  # @UndefinedVariable
+                                                prefix, loader)
+        # readline replaces 'text' only, which is the tail of 'prefix' when
+        # values contain delimiters (i.e.: '-' in UUIDs)
+        offset = max(len(prefix) - len(text), 0)
+        return [v[offset:] for v in values]
+    
     def kvargcheck(self, *args):
         '''
         check 'self.kvarg' against passed check rules ('*args')
@@ -143,7 +200,7 @@ class Plugin(cmd.Cmd):
             arg = arg.replace('=', ':')
             for token in arg.split():
                 # determine token type
-                p1 = re.compile('^[a-zA-Z0-9_]+:[a-zA-Z0-9_~/\.]+$')
+                p1 = re.compile('^[a-zA-Z0-9_]+:[a-zA-Z0-9_~/\.\-{},]+$')
                 p2 = re.compile('^[a-zA-Z0-9_]+$')
                 p3 = re.compile('^[a-zA-Z0-9_]+:\$[a-zA-Z0-9_]+$')
                 if p1.match(token) or p3.match(token):
@@ -168,6 +225,12 @@ class Plugin(cmd.Cmd):
         except:
             return None
 
+    def default(self, line):
+        '''
+        override 'cmd.Cmd.default', an unknown command is an error
+        '''
+        self.r(1, '*** Unknown syntax: %s' % line, ERROR)
+    
     def emptyline(self):
         """Called when an empty line is entered in response to the prompt.
 
@@ -179,6 +242,74 @@ class Plugin(cmd.Cmd):
             self.lastcmd = ""
             return self.onecmd('\n')
     
+    def background(self, line):
+        '''
+        run command 'line' as a background job (see 'jobs')
+        
+        The job runs on a copy of this command interpreter, so that commands
+        typed meanwhile do not overwrite its arguments.
+        '''
+        words = line.split()
+        if not words:
+            self.r(1, 'missing command', ERROR)
+            return False
+        if (words[0] in ('EOF', 'exit', 'quit') or
+            (len(words) == 1 and words[0] in getattr(self, 'plugin_names',
+                                                     ()))):
+            self.r(1, "cannot run '%s' in background" % line, ERROR)
+            return False
+        c = copy.copy(self)
+        # i.e.: 'RS servers>' --> 'servers list'
+        context = self.prompt.rstrip('>').split(' ', 1)[1:]
+        name = ' '.join(context + [line])
+        
+        def run():
+            cmd.Cmd.onecmd(c, line)
+            job = JobManager.Instance().current()  # @UndefinedVariable
+            msg_queue.put("job %d %s: %s" % (job.id, 'cancelled' if
+                                             job.cancelled() else 'done',
+                                             name), ('jobs', job.id))
+        
+        job = JobManager.Instance().start(name, run)  # @UndefinedVariable
+        self.r(0, "job %d started: %s" % (job.id, name), INFO)
+    
+    def cmdloop(self, intro=None):
+        '''
+        override 'cmd.Cmd.cmdloop', CTRL-C discards the line being typed
+        instead of quitting (see 'onecmd' for running commands)
+        '''
+        with self.context:
+            try:
+                while True:
+                    try:
+                        return cmd.Cmd.cmdloop(self, intro)
+                    except KeyboardInterrupt:
+                        print '^C'
+                        # 'preloop' (i.e.: authentication) runs once
+                        intro = ''
+                        self.preloop = lambda: None
+            finally:
+                self.__dict__.pop('preloop', None)
+    
+    def onecmd(self, line):
+        '''
+        override 'cmd.Cmd.onecmd', a trailing '&' runs the command as a
+        background job, CTRL-C cancels the command running in foreground
+        '''
+        with self.context:
+            if line.rstrip().endswith('&'):
+                return self.background(line.rstrip()[:-1].strip())
+            jobs = JobManager.Instance()  # @UndefinedVariable
+            job = jobs.foreground(line)
+            try:
+                return cmd.Cmd.onecmd(self, line)
+            except KeyboardInterrupt:
+                # operations of the command (i.e.: WorkerPool tasks) check it
+                job.cancel()
+                self.r(1, "cancelled: %s" % line.strip(), WARN)
+            finally:
+                jobs.release(job)
+    
     def parseline(self, line):
         '''
         override 'cmd.Cmd.parseline' to store cmd, arg and line
@@ -201,7 +332,7 @@ class Plugin(cmd.Cmd):
         cmd.Cmd.preloop(self)
         logging.debug("preloop")
         import plugins.libauth
-        if not plugins.libauth.LibAuth().is_authenticated():
+        if not plugins.libauth.LibAuth(self.context).is_authenticated():
             logging.warn('please, authenticate yourself before continuing')
     
     def do_EOF(self, line):
@@ -240,6 +371,56 @@ class Plugin(cmd.Cmd):
         '''
         return self.do_list(line)
     
+    def do_cancel(self, line):
+        '''
+        cancel a job, it stops as soon as possible
+        
+        @param id    job id (see 'jobs')
+        '''
+        if not self.arg or not self.arg.isdigit():
+            self.r(1, 'missing job id', ERROR)
+            return False
+        if not JobManager.Instance().cancel(self.arg):  # @UndefinedVariable
+            self.r(1, "job '%s' not found" % self.arg, ERROR)
+            return False
+        self.r(0, "job %s cancelled" % self.arg, INFO)
+    
+    def do_jobs(self, line):
+        '''
+        list jobs: background commands ('<command> &'), resources being
+        polled, bulk operations
+        '''
+        pt = PrettyTable(['id', 'job', 'status', 'progress', 'elapsed'])
+        for j in JobManager.Instance().list():  # @UndefinedVariable
+            pt.add_row([j.id, j.name, j.status, j.progress(),
+                        '%ds' % j.elapsed()])
+        pt.align['job'] = 'l'
+        pt.align['progress'] = 'l'
+        self.r(0, str(pt), INFO)
+    
+    def do_wait(self, line):
+        '''
+        wait for a job to finish, CTRL-C stops waiting (the job goes on)
+        
+        @param id    job id (see 'jobs')
+        '''
+        if not self.arg or not self.arg.isdigit():
+            self.r(1, 'missing job id', ERROR)
+            return False
+        job = JobManager.Instance().get(self.arg)  # @UndefinedVariable
+        if job == None:
+            self.r(1, "job '%s' not found" % self.arg, ERROR)
+            return False
+        try:
+            job.wait()
+        except KeyboardInterrupt:
+            self.r(0, "job %d still running" % job.id, INFO)
+            return
+        cmd_out = "job %d %s: %s (%ds)" % (job.id, job.status, job.name,
+                                           job.elapsed())
+        self.r(1 if job.status == 'failed' else 0, cmd_out,
+               ERROR if job.status == 'failed' else INFO)
+    
     def do_emptyline(self, line):
         '''
         print a new empty line
@@ -261,5 +442,5 @@ class Plugin(cmd.Cmd):
         logging message facility
         '''
         l(self.line, retcode, msg, log_level)
-        Sessions.Instance().insert_table_commands(self.line ,   # @UndefinedVariable
-                                                  msg, retcode, log_level)
+        self.context.sessions.insert_table_commands(self.line, msg, retcode,
+                                                    log_level)
@@ -20,6 +20,7 @@ import logging
 import traceback
 
 from globals import ERROR, INFO
+from identitypool import IdentityPool
 from plugins.libauth import LibAuth
 from plugins.plugin import Plugin
 import os.path
@@ -41,9 +42,10 @@ class Cmd_auth(Plugin, cmd.Cmd):
     
     prompt = "RS auth>"    # default prompt
     
-    def __init__(self):
-        Plugin.__init__(self)
-        self.libplugin = LibAuth()
+    def __init__(self, context=None):
+        Plugin.__init__(self, context)
+        self.libplugin = LibAuth(self.context)
+        IdentityPool.Instance().max_size = self.cfg.identity_pool_size  # @UndefinedVariable
 
     def do_EOF(self, line):
         '''
@@ -67,7 +69,7 @@ class Cmd_auth(Plugin, cmd.Cmd):
         cmd.Cmd.preloop(self)
         logging.debug("preloop")
         import plugins.libauth
-        if not plugins.libauth.LibAuth().is_authenticated():
+        if not plugins.libauth.LibAuth(self.context).is_authenticated():
             logging.warn('please, authenticate yourself before continuing')
     
     # ########################################
@@ -84,15 +86,14 @@ class Cmd_auth(Plugin, cmd.Cmd):
         '''
         authenticate using ACCOUNT_FILE
         
+        Accounts already authenticated are kept in a pool (size:
+        'identity_pool_size' in CONFIG_FILE), switching back to them does not
+        call the API.
+        
         @param alias    account alias (i.e.: name of stanza in ACCOUNT_FILE)
         '''
         try:
-            self.libplugin.authenticate_login(
-                **self.libplugin.get_account(self.arg))
-#                 identity_type = ,
-#                 username = None,
-#                 apikey = None,
-#                 region = pyrax.default_region)
+            self.libplugin.switch_account(self.arg)
         except:
             tb = traceback.format_exc()
             self.r(1, tb, ERROR)
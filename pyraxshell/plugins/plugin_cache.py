@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import cmd
+import logging
+from prettytable import PrettyTable
+
+from globals import INFO, ERROR
+from plugin import Plugin
+
+name = 'cache'
+
+def injectme(c):
+    setattr(c, 'do_cache', do_cache)
+    logging.debug('%s injected' % __file__)
+
+def do_cache(*args):
+    '''
+    enter 'cache' menu, or run a single 'cache' command (i.e.: cache stats)
+    '''
+    if len(args) > 0 and args[0]:
+        Cmd_cache().onecmd(args[0])
+    else:
+        Cmd_cache().cmdloop()
+
+
+class Cmd_cache(Plugin, cmd.Cmd):
+    '''
+    pyraxshell - API objects cache
+    '''
+    
+    prompt = "RS cache>"    # default prompt
+    
+    def __init__(self, context=None):
+        Plugin.__init__(self, context)
+        self.cache = self.context.cache
+    
+    def do_clear(self, line):
+        '''
+        clear cache
+        
+        collection    collection to clear, i.e.: servers (default: all)
+        '''
+        # check and set defaults
+        retcode, retmsg = self.kvargcheck(
+            {'name':'collection', 'default':None}
+        )
+        if not retcode:             # something bad happened
+            self.r(1, retmsg, ERROR)
+            return False
+        self.cache.clear(self.kvarg['collection'])
+        cmd_out = 'cache cleared'
+        self.r(0, cmd_out, INFO)
+    
+    def complete_clear(self, text, line, begidx, endidx):
+        params = ['collection:']
+        if not text:
+            completions = params[:]
+        else:
+            completions = [ f
+                           for f in params
+                            if f.startswith(text)
+                            ]
+        return completions
+    
+    def do_exit(self, *args):
+        return True
+    
+    def do_list(self, line):
+        '''
+        stats alias
+        '''
+        return self.do_stats(line)
+    
+    def do_stats(self, line):
+        '''
+        display cache statistics per collection
+        '''
+        pt = PrettyTable(['collection', 'ttl', 'entries', 'hits', 'misses',
+                          'hit rate', 'evictions', 'invalidations'])
+        for d in self.cache.stats():
+            pt.add_row([d['collection'], d['ttl'], d['entries'], d['hits'],
+                        d['misses'], '%.1f%%' % (d['hit_rate'] * 100),
+                        d['evictions'], d['invalidations']])
+        pt.align['collection'] = 'l'
+        self.r(0, str(pt), INFO)
@@ -17,13 +17,12 @@
 
 import cmd
 import logging
-import pyrax
 from prettytable import PrettyTable
 import traceback
 
 from globals import INFO, ERROR, WARN
 from plugin import Plugin
-from plugins.libdatabases import LibDatabases, InstanceCreatorThread
+from plugins.libdatabases import LibDatabases
 
 name = 'databases'
 
@@ -41,11 +40,17 @@ class Cmd_databases(Plugin, cmd.Cmd):
     '''
     
     prompt = "RS db>"    # default prompt
+    
+    completion = {
+        'flavor_id'     : ('db_flavors', 'id', 'list_instance_flavors'),
+        'id'            : ('db_instances', 'id', 'list_instances'),
+        'instance_id'   : ('db_instances', 'id', 'list_instances'),
+    }
 
-    def __init__(self):
-        Plugin.__init__(self)
-        self.libplugin = LibDatabases()
-        self.cdb = pyrax.cloud_databases
+    def __init__(self, context=None):
+        Plugin.__init__(self, context)
+        self.libplugin = LibDatabases(self.context)
+        self.cdb = self.context.cloud_databases
     
     # ########################################
     # CLOUD DATABASES - INSTANCES
@@ -69,17 +74,25 @@ class Cmd_databases(Plugin, cmd.Cmd):
             self.r(1, retmsg, ERROR)
             return False
         self.r(0, retmsg, INFO)     # everything's ok
+        # additional checks
+        if self.kvarg['flavor_id'] not in [str(f.id) for f in
+                                   self.libplugin.list_instance_flavors()]:
+            cmd_out = ('flavor_id:%s not found (see: list_instance_flavors)' %
+                       self.kvarg['flavor_id'])
+            self.r(1, cmd_out, ERROR)
+            return False
         
         try:
             logging.debug('creating database instance - name:%s, flavor_id:%s, '
                           'volume=%s' % (self.kvarg['name'],
                                          self.kvarg['flavor_id'],
                                          self.kvarg['volume']))
-            cdbit = InstanceCreatorThread(self.kvarg['name'],
-                                          self.kvarg['flavor_id'],
-                                          self.kvarg['volume'])
-            cdbit.setName('CloudDBInstance-%s' % self.kvarg['name'])
-            cdbit.start()
+            cdbi = self.libplugin.create_instance(self.kvarg['name'],
+                                                  self.kvarg['flavor_id'],
+                                                  self.kvarg['volume'])
+            cmd_out = ('creating database instance name:%s, id:%s' %
+                       (self.kvarg['name'], cdbi.id))
+            self.r(0, cmd_out, INFO)
         except:
             tb = traceback.format_exc()
             logging.error(tb)
@@ -113,6 +126,7 @@ class Cmd_databases(Plugin, cmd.Cmd):
         try:
             db_instance = self.libplugin.get_instance_by_id(self.kvarg['id'])
             db_instance.delete()
+            self.libplugin.invalidate('db_instances', self.kvarg['id'])
             cmd_out = ('Cloud Databases instance id:%s deleted' %
                        self.kvarg['id'])
             self.r(0, cmd_out, INFO)
@@ -134,33 +148,70 @@ class Cmd_databases(Plugin, cmd.Cmd):
     def do_list_instances(self, line):
         '''
         list _my_ cloud databases instances
+        
+        regions    'all', or comma separated list of regions (i.e.: DFW,ORD),
+                   queried concurrently (optional, default: current region)
         '''
-        cdb = pyrax.cloud_databases
-        pt = PrettyTable(['id', 'name', 'status', 'hostname', 'created',
-                          'ram', 'links'])
-        for db in cdb.list():
-            pt.add_row([db.id,
-                        db.name,
-                        db.status,
-                        db.hostname,
-                        db.created,
-                        db.flavor.ram,
-                        '\n'.join([l['href'] for l in db.links])])
+        retcode, retmsg = self.kvargcheck(
+            {'name':'regions', 'default':None}
+        )
+        if not retcode:             # something bad happened
+            self.r(1, retmsg, ERROR)
+            return False
+        columns = ['id', 'name', 'status', 'hostname', 'created', 'ram',
+                   'links']
+        if self.kvarg['regions'] == None:
+            listings = {None: self.libplugin.list_instances()}
+            errors = {}
+        else:
+            listings, errors = self.libplugin.fan_out(
+                'cloud_databases',
+                self.libplugin.list_regions(self.kvarg['regions']),
+                lambda cdb: cdb.list())
+            columns.insert(0, 'region')
+        pt = PrettyTable(columns)
+        for region, instances in listings.items():
+            for db in instances:
+                row = [db.id,
+                       db.name,
+                       db.status,
+                       db.hostname,
+                       db.created,
+                       db.flavor.ram,
+                       '\n'.join([l['href'] for l in db.links])]
+                if region != None:
+                    row.insert(0, region)
+                pt.add_row(row)
         pt.align['name'] = 'l'
         pt.align['links'] = 'l'
+        for region, error in errors.items():
+            cmd_out = ('cannot list database instances in %s: %s' %
+                       (region, error))
+            self.r(1, cmd_out, ERROR)
         self.r(0, str(pt), INFO)
     
+    def complete_list_instances(self, text, line, begidx, endidx):
+        params = ['regions:']
+        if not text:
+            completions = params[:]
+        else:
+            completions = [ f
+                           for f in params
+                            if f.startswith(text)
+                            ]
+        return completions
+    
     def do_list_instance_flavors(self, line):
         '''
         list cloud databases instances flavours
         '''
         logging.info("list db flavours")
         logging.debug("    line: %s" % line)
-        cdb = pyrax.cloud_databases
-        cdbf = cdb.list_flavors()
+        cdbf = self.libplugin.list_instance_flavors()
         pt = PrettyTable(['id', 'name', 'ram', 'loaded'])
         for dbf in cdbf:
-            pt.add_row([dbf.id, dbf.name, dbf.ram, dbf.loaded])
+            pt.add_row([dbf.id, dbf.name, dbf.ram,
+                        getattr(dbf, 'loaded', '-')])
         pt.align['name'] = 'l'
         self.r(0, str(pt), INFO)
     
@@ -203,6 +254,7 @@ class Cmd_databases(Plugin, cmd.Cmd):
                 db_instance.resize(int(self.kvarg['ram']))
             if self.kvarg['volume'] != None:
                 db_instance.resize_volume(self.kvarg['volume'])
+            self.libplugin.invalidate('db_instances', self.kvarg['id'])
             cmd_out = 'instance id:%s resized' % self.kvarg['id']
             self.r(0, cmd_out, INFO)
         except:
@@ -246,6 +298,8 @@ class Cmd_databases(Plugin, cmd.Cmd):
             db_instance = (
                 self.libplugin.get_instance_by_id(self.kvarg['instance_id']))
             db_instance.create_database(self.kvarg['database_name'])
+            self.libplugin.invalidate('db_instances',
+                                      self.kvarg['instance_id'])
             cmd_out = ('created database_name:%s in '
                        'Cloud Databases instance id:%s,'
                         % (self.kvarg['database_name'],
@@ -295,6 +349,8 @@ class Cmd_databases(Plugin, cmd.Cmd):
                 self.r(1, cmd_out, ERROR)
             else:
                 database.delete()
+                self.libplugin.invalidate('db_instances',
+                                          self.kvarg['instance_id'])
                 cmd_out = ('delete database instance - instance_id:%s,'
                            'database_name:%s' %
                            (self.kvarg['instance_id'],
@@ -389,6 +445,7 @@ class Cmd_databases(Plugin, cmd.Cmd):
             db_instance.create_user(self.kvarg['username'],
                                     self.kvarg['password'],
                                 database_names = self.kvarg['database_name'])
+            self.libplugin.invalidate('db_instances', self.kvarg['instance_id'])
             cmd_out = ('created username:%s, password:%s to instance_id:%s,'
                        'database_name:%s' % (self.kvarg['username'],
                                              self.kvarg['password'],
@@ -432,6 +489,8 @@ class Cmd_databases(Plugin, cmd.Cmd):
             db_instance = (
                 self.libplugin.get_instance_by_id(self.kvarg['instance_id']))
             db_instance.delete_user(self.kvarg['username'])
+            self.libplugin.invalidate('db_instances',
+                                      self.kvarg['instance_id'])
             cmd_out = ('deleted username:%s from instance_id:%s' %
                        (self.kvarg['username'], self.kvarg['instance_id']))
             self.r(0, cmd_out, INFO)
@@ -23,10 +23,12 @@ import pyrax.exceptions as exc
 from prettytable import PrettyTable
 import traceback
 
-from globals import ERROR, WARN, INFO
+from globals import DNS_BULK_CONCURRENCY, ERROR, WARN, INFO
 from plugin import Plugin
 from plugins.libdns import LibDNS
+from plugins.liblimits import AdmissionError
 from utility import kvstring_to_dict, is_ipv4
+import zonefile
 
 name = 'dns'
 
@@ -45,9 +47,13 @@ class Cmd_dns(Plugin, cmd.Cmd):
     
     prompt = "RS dns>"    # default prompt
     
-    def __init__(self):
-        Plugin.__init__(self)
-        self.libplugin = LibDNS()
+    completion = {
+        'domain_name'   : ('domains', 'name', 'list_domains'),
+    }
+    
+    def __init__(self, context=None):
+        Plugin.__init__(self, context)
+        self.libplugin = LibDNS(self.context)
 
     # ########################################
     # CLOUD DNS
@@ -78,45 +84,48 @@ class Cmd_dns(Plugin, cmd.Cmd):
             self.r(1, cmd_out, WARN)
             return False
         
-        dns = pyrax.cloud_dns
-        
         rec = { "type": self.kvarg['type'],
                 "name": self.kvarg['name'],
                 "data": self.kvarg['data'],
                 "ttl": self.kvarg['ttl']}
         # create missing subdomains
-        domains = self.libplugin.list_domain_names()
-        nearest_domain = self.libplugin.nearest_domain(name, domains)
-        if nearest_domain == None:
+        name = self.kvarg['name']
+        nearest_domain = self.libplugin.nearest_domain(name)
+        if not nearest_domain:
             cmd_out = 'no matching domain found'
             self.r(1, cmd_out, ERROR)
             return False
         logging.debug('nearest_domain:%s' % nearest_domain)
-        missing_subdomains = self.libplugin.missing_subdomains(name, nearest_domain)
-        logging.info("creating missing domains: ", missing_subdomains)
+        missing_subdomains = self.libplugin.missing_subdomains(name,
+                                                               nearest_domain)
+        logging.info("creating missing domains: %s" % missing_subdomains)
         nearest_domain_obj = self.libplugin.get_domain_by_name(nearest_domain)
-        for subdomain in missing_subdomains:
+        # shallowest first, each subdomain needs its parent
+        for subdomain in reversed(missing_subdomains):
             self.libplugin.create_domain(subdomain,
                                          nearest_domain_obj.emailAddress,
                                          nearest_domain_obj.ttl,
                                          ''     # comment
                                          )
+        if missing_subdomains:
+            domain_name = missing_subdomains[0]
+        else:
+            domain_name = nearest_domain
+        logging.debug("add '%s' in domain '%s'" % (name, domain_name))
+        dom = self.libplugin.get_domain_by_name(domain_name)
+        if not dom:
+            cmd_out = "domain '%s' not found" % domain_name
+            self.r(1, cmd_out, ERROR)
+            return False
         try:
-            (new_rec_data, domain_name) = name.split('.', 1)
-            logging.debug("add '%s' in domain '%s'" %
-                          (new_rec_data, domain_name))
-            dom = dns.find(name=domain_name)
-            try:
-                dom.add_record(rec)
-                cmd_out = ("adding dns record name:%s, type:%s, data:%s, ttl:%s" %
-                           (self.kvarg['name'], self.kvarg['type'],
-                            self.kvarg['data'], self.kvarg['ttl']))
-                self.r(0, cmd_out, INFO)
-            except pyrax.exceptions.DomainRecordAdditionFailed:
-                cmd_out = "duplicate dns record '%s'" % name
-                self.r(1, cmd_out, ERROR)
-        except exc.NotFound:
-            cmd_out = "domain '%s' not found" % name
+            dom.add_record(rec)
+            self.libplugin.invalidate('domains', domain_name)
+            cmd_out = ("adding dns record name:%s, type:%s, data:%s, ttl:%s" %
+                       (self.kvarg['name'], self.kvarg['type'],
+                        self.kvarg['data'], self.kvarg['ttl']))
+            self.r(0, cmd_out, INFO)
+        except pyrax.exceptions.DomainRecordAdditionFailed:
+            cmd_out = "duplicate dns record '%s'" % name
             self.r(1, cmd_out, ERROR)
     
     def complete_add_record(self, text, line, begidx, endidx):
@@ -198,25 +207,22 @@ class Cmd_dns(Plugin, cmd.Cmd):
             return False
         self.r(0, retmsg, INFO)     # everything's ok
         
-        try:
-            subdomain_name = name
-            domain_name = subdomain_name.split('.', 1)[1]
-            dns = pyrax.cloud_dns
-            dns.find(name=domain_name)
-            try:
-                self.libplugin.create_domain(self.kvarg['name'],
-                                             self.kvarg['email_address'],
-                                             self.kvarg['ttl'],
-                                             self.kvarg['comment'])
-                cmd_out = ("created subdomain '%s' in domain '%s'" %
-                           (subdomain_name, domain_name))
-                self.r(0, cmd_out, INFO)
-            except Exception:
-                cmd_out = "cannot create domain '%s'" % domain_name
-                self.r(1, cmd_out, ERROR)
-        except exc.NotFound:
+        subdomain_name = self.kvarg['name']
+        domain_name = subdomain_name.split('.', 1)[-1]
+        if not self.libplugin.get_domain_by_name(domain_name):
             cmd_out = "domain '%s' not found" % domain_name
             self.r(1, cmd_out, ERROR)
+            return False
+        if self.libplugin.create_domain(self.kvarg['name'],
+                                        self.kvarg['email_address'],
+                                        self.kvarg['ttl'],
+                                        self.kvarg['comment']):
+            cmd_out = ("created subdomain '%s' in domain '%s'" %
+                       (subdomain_name, domain_name))
+            self.r(0, cmd_out, INFO)
+        else:
+            cmd_out = "cannot create domain '%s'" % subdomain_name
+            self.r(1, cmd_out, ERROR)
     
     def complete_create_subdomain(self, text, line, begidx, endidx):
         params = ['name:', 'email_address:', 'ttl:', 'comment:']
@@ -256,24 +262,32 @@ class Cmd_dns(Plugin, cmd.Cmd):
             cmd_out = '\'%s\' is not a valid IP v4 address' % self.kvarg['data']
             self.r(1, cmd_out, ERROR)
             return False
+        name = self.kvarg['name']
+        domain_name = self.libplugin.nearest_domain(name)
+        if not domain_name:
+            cmd_out = "domain not found for '%s'" % name
+            self.r(1, cmd_out, ERROR)
+            return False
+        # i.e.: 'www.example.com' in 'example.com' --> 'www'
+        del_rec_data = (name.rstrip('.')[:-len(domain_name)].rstrip('.') or
+                        name)
+        dom = self.libplugin.get_domain_by_name(domain_name)
+        if not dom:
+            cmd_out = "domain '%s' not found" % domain_name
+            self.r(1, cmd_out, ERROR)
+            return False
         try:
-            dns = pyrax.cloud_dns
-            (del_rec_data, domain_name) = name.split('.', 1)
-            dom = dns.find(name=domain_name)
-            try:
-                for r in dom.list_records():
-                    if (r.name == self.kvarg['name'] and
-                        r.type == self.kvarg['type'] and
-                        r.data == self.kvarg['data']):
-                        r.delete()
-                cmd_out = ("delete '%s' in domain '%s'" % (del_rec_data,
-                                                           domain_name))
-                self.r(0, cmd_out, INFO)
-            except:
-                cmd_out = "cannot delete dns record '%s'" % name
-                self.r(1, cmd_out, ERROR)
-        except exc.NotFound:
-            cmd_out = "domain '%s' not found" % name
+            for r in dom.list_records():
+                if (r.name == self.kvarg['name'] and
+                    r.type == self.kvarg['type'] and
+                    r.data == self.kvarg['data']):
+                    r.delete()
+            self.libplugin.invalidate('domains', domain_name)
+            cmd_out = ("delete '%s' in domain '%s'" % (del_rec_data,
+                                                       domain_name))
+            self.r(0, cmd_out, INFO)
+        except:
+            cmd_out = "cannot delete dns record '%s'" % name
             self.r(1, cmd_out, ERROR)
     
     def complete_delete_record(self, text, line, begidx, endidx):
@@ -289,34 +303,31 @@ class Cmd_dns(Plugin, cmd.Cmd):
     
     def do_delete_records(self, line):
         '''
-        delete all DNS record but NS
+        delete DNS records but NS, in batches, concurrently
         
         domain_name       name of the domain
+        type              delete only records of this type (i.e.: A)
+        name              delete only records with this name
+        data              delete only records with this data
+        concurrency       concurrent API requests (default:
+                          DNS_BULK_CONCURRENCY)
         '''
         # check and set defaults
         retcode, retmsg = self.kvargcheck(
-            {'name':'domain_name', 'required':True}
+            {'name':'domain_name', 'required':True},
+            {'name':'type', 'default':None},
+            {'name':'name', 'default':None},
+            {'name':'data', 'default':None},
+            {'name':'concurrency', 'default':DNS_BULK_CONCURRENCY}
         )
         if not retcode:             # something bad happened
             self.r(1, retmsg, ERROR)
             return False
         self.r(0, retmsg, INFO)     # everything's ok
-        
-        dns = pyrax.cloud_dns
-        try:
-            dom = dns.find(name=self.kvarg['domain_name'])
-        except exc.NotFound:
-            cmd_out = "domain '%s' does not exist" % self.kvarg['domain_name']
-            self.r(1, cmd_out, ERROR)
-            return False
-        
-        sub_iter = dns.get_record_iterator(dom)
-        [sub.delete() for sub in sub_iter if sub.type != "NS"]
-        cmd_out = "dns record deleted"
-        self.r(0, cmd_out, INFO)
+        return self._bulk_records('delete')
     
     def complete_delete_records(self, text, line, begidx, endidx):
-        params = ['domain_name:']
+        params = ['concurrency:', 'data:', 'domain_name:', 'name:', 'type:']
         if not text:
             completions = params[:]
         else:
@@ -341,22 +352,19 @@ class Cmd_dns(Plugin, cmd.Cmd):
             return False
         self.r(0, retmsg, INFO)     # everything's ok
         
-        dns = pyrax.cloud_dns
         try:
-            dom = dns.find(name=self.kvarg['domain_name'])
-            try:
-                dom.delete()
+            if self.libplugin.delete_domain(self.kvarg['domain_name']):
                 cmd_out = ("The domain '%s' was successfully deleted." %
                            self.kvarg['domain_name'])
                 self.r(0, cmd_out, INFO)
-            except:
-                cmd_out = ("it was not possible to delete '%s' domain " %
+            else:
+                cmd_out = ("There is no DNS information for the domain '%s'." %
                            self.kvarg['domain_name'])
-                self.r(1, cmd_out, ERROR)
-        except exc.NotFound:
-            cmd_out = ("There is no DNS information for the domain '%s'." %
+                self.r(0, cmd_out, INFO)
+        except:
+            cmd_out = ("it was not possible to delete '%s' domain " %
                        self.kvarg['domain_name'])
-            self.r(0, cmd_out, INFO)
+            self.r(1, cmd_out, ERROR)
     
     def complete_delete_domain(self, text, line, begidx, endidx):
         params = ['domain_name:']
@@ -391,6 +399,148 @@ class Cmd_dns(Plugin, cmd.Cmd):
     def do_exit(self,*args):
         return True
 
+    def do_update_records(self, line):
+        '''
+        update TTL and/or data of DNS records, in batches, concurrently
+        
+        domain_name       name of the domain
+        type              update only records of this type (i.e.: A)
+        name              update only records with this name
+        data              update only records with this data
+        new_ttl           TTL to set
+        new_data          data to set, i.e.: 1.2.3.4
+        concurrency       concurrent API requests (default:
+                          DNS_BULK_CONCURRENCY)
+        
+        i.e.: update_records domain_name:example.com data:1.2.3.4
+                  new_data:5.6.7.8 new_ttl:300
+        '''
+        # check and set defaults
+        retcode, retmsg = self.kvargcheck(
+            {'name':'domain_name', 'required':True},
+            {'name':'type', 'default':None},
+            {'name':'name', 'default':None},
+            {'name':'data', 'default':None},
+            {'name':'new_ttl', 'default':None},
+            {'name':'new_data', 'default':None},
+            {'name':'concurrency', 'default':DNS_BULK_CONCURRENCY}
+        )
+        if not retcode:             # something bad happened
+            self.r(1, retmsg, ERROR)
+            return False
+        self.r(0, retmsg, INFO)     # everything's ok
+        changes = {}
+        if self.kvarg['new_ttl'] != None:
+            try:
+                changes['ttl'] = int(self.kvarg['new_ttl'])
+            except ValueError:
+                cmd_out = "invalid new_ttl '%s'" % self.kvarg['new_ttl']
+                self.r(1, cmd_out, ERROR)
+                return False
+        if self.kvarg['new_data'] != None:
+            changes['data'] = self.kvarg['new_data']
+        if not changes:
+            self.r(1, "missing 'new_ttl' or 'new_data'", ERROR)
+            return False
+        return self._bulk_records('update', **changes)
+    
+    def complete_update_records(self, text, line, begidx, endidx):
+        params = ['concurrency:', 'data:', 'domain_name:', 'name:',
+                  'new_data:', 'new_ttl:', 'type:']
+        if not text:
+            completions = params[:]
+        else:
+            completions = [ f
+                           for f in params
+                            if f.startswith(text)
+                            ]
+        return completions
+    
+    def _bulk_records(self, action, **changes):
+        '''
+        run a bulk 'action' on the records matching 'self.kvarg'
+        '''
+        dom = self.libplugin.get_domain_by_name(self.kvarg['domain_name'])
+        if not dom:
+            cmd_out = "domain '%s' does not exist" % self.kvarg['domain_name']
+            self.r(1, cmd_out, ERROR)
+            return False
+        try:
+            concurrency = int(self.kvarg['concurrency'])
+        except ValueError:
+            cmd_out = "invalid concurrency '%s'" % self.kvarg['concurrency']
+            self.r(1, cmd_out, ERROR)
+            return False
+        try:
+            records = self.libplugin.find_records(
+                dom, self.kvarg['type'], self.kvarg['name'],
+                self.kvarg['data'],
+                exclude_types=('NS',) if action == 'delete' else ())
+            job = self.libplugin.bulk_records(action, dom, records,
+                                              concurrency, **changes)
+            self.libplugin.print_pt_record_job(job)
+        except:
+            tb = traceback.format_exc()
+            self.r(1, tb, ERROR)
+            return False
+    
+    def do_import_records(self, line):
+        '''
+        import DNS records from a BIND zone file or a CSV file
+        ('name,type,data[,ttl[,priority]]'), records are added to the nearest
+        domain, creating missing subdomains
+        
+        file           zone file, or CSV file ('*.csv')
+        origin         origin of relative names (default: '$ORIGIN', or zone
+                       file name)
+        ttl            TTL of records without one (default: '$TTL')
+        concurrency    concurrent API requests (default:
+                       DNS_BULK_CONCURRENCY)
+        
+        i.e.: import_records file:~/example.com.zone
+        '''
+        # check and set defaults
+        retcode, retmsg = self.kvargcheck(
+            {'name':'file', 'required':True},
+            {'name':'origin', 'default':None},
+            {'name':'ttl', 'default':None},
+            {'name':'concurrency', 'default':DNS_BULK_CONCURRENCY}
+        )
+        if not retcode:             # something bad happened
+            self.r(1, retmsg, ERROR)
+            return False
+        self.r(0, retmsg, INFO)     # everything's ok
+        try:
+            records = zonefile.read_records(self.kvarg['file'],
+                                            self.kvarg['origin'],
+                                            self.kvarg['ttl'])
+        except (IOError, ValueError) as e:
+            cmd_out = "cannot read '%s': %s" % (self.kvarg['file'], e)
+            self.r(1, cmd_out, ERROR)
+            return False
+        try:
+            job = self.libplugin.import_records(
+                        records, int(self.kvarg['concurrency']))
+            self.libplugin.print_pt_record_job(job)
+        except AdmissionError as e:
+            self.r(1, str(e), ERROR)
+            return False
+        except:
+            tb = traceback.format_exc()
+            self.r(1, tb, ERROR)
+            return False
+    
+    def complete_import_records(self, text, line, begidx, endidx):
+        params = ['concurrency:', 'file:', 'origin:', 'ttl:']
+        if not text:
+            completions = params[:]
+        else:
+            completions = [ f
+                           for f in params
+                            if f.startswith(text)
+                            ]
+        return completions
+    
     def do_list_records(self, line):
         '''
         list DNS records
@@ -406,7 +556,7 @@ class Cmd_dns(Plugin, cmd.Cmd):
             return False
         self.r(0, retmsg, INFO)     # everything's ok
         
-        dns = pyrax.cloud_dns
+        dns = self.context.cloud_dns
         try:
             import time
             time.sleep(2)
@@ -451,8 +601,7 @@ class Cmd_dns(Plugin, cmd.Cmd):
         list domains
         '''
         logging.debug('listing dns domains')
-        dns = pyrax.cloud_dns
-        domains = dns.list()
+        domains = self.libplugin.list_domains()
         try:
             header = ['id', 'name', 'email address', 'created', 'ttl']
             pt = PrettyTable(header)
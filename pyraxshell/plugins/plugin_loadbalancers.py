@@ -19,7 +19,6 @@ import cmd
 import logging
 from prettytable import PrettyTable
 import pprint
-import pyrax
 import pyrax.exceptions as exc
 import traceback
 
@@ -46,9 +45,13 @@ class Cmd_loadbalancers(Plugin, cmd.Cmd):
     
     prompt = "RS lb>"  # default prompt
     
-    def __init__(self):
-        Plugin.__init__(self)
-        self.libplugin = LibLoadBalancers()
+    completion = {
+        'id'        : ('loadbalancers', 'id', 'list_loadbalancers'),
+    }
+    
+    def __init__(self, context=None):
+        Plugin.__init__(self, context)
+        self.libplugin = LibLoadBalancers(self.context)
         
         # declared Cloud Load-balancers nodes
         self.declared_nodes = []
@@ -98,10 +101,11 @@ class Cmd_loadbalancers(Plugin, cmd.Cmd):
             return False
         self.r(0, retmsg, INFO)     # everything's ok
         
-        clb = pyrax.cloud_loadbalancers
-        if self.kvarg['protocol'] not in clb.protocols:
+        clb = self.context.cloud_loadbalancers
+        protocols = self.libplugin.list_protocols()
+        if self.kvarg['protocol'] not in protocols:
             cmd_out = ("protocol '%s' not allowed possible values: " 
-                       ', '.join([p for p in clb.protocols]))
+                       ', '.join([p for p in protocols]))
             self.r(1, cmd_out, WARN)
             return False
         try:
@@ -110,6 +114,7 @@ class Cmd_loadbalancers(Plugin, cmd.Cmd):
                        protocol = self.kvarg['protocol'],
                        nodes = self.declared_nodes,
                        virtual_ips = [vip])
+            self.libplugin.invalidate('loadbalancers')
             cmd_out = ('created load-balancer name:%s, virtual_ip:%s, port:%s,'
                       ' protocol:%s, nodes:[%s]' %
                       (self.kvarg['name'], self.kvarg['virtual_ip_type'],
@@ -147,9 +152,10 @@ class Cmd_loadbalancers(Plugin, cmd.Cmd):
         self.r(0, retmsg, INFO)     # everything's ok
         
         try:
-            clb = pyrax.cloud_loadbalancers
+            clb = self.context.cloud_loadbalancers
             lb = clb.get(self.kvarg['id'])
             lb.delete()
+            self.libplugin.invalidate('loadbalancers', self.kvarg['id'])
             cmd_out = 'deleted load-balancer id:%s' % self.kvarg['id']
             self.r(0, cmd_out, INFO)
         except Exception:
@@ -184,14 +190,9 @@ class Cmd_loadbalancers(Plugin, cmd.Cmd):
         
         try:
             pt = PrettyTable(['key', 'value'])
-# TODO --   #
-            # if I do 'lb = clb.get(_id)' then lb does not have 'nodeCount'
-            # attribute. Why?
-            #clb = pyrax.cloud_loadbalancers
             lb = self.libplugin.get_loadbalancer_by_id(self.kvarg['id'])
-            #
             pt.add_row(['id', self.kvarg['id']])
-            pt.add_row(['node count', lb.nodeCount])
+            pt.add_row(['node count', self.libplugin.get_node_count(lb)])
             pt.align['key'] = 'l'
             pt.align['value'] = 'l'
             self.r(0, str(pt), INFO)
@@ -283,32 +284,66 @@ class Cmd_loadbalancers(Plugin, cmd.Cmd):
     def do_list(self, line):
         '''
         list load balancers
+        
+        regions    'all', or comma separated list of regions (i.e.: DFW,ORD),
+                   queried concurrently (optional, default: current region)
         '''
         logging.debug("line: %s" % line)
         logging.info("listing cloud load balancers")
-        clb = pyrax.cloud_loadbalancers
-        pt = PrettyTable(['id', 'name', 'node count', 'protocol',
-                          'virtual_ips',
-                          'port', 'status', 'algorithm', 'timeout'])
-        for lb in clb.list():
-            pt.add_row([
+        retcode, retmsg = self.kvargcheck(
+            {'name':'regions', 'default':None}
+        )
+        if not retcode:             # something bad happened
+            self.r(1, retmsg, ERROR)
+            return False
+        columns = ['id', 'name', 'node count', 'protocol', 'virtual_ips',
+                   'port', 'status', 'algorithm', 'timeout']
+        if self.kvarg['regions'] == None:
+            listings = {None: self.libplugin.list_loadbalancers()}
+            errors = {}
+        else:
+            listings, errors = self.libplugin.fan_out(
+                'cloud_loadbalancers',
+                self.libplugin.list_regions(self.kvarg['regions']),
+                lambda clb: clb.list())
+            columns.insert(0, 'region')
+        pt = PrettyTable(columns)
+        for region, lbs in listings.items():
+            for lb in lbs:
+                row = [
                         lb.id, lb.name, lb.nodeCount, lb.protocol,
                         '\n'.join(["%s (%s)" % (i.address, i.type)
                                    for i in lb.virtual_ips]),
                         lb.port, lb.status, lb.algorithm, lb.timeout
-                        ])
+                        ]
+                if region != None:
+                    row.insert(0, region)
+                pt.add_row(row)
         pt.align['virtual_ips'] = 'l'
+        for region, error in errors.items():
+            cmd_out = 'cannot list load balancers in %s: %s' % (region, error)
+            self.r(1, cmd_out, ERROR)
         self.r(0, str(pt), INFO)
     
+    def complete_list(self, text, line, begidx, endidx):
+        params = ['regions:']
+        if not text:
+            completions = params[:]
+        else:
+            completions = [ f
+                           for f in params
+                            if f.startswith(text)
+                            ]
+        return completions
+    
     def do_list_algorithms(self, line):
         '''
         list load balancers algorithms
         '''
         logging.debug("line: %s" % line)
         logging.info("listing cloud load balancers algorithms")
-        clb = pyrax.cloud_loadbalancers
         pt = PrettyTable(['name'])
-        for alg in clb.algorithms:
+        for alg in self.libplugin.list_algorithms():
             pt.add_row([alg])
         pt.align['name'] = 'l'
         self.r(0, str(pt), INFO)
@@ -328,7 +363,7 @@ class Cmd_loadbalancers(Plugin, cmd.Cmd):
             return False
         self.r(0, retmsg, INFO)     # everything's ok
         
-        clb = pyrax.cloud_loadbalancers
+        clb = self.context.cloud_loadbalancers
         pt = PrettyTable(['index', 'type', 'condition', 'id', 'address', 'port',
                           'weight'])
         try:
@@ -363,9 +398,8 @@ class Cmd_loadbalancers(Plugin, cmd.Cmd):
         '''
         logging.debug("line: %s" % line)
         logging.info("listing cloud load balancers protocols")
-        clb = pyrax.cloud_loadbalancers
         pt = PrettyTable(['name'])
-        for p in clb.protocols:
+        for p in self.libplugin.list_protocols():
             pt.add_row([p])
         pt.align['name'] = 'l'
         self.r(1, pt, ERROR)
@@ -386,7 +420,7 @@ class Cmd_loadbalancers(Plugin, cmd.Cmd):
         self.r(0, retmsg, INFO)     # everything's ok
         
         try:
-            clb = pyrax.cloud_loadbalancers
+            clb = self.context.cloud_loadbalancers
             lb = clb.get(self.kvarg['id'])
             pprint.pprint(lb)
             pt = PrettyTable(['id', 'type', 'address', 'ip_version'])
@@ -488,6 +522,7 @@ class Cmd_loadbalancers(Plugin, cmd.Cmd):
             return False
         try:
             lb.update(**d_kv)
+            self.libplugin.invalidate('loadbalancers', _id)
             cmd_out = "updated Cloud load-balancer id:%s (%s)" % (_id, d_kv)
             self.r(0, cmd_out, INFO)
         except:
@@ -536,7 +571,7 @@ class Cmd_loadbalancers(Plugin, cmd.Cmd):
             self.r(1, cmd_out, WARN)
             return False
         try:
-            clb = pyrax.cloud_loadbalancers
+            clb = self.context.cloud_loadbalancers
             self.declared_nodes.append(clb.Node(address = self.kvarg['address'],
                                         port = self.kvarg['port'],
                                         condition = self.kvarg['condition']))
@@ -581,6 +616,7 @@ class Cmd_loadbalancers(Plugin, cmd.Cmd):
                                                  self.kvarg['node_id'])
 #TODO -- print node details
             node.delete()
+            self.libplugin.invalidate('loadbalancers', self.kvarg['id'])
             cmd_out = ("node id:%s from Cloud load-balancer id:%s deleted" %
                        (self.kvarg['id'], self.kvarg['node_id']))
             self.r(0, cmd_out, INFO)
@@ -683,6 +719,7 @@ class Cmd_loadbalancers(Plugin, cmd.Cmd):
                                                  self.kvarg['node_id'])
             node.condition = self.kvarg['condition']
             node.update()
+            self.libplugin.invalidate('loadbalancers', self.kvarg['id'])
             cmd_out = ("set node id:%s condition:%s in Cloud Load-balancer "
                        "id:%s" % (self.kvarg['id'], self.kvarg['condition'],
                                   self.kvarg['node_id']))
@@ -18,12 +18,12 @@
 import cmd
 import logging
 from prettytable import PrettyTable
-import pyrax
 import traceback
 
 from globals import *  # @UnusedWildImport
 from plugin import Plugin
-from plugins.libservers import LibServers, ServerCreatorThread
+from plugins.liblimits import AdmissionError
+from plugins.libservers import LibServers
 from utility import kvstring_to_dict
 
 name = 'servers'
@@ -42,10 +42,17 @@ class Cmd_servers(Plugin, cmd.Cmd):
     '''
     
     prompt = "RS servers>"    # default prompt
+    
+    completion = {
+        'flavor_id' : ('flavors', 'id', 'list_cloudservers_flavors'),
+        'id'        : ('servers', 'id', 'list_cloudservers'),
+        'image_id'  : ('images', 'id', 'list_cloudservers_images'),
+        'name'      : ('servers', 'name', 'list_cloudservers'),
+    }
 
-    def __init__(self):
-        Plugin.__init__(self)
-        self.libplugin = LibServers()
+    def __init__(self, context=None):
+        Plugin.__init__(self, context)
+        self.libplugin = LibServers(self.context)
 
     # ########################################
     # SERVER    
@@ -76,6 +83,7 @@ class Cmd_servers(Plugin, cmd.Cmd):
         try:
             if s.status == 'ACTIVE':
                 s.change_password(self.kvarg['password'])
+                self.libplugin.invalidate('servers', s.id)
                 cmd_out = ('changed root password on server id:%s, name:%s' %
                            (self.kvarg['id'], s.name))
                 self.r(0, cmd_out, INFO)
@@ -100,41 +108,92 @@ class Cmd_servers(Plugin, cmd.Cmd):
     
     def do_create(self, line):
         '''
-        create a new server
+        create a new server, or 'count' servers
         
         Parameters:
         
         flavor_id        see: list_flavors
         image_id         see: list_images
-        name
+        name             name, or name template when 'count' is given, where
+                         '{n}' is replaced by 1..count (default: 'name-{n}')
+        count            number of servers to create (optional, default:1)
+        concurrency      maximum number of concurrent creation requests
+                         (optional, default:BULK_CONCURRENCY)
+        
+        i.e.: create name:web-{n} count:20 flavor_id:2 image_id:...
         '''
         # check and set defaults
         retcode, retmsg = self.kvargcheck(
             {'name':'flavor_id', 'required':True},
             {'name':'image_id', 'required':True},
-            {'name':'name', 'required':True}
+            {'name':'name', 'required':True},
+            {'name':'count', 'default':1},
+            {'name':'concurrency', 'default':BULK_CONCURRENCY}
         )
         if not retcode:             # something bad happened
             self.r(1, retmsg, ERROR)
             return False
         self.r(0, retmsg, INFO)     # everything's ok
+        # additional checks, against catalog
+        if (self.libplugin.get_cloudserver_flavor(self.kvarg['flavor_id'])
+            == None):
+            cmd_out = ('flavor_id:%s not found (see: list_flavors)' %
+                       self.kvarg['flavor_id'])
+            self.r(1, cmd_out, ERROR)
+            return False
+        if self.libplugin.get_cloudserver_image(self.kvarg['image_id']) == None:
+            cmd_out = ('image_id:%s not found (see: list_images)' %
+                       self.kvarg['image_id'])
+            self.r(1, cmd_out, ERROR)
+            return False
+        try:
+            count = int(self.kvarg['count'])
+            concurrency = int(self.kvarg['concurrency'])
+            if count < 1 or concurrency < 1:
+                raise ValueError
+        except ValueError:
+            cmd_out = '\'count\' and \'concurrency\' must be positive integers'
+            self.r(1, cmd_out, ERROR)
+            return False
         
+        if count > 1:
+            template = self.kvarg['name']
+            if '{n' not in template:
+                template += '-{n}'
+            try:
+                names = [template.format(n=n) for n in range(1, count + 1)]
+            except (KeyError, IndexError, ValueError):
+                cmd_out = 'invalid name template \'%s\'' % template
+                self.r(1, cmd_out, ERROR)
+                return False
+            try:
+                job = self.libplugin.create_servers(names,
+                                                    self.kvarg['flavor_id'],
+                                                    self.kvarg['image_id'],
+                                                    concurrency)
+            except AdmissionError as e:
+                self.r(1, str(e), ERROR)
+                return False
+            cmd_out = ('creating %d servers (%s ... %s), concurrency:%d' %
+                       (count, names[0], names[-1], job.concurrency))
+            self.r(0, cmd_out, INFO)
+            # summary printed by ServerBuildJob in libservers
+            return None
         try:
-            # create ServerCreatorTread
-            sct = ServerCreatorThread(self.kvarg['name'],
-                                      self.kvarg['flavor_id'],
-                                      self.kvarg['image_id'],
-                                      poll_time = POLL_TIME)
-            # start thread
-            sct.setName('server-%s' % self.kvarg['name'])
-            sct.start()
-            # completion message printed by thread in libservers
+            server = self.libplugin.create_server(self.kvarg['name'],
+                                                  self.kvarg['flavor_id'],
+                                                  self.kvarg['image_id'])
+            cmd_out = ('creating server name:%s, id:%s' %
+                       (self.kvarg['name'], server.id))
+            self.r(0, cmd_out, INFO)
+            # completion message printed by poller callback in libservers
         except:
             tb = traceback.format_exc()
             self.r(1, tb, ERROR)
 
     def complete_create(self, text, line, begidx, endidx):
-        params = ['flavor_id:', 'image_id:', 'name:']
+        params = ['concurrency:', 'count:', 'flavor_id:', 'image_id:',
+                  'name:']
         if not text:
             completions = params[:]
         else:
@@ -201,17 +260,25 @@ class Cmd_servers(Plugin, cmd.Cmd):
         '''
         # check and set defaults
         retcode, retmsg = self.kvargcheck(
-            {'name':'id', 'required':True},
-            {'name':'name', 'required':True}
+            {'name':'id', 'default':None},
+            {'name':'name', 'default':None}
         )
         if not retcode:             # something bad happened
             self.r(1, retmsg, ERROR)
             return False
+        if self.kvarg['id'] == None and self.kvarg['name'] == None:
+            cmd_out = 'missing \'id\' or \'name\''
+            self.r(1, cmd_out, ERROR)
+            return False
         self.r(0, retmsg, INFO)     # everything's ok
                  
         try:
             # output in libservers
             self.libplugin.details_server(self.kvarg['id'], self.kvarg['name'])
+        except IndexError:
+            cmd_out = 'server id:%s not found' % self.kvarg['id']
+            self.r(1, cmd_out, ERROR)
+            return False
         except:
             tb = traceback.format_exc()
             self.r(1, tb, ERROR)
@@ -234,11 +301,34 @@ class Cmd_servers(Plugin, cmd.Cmd):
     def do_list(self, line):
         '''
         list my servers
+        
+        regions    'all', or comma separated list of regions (i.e.: DFW,ORD),
+                   queried concurrently (optional, default: current region)
         '''
         logging.info("list my servers")
         logging.debug("line: %s" % line)
+        retcode, retmsg = self.kvargcheck(
+            {'name':'regions', 'default':None}
+        )
+        if not retcode:             # something bad happened
+            self.r(1, retmsg, ERROR)
+            return False
+        regions = self.kvarg['regions']
+        if regions != None:
+            regions = self.libplugin.list_regions(regions)
         # output in libservers
-        self.libplugin.print_pt_cloudservers()
+        self.libplugin.print_pt_cloudservers(regions)
+    
+    def complete_list(self, text, line, begidx, endidx):
+        params = ['regions:']
+        if not text:
+            completions = params[:]
+        else:
+            completions = [ f
+                           for f in params
+                            if f.startswith(text)
+                            ]
+        return completions
     
     def do_list_flavors(self, line):
         '''
@@ -291,6 +381,7 @@ class Cmd_servers(Plugin, cmd.Cmd):
         try:
             if s.status == 'ACTIVE':
                 s.reboot(_type)
+                self.libplugin.invalidate('servers', s.id)
                 cmd_out = '%s rebooted server id:%s' % (_type, self.kvarg['id'])
                 self.r(0, cmd_out, INFO)
             else:
@@ -348,7 +439,11 @@ class Cmd_servers(Plugin, cmd.Cmd):
             self.r(1, cmd_out, ERROR)
             return False
         try:
-            s.create_image(self.kvarg['snapshot_name'])
+            snapshot_id = s.create_image(self.kvarg['snapshot_name'])
+            self.libplugin.invalidate('servers', s.id)
+            self.libplugin.invalidate('images')
+            self.libplugin.watch_snapshot(snapshot_id,
+                                          self.kvarg['snapshot_name'])
             cmd_out = ('took snapshot name:%s of server id:%s' %
                        (self.kvarg['snapshot_name'], self.kvarg['id']))
             self.r(0, cmd_out, INFO)
@@ -385,10 +480,11 @@ class Cmd_servers(Plugin, cmd.Cmd):
         self.r(0, retmsg, INFO)     # everything's ok
         
         try:
-            cs = pyrax.cloudservers
+            cs = self.context.cloudservers
             snapshot = [ss for ss in cs.list_snapshots() if ss.id ==
                         self.kvarg['id']][0]
             snapshot.delete()
+            self.libplugin.invalidate('images', snapshot.id)
             cmd_out = 'deleted snapshot id:%s' % snapshot.id
             self.r(0, cmd_out, INFO)
         except IndexError:
@@ -419,7 +515,7 @@ class Cmd_servers(Plugin, cmd.Cmd):
         logging.info("list snapshots")
         logging.debug("line: %s" % line)
         try:
-            cs = pyrax.cloudservers
+            cs = self.context.cloudservers
             pt = PrettyTable(['id', 'name', 'created', 'minDisk', 'minRam',
                               'progress', 'server id', 'status', 'updated'])
             for ss in cs.list_snapshots():
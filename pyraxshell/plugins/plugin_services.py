@@ -19,10 +19,10 @@ import cmd
 import logging
 import pprint
 from prettytable import PrettyTable
-import pyrax
 
 from globals import INFO, ERROR
 from plugin import Plugin
+from plugins.liblimits import LibLimits
 from plugins.libservices import LibServices
 from utility import kvstring_to_dict
 
@@ -45,9 +45,9 @@ class Cmd_services(Plugin, cmd.Cmd):
     """
     prompt = "RS %s>" % name    # default prompt
     
-    def __init__(self):
-        Plugin.__init__(self)
-        self.libplugin = LibServices()
+    def __init__(self, context=None):
+        Plugin.__init__(self, context)
+        self.libplugin = LibServices(self.context)
 
     # ########################################
     # ENDPOINTS
@@ -75,7 +75,7 @@ class Cmd_services(Plugin, cmd.Cmd):
                 raw = False
         if not raw:
             pt = PrettyTable(['service', 'name', 'endpoints'])
-            for k,v in pyrax.identity.services.items():  # @UndefinedVariable
+            for k,v in self.context.identity.services.items():  # @UndefinedVariable
 #                 print "service: %s" % k
 #                 print "\tname: %s" % v['name']
 #                 print "\tendpoints: %s" % v['endpoints']
@@ -90,7 +90,7 @@ class Cmd_services(Plugin, cmd.Cmd):
             pt.align['endpoints'] = 'l'
             self.r(0, pt, INFO)
         else:
-            cmd_out = pprint.pformat(pyrax.identity.services)
+            cmd_out = pprint.pformat(self.context.identity.services)
             self.r(0, cmd_out, INFO)
     
     def complete_endpoints(self, text, line, begidx, endidx):
@@ -104,11 +104,55 @@ class Cmd_services(Plugin, cmd.Cmd):
                             ]
         return completions
     
+    # ########################################
+    # LIMITS
+    def do_limits(self, line):
+        '''
+        list absolute limits and current usage
+        
+        service        compute, loadbalancers, dns or databases (optional,
+                       default: all)
+        refresh        True to bypass the cache (default: False)
+        '''
+        # check and set defaults
+        retcode, retmsg = self.kvargcheck(
+            {'name':'service', 'default':''},
+            {'name':'refresh', 'default':'false'}
+        )
+        if not retcode:             # something bad happened
+            self.r(1, retmsg, ERROR)
+            return False
+        self.r(0, retmsg, INFO)     # everything's ok
+        services = LibLimits.SERVICES
+        if self.kvarg['service']:
+            if self.kvarg['service'] not in services:
+                cmd_out = ('service must be one of: %s' %
+                           ', '.join(services))
+                self.r(1, cmd_out, ERROR)
+                return False
+            services = (self.kvarg['service'],)
+        lib = LibLimits(self.context)
+        if str(self.kvarg['refresh']).lower() == 'true':
+            for s in services:
+                lib.cache.forget('limits', s)
+        lib.print_pt_limits(services)
+    
+    def complete_limits(self, text, line, begidx, endidx):
+        params = ['refresh:', 'service:']
+        if not text:
+            completions = params[:]
+        else:
+            completions = [ f
+                           for f in params
+                            if f.startswith(text)
+                            ]
+        return completions
+    
     def do_list(self, line):
         '''
         list services
         '''
-        logging.info("\n".join([s for s in pyrax.services]))
+        logging.info("\n".join([s for s in self.context.services]))
     
     def do_test(self, line):
         '''
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+import logging
+import threading
+import time
+import traceback
+
+from context import current
+from globals import POLL_BACKOFF, POLL_MAX_MISSES, POLL_MAX_TIME, POLL_TIME
+from jobs import JobManager
+from singleton import SessionSingleton
+
+# statuses of a resource which is not going to change without user action
+DONE_STATUSES = ('ACTIVE', 'ERROR', 'UNKNOWN')
+
+
+def status(obj):
+    '''
+    default state of a watched resource
+    '''
+    return obj.status
+
+
+def status_progress(obj):
+    '''
+    state of resources reporting progress, i.e.: servers and snapshots
+    '''
+    return (obj.status, getattr(obj, 'progress', None))
+
+
+class Watch(object):
+    '''
+    resource registered with the Poller
+    '''
+    
+    def __init__(self, kind, _id, callback, state, done, interval):
+        self.kind = kind
+        self.id = _id
+        self.callback = callback
+        self.state_of = state
+        self.done = done
+        self.interval = interval
+        self.next_poll = time.time() + interval
+        self.state = None
+        self.misses = 0
+        # Job listed by 'jobs', cancelling it unwatches the resource
+        self.job = None
+    
+    def __repr__(self):
+        return '<Watch %s:%s %s>' % (self.kind, self.id, self.state)
+    
+    def describe(self):
+        '''
+        return the last state as text, i.e.: 'BUILD 40'
+        '''
+        state = self.state if isinstance(self.state, tuple) else (self.state,)
+        return ' '.join(str(s) for s in state if s != None)
+
+
+class PollerThread(threading.Thread):
+    '''
+    thread polling resources watched by the Poller
+    '''
+    
+    def __init__(self, poller):
+        threading.Thread.__init__(self)
+        self.setName('poller')
+        self.setDaemon(True)
+        self.poller = poller
+        self.context = current()
+    
+    def run(self):
+        with self.context:
+            while True:
+                delay = self.poller.wait()
+                if delay <= 0:
+                    self.poller.poll()
+
+
+@SessionSingleton
+class Poller:
+    '''
+    single status poller for resources being built (i.e.: servers, database
+    instances, snapshots)
+    
+    Resources are registered with 'watch()'; every interval the poller makes
+    one listing per resource kind, whatever the number of watched resources of
+    that kind, and calls back on every state transition. The polling interval
+    of a resource starts from 'min_interval', is multiplied by 'backoff' while
+    its state does not change, and is reset on transitions. Resources are
+    unwatched as soon as their status is in 'done' (default: DONE_STATUSES),
+    or when they disappear from listings.
+    '''
+    
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        self.min_interval = POLL_TIME
+        self.max_interval = POLL_MAX_TIME
+        self.backoff = POLL_BACKOFF
+        self.max_misses = POLL_MAX_MISSES
+        # number of listings made
+        self.requests = 0
+        # kind --> callable returning the listing of kind
+        self._listers = {}
+        # (kind, id) --> Watch
+        self._watches = {}
+        self._cond = threading.Condition()
+        self._thread = None
+    
+    def poll(self, now=None):
+        '''
+        list every kind having resources due, and dispatch state transitions
+        '''
+        now = now or time.time()
+        with self._cond:
+            kinds = set(w.kind for w in self._watches.values()
+                        if w.next_poll <= now)
+        for kind in kinds:
+            self._poll_kind(kind, now)
+    
+    def _poll_kind(self, kind, now):
+        '''
+        list resources of 'kind' once, and update every watch of 'kind'
+        '''
+        with self._cond:
+            lister = self._listers[kind]
+            watches = [w for w in self._watches.values() if w.kind == kind]
+        try:
+            self.requests += 1
+            objects = dict((str(o.id), o) for o in lister())
+        except:
+            tb = traceback.format_exc()
+            logging.debug(tb)
+            logging.warn('cannot poll %s' % kind)
+            for w in watches:
+                if w.next_poll <= now:
+                    self._backoff(w, now)
+            return
+        for w in watches:
+            obj = objects.get(str(w.id))
+            if obj == None:
+                w.misses += 1
+                if w.misses >= self.max_misses:
+                    logging.debug('%s gone' % w)
+                    self.unwatch(kind, w.id)
+                    self._notify(w, None, None)
+                elif w.next_poll <= now:
+                    self._backoff(w, now)
+                continue
+            w.misses = 0
+            state = w.state_of(obj)
+            if state != w.state:
+                old, w.state = w.state, state
+                w.interval = self.min_interval
+                w.next_poll = now + w.interval
+                if obj.status in w.done:
+                    self.unwatch(kind, w.id)
+                self._notify(w, obj, old)
+            elif w.next_poll <= now:
+                self._backoff(w, now)
+    
+    def _backoff(self, w, now):
+        w.interval = min(w.interval * self.backoff, self.max_interval)
+        w.next_poll = now + w.interval
+    
+    def _notify(self, w, obj, old):
+        try:
+            w.callback(obj, old, w.state)
+        except:
+            tb = traceback.format_exc()
+            logging.error(tb)
+    
+    def unwatch(self, kind, _id):
+        '''
+        stop watching resource '_id' of 'kind'
+        '''
+        with self._cond:
+            w = self._watches.pop((kind, str(_id)), None)
+        if w != None and w.job != None:
+            w.job.finish()
+    
+    def wait(self):
+        '''
+        wait until the next resource is due, or a new one is watched; return
+        seconds left to the next poll
+        '''
+        with self._cond:
+            while not self._watches:
+                self._cond.wait()
+            delay = (min(w.next_poll for w in self._watches.values()) -
+                     time.time())
+            if delay > 0:
+                self._cond.wait(delay)
+        return delay
+    
+    def watch(self, kind, _id, callback, lister, state=status,
+              done=DONE_STATUSES):
+        '''
+        watch resource '_id' of 'kind' until its status is in 'done'
+        
+        callback    called as callback(obj, old_state, new_state) on every
+                    state transition; 'obj' is the resource from the last
+                    listing, None if it is gone
+        lister      callable returning every resource of 'kind', i.e.:
+                    'pyrax.cloudservers.servers.list'
+        state       callable returning the state of a resource, transitions
+                    are changes of state (default: status)
+        '''
+        w = Watch(kind, _id, callback, state, done, self.min_interval)
+        w.job = JobManager.Instance().track(  # @UndefinedVariable
+                    'watch %s %s' % (kind, _id),
+                    on_cancel=lambda: self.unwatch(kind, _id),
+                    progress=w.describe)
+        with self._cond:
+            self._listers[kind] = lister
+            old = self._watches.get((kind, str(_id)))
+            self._watches[(kind, str(_id))] = w
+            self._cond.notify_all()
+            if self._thread == None or not self._thread.is_alive():
+                self._thread = PollerThread(self)
+                self._thread.start()
+        if old != None and old.job != None:
+            old.job.finish()
+    
+    def watching(self, kind=None):
+        '''
+        return watched resources, of 'kind' only if given
+        '''
+        with self._cond:
+            return [w for w in self._watches.values()
+                    if kind == None or w.kind == kind]
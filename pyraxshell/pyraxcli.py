@@ -18,20 +18,28 @@
 import subprocess
 import sys
 
+import daemon
+
 
 def show_usage():
-    print "pyraxcli <CMD> [, <CMD> ...]"
+    print "pyraxcli [--no-daemon] <CMD> [, <CMD> ...]"
     print
     print ("python pyraxshell/pyraxcli.py servers, list, EOF, loadbalancers, "
            "list, list_nodes id:81957")
+    print
+    print ("commands run in a pyraxshell daemon, started if needed, which "
+           "keeps authentication and caches between calls")
+    print ("output is streamed, each command's output after a "
+           "'==> <CMD> <==' header, and the exit status is the number of the "
+           "first command which failed")
+    print "--no-daemon    run commands in a new pyraxshell process"
 
 
-if __name__ == '__main__':
-    if len(sys.argv) == 1:
-        show_usage()
-        sys.exit(0)
-    args =  " ".join([a for a in sys.argv[1:]])
-    commands = args.split(',')
+def run_process(commands):
+    '''
+    run 'commands' in a new pyraxshell process, streaming its output, return
+    its exit code
+    '''
     process = subprocess.Popen(['python', 'pyraxshell'],
                                stdin=subprocess.PIPE,
                                stdout=subprocess.PIPE
@@ -40,7 +48,32 @@ if __name__ == '__main__':
         process.stdin.write("%s\n" % c)
     process.stdin.flush()
     process.stdin.close()
-    errcode = process.wait()
-    for line in process.stdout:
-        print line.rstrip()
-    sys.exit(errcode)
+    # read while it runs, a full pipe would block it
+    for line in iter(process.stdout.readline, ''):
+        sys.stdout.write(line)
+        sys.stdout.flush()
+    return process.wait()
+
+
+if __name__ == '__main__':
+    argv = sys.argv[1:]
+    use_daemon = '--no-daemon' not in argv[:1]
+    if not use_daemon:
+        argv = argv[1:]
+    if not argv:
+        show_usage()
+        sys.exit(0)
+    args =  " ".join([a for a in argv])
+    commands = args.split(',')
+    if not use_daemon:
+        sys.exit(run_process(commands))
+    sock = daemon.start()
+    if sock == None:
+        print >> sys.stderr, 'cannot start pyraxshell daemon'
+        sys.exit(1)
+    failed = daemon.send(sock, commands)
+    if failed:
+        print >> sys.stderr, ('pyraxcli: command %d failed: %s' %
+                              (failed[0], commands[failed[0] - 1].strip()))
+        sys.exit(min(failed[0], 255))
+    sys.exit(0)
@@ -19,7 +19,9 @@ import cmd
 import imp
 import logging  # @UnusedImport
 import os.path  # @UnusedImport
+from prettytable import PrettyTable
 
+from context import current
 from plugins.plugin import Plugin
 from utility import *  # @UnusedWildImport
 
@@ -34,13 +36,13 @@ class Cmd_Pyraxshell(Plugin, cmd.Cmd):
     
     prompt = "RS>"    # default prompt
     
-    def __init__(self):
+    def __init__(self, context=None):
         cmd.Cmd.__init__(self)
+        self.context = context or current()
         # plug-ins
         self.plugin_names = list()
         self.load_plugins()
-        # cmd as singleton
-        self.cfg = Configuration.Instance()  # @UndefinedVariable
+        self.cfg = self.context.configuration
         
         # no 'Cmd' output in non-interactive mode
         interactive = os.isatty(0)
@@ -74,6 +76,66 @@ class Cmd_Pyraxshell(Plugin, cmd.Cmd):
         '''
         return self.do_EOF(line)
     
+    def do_each_account(self, line):
+        '''
+        run a command against several accounts in parallel, output lines are
+        tagged by account
+        
+        @param accounts       comma separated list of accounts (default: all
+                              accounts in ACCOUNTS_FILE)
+        @param concurrency    accounts running at the same time (default:
+                              EACH_ACCOUNT_CONCURRENCY)
+        
+        i.e.: each_account accounts:acme,initech servers list, dns list_domains
+        '''
+        import plugins.libauth
+        lib = plugins.libauth.LibAuth()
+        stanzas, concurrency = None, EACH_ACCOUNT_CONCURRENCY
+        words = (self.arg or '').split()
+        # leading 'key:value' options, the command follows
+        while words and words[0].replace('=', ':').split(':')[0] in (
+                'accounts', 'concurrency'):
+            k, v = words.pop(0).replace('=', ':').split(':', 1)
+            if k == 'accounts':
+                stanzas = [s for s in v.split(',') if s]
+            else:
+                try:
+                    concurrency = int(v)
+                except ValueError:
+                    self.r(1, "invalid concurrency '%s'" % v, ERROR)
+                    return False
+        command = ' '.join(words)
+        if not command:
+            self.r(1, 'missing command', ERROR)
+            return False
+        accounts = lib.list_accounts()
+        if stanzas == None:
+            stanzas = accounts
+        unknown = [s for s in stanzas if s not in accounts]
+        if unknown:
+            self.r(1, 'unknown accounts: %s' % ', '.join(unknown), ERROR)
+            return False
+        succeeded, failed = lib.each_account(
+            lib.command_lines(command, self.plugin_names), stanzas,
+            concurrency)
+        cmd_out = "'%s' succeeded in %d accounts" % (command, len(succeeded))
+        if failed:
+            cmd_out += ', failed in: %s' % ', '.join(failed)
+            self.r(1, cmd_out, ERROR)
+        else:
+            self.r(0, cmd_out, INFO)
+    
+    def complete_each_account(self, text, line, begidx, endidx):
+        params = ['accounts:', 'concurrency:']
+        if not text:
+            completions = params[:]
+        else:
+            completions = [ f
+                           for f in params
+                            if f.startswith(text)
+                            ]
+        return completions
+    
     def do_list(self, line):
         '''
         '''
@@ -154,6 +216,48 @@ along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
                             ]
         return completions
     
+    def do_notifier_stats(self, line):
+        '''
+        display notification queue metrics: pending messages ('depth'),
+        messages coalesced with a pending one of the same job, and messages
+        dropped because the queue was full
+        '''
+        m = msg_queue.metrics()
+        pt = PrettyTable(['metric', 'value'])
+        for k in ('depth', 'max_depth', 'size', 'put', 'delivered',
+                  'coalesced', 'dropped'):
+            pt.add_row([k, m[k]])
+        pt.align['metric'] = 'l'
+        self.r(0, str(pt), INFO)
+    
+    def do_http_pool_stats(self, line):
+        '''
+        display keep-alive HTTP connections per API host: requests, errors,
+        connections opened and requests reusing an open connection
+        '''
+        from httppool import HTTPPool
+        pool = HTTPPool.Instance()  # @UndefinedVariable
+        pt = PrettyTable(['host', 'requests', 'errors', 'connections',
+                          'reused'])
+        for host, m in pool.stats().items():
+            pt.add_row([host, m['requests'], m['errors'], m['connections'],
+                        m['reused']])
+        pt.align['host'] = 'l'
+        self.r(0, 'pool size: %d\n%s' % (pool.size, pt), INFO)
+    
+    def do_rate_limit_stats(self, line):
+        '''
+        display client side rate limiter metrics: requests, requests which
+        waited for a token and seconds waited, retries after 413 or 503
+        '''
+        from ratelimit import RateLimiter
+        m = RateLimiter.Instance().stats()  # @UndefinedVariable
+        pt = PrettyTable(['metric', 'value'])
+        for k in ('limits', 'requests', 'waits', 'waited', 'retries'):
+            pt.add_row([k, m[k]])
+        pt.align['metric'] = 'l'
+        self.r(0, str(pt), INFO)
+    
     def do_reload_plugins(self, line):
         '''
         manually load plugins
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import email.utils
+import logging
+import random
+import re
+import threading
+import time
+import traceback
+
+from globals import (RATE_LIMIT_BACKOFF, RATE_LIMIT_JITTER,
+                     RATE_LIMIT_MAX_RETRIES, RATE_LIMIT_MAX_WAIT)
+from singleton import Singleton
+
+# seconds of the units of published rate limits
+UNITS = {'SECOND': 1, 'MINUTE': 60, 'HOUR': 3600, 'DAY': 86400}
+
+# HTTP status codes retried after waiting
+RETRY_STATUSES = (413, 503)
+
+
+def retry_after(value, now=None):
+    '''
+    return seconds to wait from a 'Retry-After' header value (seconds, or
+    HTTP date), None if it cannot be parsed
+    '''
+    if value == None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    date = email.utils.parsedate_tz(str(value))
+    if date == None:
+        return None
+    if now == None:
+        now = time.time()
+    return max(email.utils.mktime_tz(date) - now, 0)
+
+
+class TokenBucket(object):
+    '''
+    token bucket: 'capacity' tokens at most, refilled at 'rate' tokens per
+    second, a request takes a token
+    '''
+    
+    def __init__(self, rate, capacity, tokens=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity if tokens == None else float(tokens)
+        self.updated = time.time()
+        # no token is given before 'blocked_until' (i.e.: 'Retry-After')
+        self.blocked_until = 0
+        self._lock = threading.Lock()
+    
+    def block(self, seconds):
+        '''
+        hold every request for 'seconds'
+        '''
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.time() + seconds)
+            self.tokens = 0
+    
+    def available(self, now=None):
+        '''
+        return the number of tokens available now
+        '''
+        now = now or time.time()
+        with self._lock:
+            if now < self.blocked_until:
+                return 0
+            return int(min(self.capacity,
+                           self.tokens + (now - self.updated) * self.rate))
+    
+    def take(self, now=None):
+        '''
+        take a token if available, return 0, or the seconds to wait for one
+        '''
+        now = now or time.time()
+        with self._lock:
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+
+class Limit(object):
+    '''
+    published rate limit of requests matching 'verb' and 'regex'
+    '''
+    
+    def __init__(self, verb, regex, bucket):
+        self.verb = verb
+        self.regex = re.compile(regex)
+        self.bucket = bucket
+    
+    def matches(self, method, path):
+        return self.verb == method and self.regex.search(path) != None
+
+
+@Singleton
+class RateLimiter:
+    '''
+    client side rate limiter of the API requests made by pyrax and
+    novaclient clients
+    
+    Every request takes a token from the buckets of the limits it matches,
+    waiting for them if needed. Limits are seeded, per account and service,
+    from the rate limits published by the service ('GET /limits'). Requests
+    refused with 413 or 503 are retried after 'Retry-After' seconds (or an
+    exponential backoff), with jitter, up to RATE_LIMIT_MAX_RETRIES times.
+    '''
+    
+    def __init__(self):
+        self.max_retries = RATE_LIMIT_MAX_RETRIES
+        self.max_wait = RATE_LIMIT_MAX_WAIT
+        self.backoff = RATE_LIMIT_BACKOFF
+        self.jitter = RATE_LIMIT_JITTER
+        # (tenant, service) --> [Limit]
+        self._limits = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._installed = False
+        self._stats = {'requests': 0, 'waits': 0, 'waited': 0.0,
+                       'retries': 0}
+    
+    def acquire(self, key, method, path, sleep=time.sleep):
+        '''
+        wait until a request 'method path' can be made within the limits of
+        'key', at most 'max_wait' seconds per limit
+        '''
+        with self._lock:
+            limits = self._limits.get(key, [])
+            self._stats['requests'] += 1
+        for limit in limits:
+            if not limit.matches(method, path):
+                continue
+            waited = 0
+            delay = limit.bucket.take()
+            while delay > 0 and waited < self.max_wait:
+                delay = min(delay, self.max_wait - waited)
+                with self._lock:
+                    self._stats['waits'] += 1
+                    self._stats['waited'] += delay
+                sleep(delay)
+                waited += delay
+                delay = limit.bucket.take()
+    
+    def call(self, key, method, path, fn, sleep=time.sleep):
+        '''
+        return fn() (a request), limited, retrying it if refused with 413 or
+        503
+        '''
+        attempt = 0
+        while True:
+            self.acquire(key, method, path, sleep)
+            try:
+                return fn()
+            except Exception as e:
+                code = getattr(e, 'code', None) or getattr(e, 'http_status',
+                                                           None)
+                if code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    raise
+                delay = self.delay(attempt, getattr(e, 'retry_after', None))
+                logging.debug('%s %s refused (%s), retrying in %.1fs' %
+                              (method, path, code, delay))
+                with self._lock:
+                    limits = self._limits.get(key, [])
+                    self._stats['retries'] += 1
+                for limit in limits:
+                    if limit.matches(method, path):
+                        limit.bucket.block(delay)
+                sleep(delay)
+                attempt += 1
+    
+    def delay(self, attempt, retry_after_value=None):
+        '''
+        return seconds to wait before retry number 'attempt' (from 0)
+        '''
+        delay = retry_after(retry_after_value) or None
+        if delay == None:
+            delay = self.backoff * 2 ** attempt
+        delay = min(delay, self.max_wait)
+        return delay * (1 + random.random() * self.jitter)
+    
+    def headroom(self, key, method, path):
+        '''
+        return the number of requests 'method path' which can be made now
+        within the limits of 'key', None if unlimited
+        '''
+        with self._lock:
+            limits = self._limits.get(key, [])
+        available = [l.bucket.available() for l in limits
+                     if l.matches(method, path)]
+        return min(available) if available else None
+    
+    def is_seeded(self, key):
+        with self._lock:
+            return key in self._limits
+    
+    def seed(self, key, rate_limits):
+        '''
+        set the limits of 'key' from published rate limits, as returned by
+        'GET /limits' ('limits' --> 'rate'), i.e.:
+        
+            [{'regex': '^/servers', 'uri': '/servers*',
+              'limit': [{'verb': 'POST', 'value': 50, 'unit': 'DAY',
+                         'remaining': 48}]}]
+        '''
+        limits = []
+        for rate in rate_limits or []:
+            for l in rate.get('limit', []):
+                try:
+                    seconds = UNITS[l['unit'].upper()]
+                    value = float(l['value'])
+                    bucket = TokenBucket(value / seconds, value,
+                                         l.get('remaining', value))
+                    limits.append(Limit(l['verb'].upper(),
+                                        rate.get('regex') or '.*', bucket))
+                except (KeyError, ValueError, re.error):
+                    logging.debug('skipping rate limit %s' % l)
+        with self._lock:
+            self._limits[key] = limits
+        return limits
+    
+    def stats(self):
+        '''
+        return a dictionary with keys: requests, waits, waited, retries,
+        limits (number of limits seeded)
+        '''
+        with self._lock:
+            d = dict(self._stats)
+            d['limits'] = sum(len(l) for l in self._limits.values())
+            return d
+    
+    # ########################################
+    # CLIENTS
+    
+    def install(self):
+        '''
+        route the requests of pyrax and novaclient clients through the
+        limiter
+        '''
+        if self._installed:
+            return
+        self._installed = True
+        import novaclient.client
+        import pyrax.client
+        import pyrax.exceptions
+        limiter = self
+        
+        # pyrax exceptions do not keep response headers
+        from_response = pyrax.exceptions.from_response
+        def from_response_retry_after(resp, body):
+            e = from_response(resp, body)
+            e.retry_after = resp.get('retry-after')
+            return e
+        pyrax.exceptions.from_response = from_response_retry_after
+        
+        pyrax_time_request = pyrax.client.BaseClient._time_request
+        def pyrax_request(client, uri, method, **kwargs):
+            return limiter._request(
+                    client, client.service_type or client.name, uri, method,
+                    lambda: client.method_get('/limits'),
+                    lambda: pyrax_time_request(client, uri, method, **kwargs))
+        pyrax.client.BaseClient._time_request = pyrax_request
+        
+        nova_time_request = novaclient.client.HTTPClient._time_request
+        def nova_request(client, url, method, **kwargs):
+            return limiter._request(
+                    client, 'compute', url, method,
+                    lambda: client.get('/limits'),
+                    lambda: nova_time_request(client, url, method, **kwargs))
+        novaclient.client.HTTPClient._time_request = nova_request
+    
+    def _request(self, client, service, url, method, get_limits, fn):
+        '''
+        make request 'fn' of 'client', seeding limits of the account on
+        'service' first
+        '''
+        if getattr(self._local, 'seeding', False):
+            return fn()
+        from context import current
+        key = (getattr(current().identity, 'tenant_id', None), service)
+        if not self.is_seeded(key):
+            self._local.seeding = True
+            try:
+                resp, body = get_limits()  # @UnusedVariable
+                self.seed(key, body['limits']['rate'])
+            except:
+                logging.debug(traceback.format_exc())
+                # unlimited, but 413 and 503 are still retried
+                self.seed(key, [])
+            finally:
+                self._local.seeding = False
+        management_url = getattr(client, 'management_url', None) or ''
+        path = url[len(management_url):] if url.startswith(
+                                            management_url) else url
+        return self.call(key, method.upper(), path, fn)
@@ -20,11 +20,11 @@ import logging
 from db import DB
 from configuration import Configuration
 from globals import log_levels  # @UnresolvedImport
-from singleton import Singleton
+from singleton import SessionSingleton
 from utility import get_uuid
 
 
-@Singleton
+@SessionSingleton
 class Sessions(DB):
     '''
     manage sessions
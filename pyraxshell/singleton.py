@@ -15,10 +15,12 @@
 # You should have received a copy of the GNU General Public License
 # along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
 
+import threading
+
 
 class Singleton:
     """
-    A non-thread-safe helper class to ease implementing singletons.
+    A thread-safe helper class to ease implementing singletons.
     This should be used as a decorator -- not a metaclass -- to the
     class that should be a singleton.
 
@@ -38,6 +40,7 @@ class Singleton:
 
     def __init__(self, decorated):
         self._decorated = decorated
+        self._lock = threading.Lock()
 
     def Instance(self):
         """
@@ -49,11 +52,44 @@ class Singleton:
         try:
             return self._instance
         except AttributeError:
-            self._instance = self._decorated()
+            with self._lock:
+                if not hasattr(self, '_instance'):
+                    self._instance = self._decorated()
             return self._instance
 
+    def New(self):
+        """
+        Returns a new instance of the decorated class, not the singleton one.
+        """
+        return self._decorated()
+
     def __call__(self):
         raise TypeError('Singletons must be accessed through `Instance()`.')
 
     def __instancecheck__(self, inst):
         return isinstance(inst, self._decorated)
+
+
+class SessionSingleton(Singleton):
+    """
+    A singleton with one instance per session context (see `context`).
+
+    `Instance` returns the instance of the context active in the calling
+    thread, created on first use; the process-wide instance is the one of
+    the default context.
+    """
+
+    # callable returning the active context, None for the default one
+    scope = None
+
+    def Default(self):
+        """
+        Returns the instance of the default context, the process-wide one.
+        """
+        return Singleton.Instance(self)
+
+    def Instance(self):
+        context = SessionSingleton.scope and SessionSingleton.scope()
+        if context == None:
+            return self.Default()
+        return context.instance(self)
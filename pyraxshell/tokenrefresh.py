@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+import datetime
+import logging
+import threading
+import time
+import traceback
+
+from context import current
+from globals import AUTH_REFRESH_AHEAD, AUTH_REFRESH_COALESCE
+from singleton import SessionSingleton
+
+
+class TokenRefreshThread(threading.Thread):
+    '''
+    thread to refresh the token of the current identity before it expires
+    '''
+    
+    def __init__(self, refresh):
+        threading.Thread.__init__(self)
+        self.setName('token-refresh')
+        self.setDaemon(True)
+        self.refresh = refresh
+        self.context = current()
+    
+    def run(self):
+        with self.context:
+            refresh = self.refresh
+            while True:
+                # wake-ups from now on end the next wait, the state they
+                # change is read afterwards
+                refresh.rearm()
+                if refresh.stopped():
+                    break
+                delay = refresh.next_refresh()
+                if delay == None:
+                    # nothing to refresh until rescheduled
+                    refresh.wait(None)
+                elif delay > 0:
+                    refresh.wait(delay)
+                else:
+                    try:
+                        refresh.authenticate()
+                    except:
+                        tb = traceback.format_exc()
+                        logging.debug(tb)
+                        logging.warn('cannot refresh authentication token')
+                        # retry later, the current token is still valid
+                        refresh.wait(60)
+
+
+@SessionSingleton
+class TokenRefresh:
+    '''
+    refresh the token of 'pyrax.identity' in background before it expires,
+    and share a single re-authentication among concurrent callers
+    
+    'install()' replaces 'authenticate' of the identity, which pyrax clients
+    call when a request is refused with 401: callers arriving while a refresh
+    is running wait for it and reuse its token instead of calling the
+    identity endpoint again.
+    '''
+    
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        self.ahead = AUTH_REFRESH_AHEAD
+        self.coalesce = AUTH_REFRESH_COALESCE
+        self.identity = None
+        self.on_refresh = None
+        self.refreshed = 0      # time of the last refresh
+        self.refreshes = 0
+        self._authenticate = None
+        self._cond = threading.Condition(threading.Lock())
+        self._refreshing = False
+        self._stop = False
+        self._wake = threading.Event()
+        self._thread = None
+    
+    def authenticate(self):
+        '''
+        re-authenticate the identity, once for all concurrent callers
+        '''
+        with self._cond:
+            if self._refreshing:
+                while self._refreshing:
+                    self._cond.wait()
+                return
+            if time.time() - self.refreshed < self.coalesce:
+                # somebody else has just refreshed it
+                return
+            self._refreshing = True
+            identity = self.identity
+            authenticate = self._authenticate
+        refreshed = False
+        try:
+            logging.debug('refreshing authentication token')
+            authenticate()
+            self._update_clients(identity)
+            refreshed = True
+        finally:
+            with self._cond:
+                self._refreshing = False
+                if refreshed:
+                    self.refreshed = time.time()
+                    self.refreshes += 1
+                self._cond.notify_all()
+        # reschedule the refresh thread on the new expiry
+        self._wake.set()
+        if self.on_refresh != None:
+            self.on_refresh()
+    
+    def _update_clients(self, identity):
+        '''
+        pass the new token to clients which keep their own copy
+        '''
+        cs = current().cloudservers
+        if cs != None:
+            cs.client.auth_token = identity.token
+    
+    def install(self, identity, on_refresh=None):
+        '''
+        take care of the token of 'identity', and start the refresh thread
+        
+        on_refresh    called after every successful refresh
+        '''
+        with self._cond:
+            # 'authenticate' of the identity class, not the wrapped one
+            self._authenticate = type(identity).authenticate.__get__(identity)
+            identity.authenticate = self.authenticate
+            self.identity = identity
+            self.on_refresh = on_refresh
+            self._stop = False
+        if self._thread == None or not self._thread.is_alive():
+            self._thread = TokenRefreshThread(self)
+            self._thread.start()
+        self._wake.set()
+    
+    def next_refresh(self):
+        '''
+        return seconds to the next refresh, or None if the token cannot be
+        refreshed (missing, or obtained without credentials)
+        '''
+        identity = self.identity
+        if (identity == None or not identity.token or
+            not identity.password or
+            not isinstance(identity.expires, datetime.datetime)):
+            return None
+        delta = identity.expires - datetime.datetime.now()
+        return (delta.days * 86400 + delta.seconds) - self.ahead
+    
+    def rearm(self):
+        '''
+        forget past wake-ups, see 'wait'
+        '''
+        self._wake.clear()
+    
+    def stop(self):
+        '''
+        stop refreshing
+        '''
+        self._stop = True
+        self._wake.set()
+    
+    def stopped(self):
+        return self._stop
+    
+    def wait(self, timeout):
+        '''
+        sleep 'timeout' seconds, or until woken by 'install' or 'stop' since
+        the last 'rearm'
+        '''
+        self._wake.wait(timeout)
@@ -25,6 +25,7 @@ import uuid
 from ansicolours import ANSIColours
 from configuration import Configuration
 from globals import *  # @UnusedWildImport
+from jobs import JobManager
 
 
 def check_dir_home():
@@ -184,6 +185,7 @@ def terminate_threads():
     '''
     logging.debug("terminate threads gracefully and exit")
     logging.debug('%d threads running' % len(threading.enumerate()))
+    JobManager.Instance().cancel_all()  # @UndefinedVariable
     for t in threading.enumerate():
         if hasattr(t, '_terminate'):
             logging.debug('terminating thread: %s' % t.getName())
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+import logging
+import Queue
+import sys
+import threading
+import time
+import traceback
+
+from context import current
+from httppool import HTTPPool
+from jobs import JobManager
+
+
+class Task(object):
+    '''
+    function call submitted to a WorkerPool, and its outcome, run in the
+    session context and as the job (see 'JobManager.check') of the caller of
+    'submit'
+    '''
+    
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.result = None
+        self.exc_info = None
+        self.context = current()
+        self.job = JobManager.Instance().current()  # @UndefinedVariable
+        self._done = threading.Event()
+    
+    def done(self):
+        return self._done.is_set()
+    
+    def get(self, timeout=None):
+        '''
+        wait for the task, return its result or raise its exception
+        '''
+        deadline = None if timeout == None else time.time() + timeout
+        # short waits, so that CTRL-C interrupts them
+        while not self._done.is_set():
+            left = 0.2 if deadline == None else min(deadline - time.time(),
+                                                    0.2)
+            if left <= 0:
+                break
+            self._done.wait(left)
+        if self.exc_info != None:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+        return self.result
+    
+    def run(self):
+        try:
+            with self.context:
+                jobs = JobManager.Instance()  # @UndefinedVariable
+                previous = jobs.attach(self.job)
+                try:
+                    self.result = self.fn(*self.args, **self.kwargs)
+                finally:
+                    jobs.attach(previous)
+        except:
+            self.exc_info = sys.exc_info()
+            logging.debug(traceback.format_exc())
+        finally:
+            self._done.set()
+
+
+class WorkerThread(threading.Thread):
+    '''
+    thread running tasks of a WorkerPool
+    '''
+    
+    def __init__(self, tasks, name):
+        threading.Thread.__init__(self)
+        self.setName(name)
+        self.setDaemon(True)
+        self.tasks = tasks
+    
+    def run(self):
+        while True:
+            task = self.tasks.get()
+            try:
+                if task == None:
+                    return
+                task.run()
+            finally:
+                self.tasks.task_done()
+
+
+class WorkerPool(object):
+    '''
+    bounded pool of threads running submitted tasks, at most 'size' at a time
+    
+    i.e.:
+    
+        pool = WorkerPool(10)
+        tasks = [pool.submit(cs.servers.create, n, image, flavor)
+                 for n in names]
+        pool.shutdown()
+        servers = [t.get() for t in tasks]
+    '''
+    
+    def __init__(self, size, name='worker'):
+        '''
+        Constructor
+        
+        size    maximum number of concurrent tasks
+        '''
+        self.size = max(int(size), 1)
+        self.name = name
+        # as many keep-alive connections as concurrent requests
+        HTTPPool.Instance().fit(self.size)  # @UndefinedVariable
+        self._tasks = Queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+    
+    def map(self, fn, *iterables):
+        '''
+        run fn(*args) for each tuple of 'iterables' and return tasks, in
+        order
+        '''
+        return [self.submit(fn, *args) for args in zip(*iterables)]
+    
+    def shutdown(self, wait=True):
+        '''
+        stop threads once submitted tasks are done
+        '''
+        with self._lock:
+            for _ in self._threads:
+                self._tasks.put(None)
+            threads, self._threads = self._threads, []
+        if wait:
+            for t in threads:
+                # short joins, so that CTRL-C interrupts them
+                while t.is_alive():
+                    t.join(0.2)
+    
+    def submit(self, fn, *args, **kwargs):
+        '''
+        schedule fn(*args, **kwargs), return its Task
+        '''
+        task = Task(fn, args, kwargs)
+        with self._lock:
+            if len(self._threads) < self.size:
+                # threads are started on demand, up to 'size'
+                t = WorkerThread(self._tasks,
+                                 '%s-%d' % (self.name, len(self._threads)))
+                self._threads.append(t)
+                t.start()
+            self._tasks.put(task)
+        return task
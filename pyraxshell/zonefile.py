@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import csv
+import os.path
+import re
+
+
+# record types which are imported, SOA and apex NS are managed by the API
+RECORD_TYPES = ('A', 'AAAA', 'CNAME', 'MX', 'NS', 'PTR', 'SPF', 'SRV', 'TXT')
+
+# classes which may appear in a zone file record
+CLASSES = ('IN', 'CH', 'HS')
+
+# seconds of the BIND TTL units, i.e.: '1h30m'
+TTL_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+TTL = re.compile(r'^(\d+[smhdw]?)+$', re.IGNORECASE)
+
+# comment, quoted string, parenthesis, word, or a quote left open
+TOKEN = re.compile(r'(;.*)|("(?:[^"\\]|\\.)*")|([()])|([^\s;"()]+)|(")')
+
+
+def absolute_name(name, origin):
+    '''
+    return fully qualified 'name' without trailing dot, '@' is 'origin'
+    '''
+    if name == '@':
+        return origin
+    if name.endswith('.'):
+        return name[:-1]
+    if not origin:
+        return name
+    return '%s.%s' % (name, origin)
+
+
+def read_records(path, origin=None, ttl=None):
+    '''
+    return records read from a CSV ('*.csv') or a BIND zone file
+    
+    origin    zone origin, for relative names (default: '$ORIGIN', or file
+              name of zone files)
+    ttl       TTL of records without one (default: '$TTL')
+    '''
+    path = os.path.expanduser(path)
+    with open(path) as f:
+        if path.lower().endswith('.csv'):
+            return parse_csv(f, origin, ttl)
+        if origin == None:
+            # i.e.: 'example.com.zone', 'db.example.com'
+            name = os.path.basename(path)
+            for suffix in ('.zone', '.db'):
+                if name.endswith(suffix):
+                    name = name[:-len(suffix)]
+            if name.startswith('db.'):
+                name = name[len('db.'):]
+            origin = name
+        return parse_zone(f.read(), origin, ttl)
+
+
+def parse_csv(lines, origin=None, ttl=None):
+    '''
+    return records from CSV lines 'name,type,data[,ttl[,priority]]', a header
+    line starting with 'name' is skipped
+    '''
+    records = []
+    for row in csv.reader(lines):
+        row = [c.strip() for c in row]
+        if not row or row[0].startswith('#') or row[0].lower() == 'name':
+            continue
+        if len(row) < 3:
+            raise ValueError('invalid CSV record: %s' % ','.join(row))
+        rec = {'name': absolute_name(row[0], origin), 'type': row[1].upper(),
+               'data': row[2]}
+        if len(row) > 3 and row[3]:
+            rec['ttl'] = parse_ttl(row[3])
+        elif ttl != None:
+            rec['ttl'] = int(ttl)
+        if len(row) > 4 and row[4]:
+            rec['priority'] = int(row[4])
+        records.append(rec)
+    return records
+
+
+def parse_ttl(value):
+    '''
+    return TTL 'value' in seconds, i.e.: '3600', '1h', '1d12h'
+    '''
+    if not TTL.match(value):
+        raise ValueError('invalid TTL: %s' % value)
+    return sum(int(n) * TTL_UNITS[unit or 's']
+               for n, unit in re.findall(r'(\d+)([smhdw]?)', value.lower()))
+
+
+def parse_zone(text, origin, ttl=None):
+    '''
+    return records from the text of a BIND zone file
+    
+    '$ORIGIN', '$TTL', '@', relative names, blank owners, parentheses,
+    comments and TTL units are supported, SOA and apex NS records are
+    skipped. TXT and SPF data made of several strings keeps them quoted.
+    '''
+    origin = origin.rstrip('.')
+    apex = origin
+    records = []
+    owner = origin
+    for tokens in _zone_lines(text):
+        if tokens[0] == '$ORIGIN':
+            origin = absolute_name(tokens[1], origin)
+            if not records:
+                apex = owner = origin
+            continue
+        if tokens[0] == '$TTL':
+            ttl = parse_ttl(tokens[1])
+            continue
+        if tokens[0].startswith('$'):
+            raise ValueError('unsupported directive: %s' % tokens[0])
+        if tokens[0] != '':
+            owner = absolute_name(tokens[0], origin)
+        tokens = tokens[1:]
+        # [ttl] [class] type data, or [class] [ttl] type data
+        rec_ttl = ttl
+        while tokens and (TTL.match(tokens[0]) or
+                          tokens[0].upper() in CLASSES):
+            if TTL.match(tokens[0]):
+                rec_ttl = parse_ttl(tokens[0])
+            tokens = tokens[1:]
+        if len(tokens) < 2:
+            raise ValueError('invalid record: %s' % ' '.join(tokens))
+        _type, data = tokens[0].upper(), tokens[1:]
+        if _type == 'SOA':
+            apex = owner
+        if _type not in RECORD_TYPES or (_type == 'NS' and owner == apex):
+            continue
+        rec = {'name': owner, 'type': _type}
+        if _type in ('TXT', 'SPF') and len(data) > 1:
+            # i.e.: '"v=spf1 a; b" "second"'
+            data = [' '.join(data)]
+        else:
+            data = [_unquote(d) for d in data]
+        if _type in ('MX', 'SRV'):
+            rec['priority'] = int(data[0])
+            data = data[1:]
+        if _type in ('CNAME', 'MX', 'NS', 'PTR'):
+            data = [absolute_name(data[0], origin)]
+        elif _type == 'SRV':
+            # weight port target
+            data = data[:2] + [absolute_name(data[2], origin)]
+        rec['data'] = ' '.join(data)
+        if rec_ttl != None:
+            rec['ttl'] = rec_ttl
+        records.append(rec)
+    return records
+
+
+def _unquote(token):
+    '''
+    return the content of quoted string 'token', other tokens as they are
+    '''
+    if len(token) > 1 and token.startswith('"') and token.endswith('"'):
+        return re.sub(r'\\(.)', r'\1', token[1:-1])
+    return token
+
+
+def _zone_lines(text):
+    '''
+    yield the tokens of every logical line of a zone file, the first token is
+    '' when the line starts with a blank (owner of the previous record),
+    quoted strings keep their quotes
+    '''
+    tokens, depth = [], 0
+    for line in text.splitlines():
+        if depth == 0:
+            if not line.strip() or line.lstrip().startswith(';'):
+                continue
+            tokens = [''] if line[0] in ' \t' else []
+        for m in TOKEN.finditer(line):
+            comment, quoted, paren, word, unclosed = m.groups()
+            if comment != None:
+                break
+            if unclosed != None:
+                raise ValueError('no closing quotation: %s' % line)
+            # parentheses continue the record on the following lines
+            if paren != None:
+                depth += 1 if paren == '(' else -1
+            else:
+                tokens.append(quoted or word)
+        if depth == 0 and [t for t in tokens if t]:
+            yield tokens
@@ -0,0 +1,7 @@
+import os.path
+import sys
+
+# modules can be imported as pyraxshell imports them (i.e.: 'context', not
+# 'pyraxshell.context'), one copy of the modules holding shared state
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))), 'pyraxshell'))
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+from mock import MagicMock
+
+import Queue
+import threading
+import time
+import unittest
+from aio import (AsyncLibpyraxshell, as_completed,  # @UnresolvedImport
+                            gather)
+from jobs import JobCancelled, JobManager  # @UnresolvedImport
+from workerpool import WorkerPool  # @UnresolvedImport
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.lib = MagicMock()
+        self.aio = AsyncLibpyraxshell(self.lib, {'servers': 2})
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+    
+    def tearDown(self):
+        self.aio.cancel_all()
+        self.aio.close()
+    
+    def slow(self, result, seconds=0.05):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(seconds)
+        with self._lock:
+            self.running -= 1
+        return result
+    
+    def test_gather(self):
+        self.lib.get_server.side_effect = lambda _id: self.slow({'id': _id})
+        calls = [self.aio.get_server('srv-%d' % i) for i in range(6)]
+        self.assertEqual([{'id': 'srv-%d' % i} for i in range(6)],
+                         gather(calls))
+        # bounded by the pool of 'servers'
+        self.assertEqual(2, self.max_running)
+    
+    def test_exception(self):
+        self.lib.list_domains.side_effect = ValueError('boom')
+        c = self.aio.list_domains()
+        self.assertRaises(ValueError, c.get, 1)
+        self.assertEqual('failed', c.status)
+        out = gather([c], return_exceptions=True)
+        self.assertTrue(isinstance(out[0], ValueError))
+    
+    def test_cancel(self):
+        started = threading.Event()
+        def list_servers():
+            started.set()
+            while not JobManager.Instance().current().cancelled():  # @UndefinedVariable
+                time.sleep(0.01)
+            JobManager.Instance().check()  # @UndefinedVariable
+        self.lib.list_servers.side_effect = list_servers
+        self.lib.get_server.side_effect = lambda _id: _id
+        running = self.aio.list_servers()
+        blocking = self.aio.list_servers()
+        queued = self.aio.get_server('srv-1')
+        started.wait(1)
+        self.aio.cancel_all()
+        for c in (running, blocking, queued):
+            self.assertRaises(JobCancelled, c.get, 1)
+        # skipped before starting
+        self.assertFalse(self.lib.get_server.called)
+    
+    def test_cancel_queued(self):
+        release = threading.Event()
+        self.lib.list_servers.side_effect = lambda: release.wait(5)
+        running = [self.aio.list_servers(), self.aio.list_servers()]
+        queued = self.aio.get_server('srv-1')
+        queued.cancel()
+        # finished without waiting for the calls ahead of it
+        self.assertRaises(JobCancelled, queued.get, 0.5)
+        release.set()
+        gather(running, 5)
+        self.assertFalse(self.lib.get_server.called)
+    
+    def test_cancel_pool_tasks(self):
+        started = threading.Event()
+        def task():
+            started.set()
+            while not JobManager.Instance().current().cancelled():  # @UndefinedVariable
+                time.sleep(0.01)
+            JobManager.Instance().check()  # @UndefinedVariable
+        def delete_records(*args):
+            # i.e.: bulk DNS batches
+            pool = WorkerPool(2, 'batch')
+            tasks = [pool.submit(task) for _ in range(2)]
+            pool.shutdown()
+            return [t.get() for t in tasks]
+        self.lib.delete_records.side_effect = delete_records
+        c = self.aio.delete_records('example.com')
+        started.wait(1)
+        c.cancel()
+        self.assertRaises(JobCancelled, c.get, 2)
+    
+    def test_gather_timeout(self):
+        self.lib.get_server.side_effect = lambda _id: self.slow(_id, 0.3)
+        calls = [self.aio.get_server(i) for i in range(4)]
+        t = time.time()
+        # a single deadline for every call
+        self.assertRaises(Queue.Empty, gather, calls, 0.4)
+        self.assertTrue(time.time() - t < 0.6)
+    
+    def test_as_completed(self):
+        self.lib.list_loadbalancers.side_effect = lambda: self.slow('slow',
+                                                                    0.2)
+        self.lib.list_protocols.side_effect = lambda: 'fast'
+        calls = [self.aio.list_loadbalancers(), self.aio.list_protocols()]
+        self.assertEqual(['fast', 'slow'],
+                         [c.get() for c in as_completed(calls, 5)])
+    
+    def test_semaphore(self):
+        sem = threading.BoundedSemaphore(1)
+        self.aio.semaphores['servers'] = sem
+        self.lib.get_server.side_effect = lambda _id: self.slow(_id)
+        gather([self.aio.get_server(i) for i in range(4)])
+        self.assertEqual(1, self.max_running)
+    
+    def test_unknown_method(self):
+        self.assertRaises(AttributeError, getattr, self.aio, 'print_pt')
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
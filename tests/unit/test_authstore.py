@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import datetime
+import mock
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+from authstore import AuthStore  # @UnresolvedImport
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = AuthStore(os.path.join(self.tmpdir, 'auth.json'))
+        self.identity = mock.Mock(
+            token='a-token', tenant_id='123', tenant_name='123',
+            username='foo', user={'id': '1', 'name': 'foo'},
+            regions=set(['LON']),
+            services={'compute': {'name': 'cloudServersOpenStack',
+                                  'endpoints': {'LON': {'public_url': 'x'}}}},
+            expires=datetime.datetime.now() + datetime.timedelta(hours=1))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_put_get(self):
+        self.assertEqual(None, self.store.get('login:rackspace:foo:LON'))
+        self.assertTrue(self.store.put('login:rackspace:foo:LON',
+                                       self.identity, 'LON'))
+        mode = stat.S_IMODE(os.stat(self.store.path).st_mode)
+        self.assertEqual(0600, mode)
+        entry = self.store.get('login:rackspace:foo:LON')
+        self.assertEqual('a-token', entry['token'])
+        self.assertTrue(isinstance(entry['token'], str))
+        self.assertEqual('x', entry['services']['compute']['endpoints']
+                         ['LON']['public_url'])
+        self.store.remove('login:rackspace:foo:LON')
+        self.assertEqual(None, self.store.get('login:rackspace:foo:LON'))
+
+    def test_expiring(self):
+        self.identity.expires = (datetime.datetime.now() +
+                                 datetime.timedelta(seconds=60))
+        self.store.put('token:123:LON', self.identity, 'LON')
+        self.assertEqual(None, self.store.get('token:123:LON'))
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
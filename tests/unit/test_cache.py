@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+from mock import MagicMock
+
+import unittest
+from cache import Cache, LISTING  # @UnresolvedImport
+
+
+class TestCache(unittest.TestCase):
+
+
+    def setUp(self):
+        self.cache = Cache.Instance()  # @UndefinedVariable
+        self.cache.clear()
+        self.cache.max_entries = 4096
+    
+    def test_get_set(self):
+        self.assertEqual(None, self.cache.get('servers', 'a'))
+        self.cache.set('servers', 'a', 'A')
+        self.assertEqual('A', self.cache.get('servers', 'a'))
+        stats = self.cache.stats()[0]
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+        self.assertEqual(0.5, stats['hit_rate'])
+    
+    def test_ttl(self):
+        self.cache.set('servers', 'a', 'A', ttl=-1)
+        self.assertEqual(None, self.cache.get('servers', 'a'))
+        self.cache.set_ttl('servers', -1)
+        self.cache.set('servers', 'b', 'B')
+        self.assertEqual(None, self.cache.get('servers', 'b'))
+        self.cache.set_ttl('servers', 30)
+    
+    def test_lru_eviction(self):
+        self.cache.max_entries = 2
+        self.cache.set('servers', 'a', 'A')
+        self.cache.set('servers', 'b', 'B')
+        self.cache.get('servers', 'a')
+        self.cache.set('servers', 'c', 'C')
+        self.assertEqual('A', self.cache.get('servers', 'a'))
+        self.assertEqual(None, self.cache.get('servers', 'b'))
+        self.assertEqual(1, self.cache.stats()[0]['evictions'])
+    
+    def test_invalidate(self):
+        self.cache.set('servers', LISTING, ['A', 'B'])
+        self.cache.set('servers', 'a', 'A')
+        self.cache.set('servers', 'b', 'B')
+        self.cache.set('domains', LISTING, ['example.com'])
+        self.cache.invalidate('servers', 'a')
+        self.assertEqual(None, self.cache.get('servers', 'a'))
+        self.assertEqual(None, self.cache.get('servers', LISTING))
+        self.assertEqual('B', self.cache.get('servers', 'b'))
+        self.assertEqual(['example.com'], self.cache.get('domains', LISTING))
+    
+    def test_get_or_load(self):
+        loader = MagicMock(return_value=['A'])
+        self.cache.get_or_load('images', LISTING, loader)
+        self.assertEqual(['A'], self.cache.get_or_load('images', LISTING,
+                                                       loader))
+        self.assertEqual(1, loader.call_count)
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
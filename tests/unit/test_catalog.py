@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+from mock import MagicMock, patch
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import catalog  # @UnresolvedImport
+import db  # @UnresolvedImport
+
+
+class TestCatalog(unittest.TestCase):
+
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.sqlite_db = db.SQLITE_DB
+        db.SQLITE_DB = os.path.join(self.tmpdir, 'db.sqlite3')
+    
+    def tearDown(self):
+        db.SQLITE_DB = self.sqlite_db
+        shutil.rmtree(self.tmpdir)
+    
+    def test_create_table(self):
+        # the table is created by the first catalog on an existing database
+        db.DB().query('CREATE TABLE other (x TEXT)')
+        c = catalog.Catalog.New()
+        self.assertEqual([], c.query('SELECT * FROM catalog'))
+        catalog.Catalog.New().create_table_catalog()
+    
+    def test_fetch(self):
+        flavor = MagicMock(_info={'id':'2', 'name':'512MB'})
+        loader = MagicMock(return_value=[flavor])
+        with patch('logging.debug') as debug:
+            flavors = catalog.Catalog.New().fetch('flavors', loader)
+        # catalog data is not logged
+        self.assertNotIn('512MB', str(debug.call_args_list))
+        self.assertEqual('2', flavors[0].id)
+        self.assertEqual('512MB', flavors[0].name)
+        # a new catalog, i.e.: a new shell, reads it back from db
+        flavors = catalog.Catalog.New().fetch('flavors', loader)
+        self.assertEqual('512MB', flavors[0].name)
+        self.assertEqual(1, loader.call_count)
+    
+    def test_fetch_stale(self):
+        loader = MagicMock(return_value=['HTTP'])
+        c = catalog.Catalog.New()
+        c.store('lb_protocols', ['HTTPS'])
+        c.query("UPDATE catalog SET t = 0")
+        # stale data is returned and refreshed in background
+        self.assertEqual(['HTTPS'], c.fetch('lb_protocols', loader))
+        for t in threading.enumerate():
+            if t.getName() == 'catalog-lb_protocols':
+                t.join()
+        self.assertEqual(['HTTP'], c.fetch('lb_protocols', loader))
+        self.assertEqual(1, loader.call_count)
+    
+    def test_invalidate(self):
+        loader = MagicMock(return_value=['ROUND_ROBIN'])
+        c = catalog.Catalog.New()
+        c.fetch('lb_algorithms', loader)
+        c.invalidate('lb_algorithms')
+        c.fetch('lb_algorithms', loader)
+        self.assertEqual(2, loader.call_count)
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import mock
+import time
+import unittest
+
+from completion import Completion  # @UnresolvedImport
+
+
+class Obj(object):
+    def __init__(self, _id, name):
+        self.id = _id
+        self.name = name
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.completion = Completion.Instance()  # @UndefinedVariable
+        self.completion.feed('servers', [Obj('id-%05d' % i, 'web-%d' % i)
+                                         for i in range(20000)])
+
+    def test_complete(self):
+        self.assertEqual(['web-1999'] + ['web-1999%d' % i for i in range(10)],
+                         self.completion.complete('servers', 'name',
+                                                  'web-1999'))
+        self.assertEqual(['id-00042'],
+                         self.completion.complete('servers', 'id', 'id-00042'))
+        self.assertEqual([], self.completion.complete('servers', 'name', 'x'))
+        self.assertEqual([], self.completion.complete('domains', 'name', 'x'))
+        self.assertEqual(self.completion.max_matches,
+                         len(self.completion.complete('servers', 'name', 'w')))
+
+    def test_complete_stale(self):
+        loader = mock.Mock()
+        self.completion.complete('servers', 'id', 'id-', loader)
+        self.assertFalse(loader.called)
+        self.completion._fed['servers'] = time.time() - 3600
+        self.assertEqual(['web-7'],
+                         self.completion.complete('servers', 'name', 'web-7',
+                                                  loader)[:1])
+        deadline = time.time() + 5
+        while 'servers' in self.completion._refreshing and \
+              time.time() < deadline:
+            time.sleep(0.01)
+        loader.assert_called_once_with()
+        self.assertFalse(self.completion.is_stale('servers'))
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+from mock import MagicMock, patch
+import pyrax
+import threading
+import unittest
+
+import context  # @UnresolvedImport
+from cache import Cache  # @UnresolvedImport
+from plugins.lib import Lib  # @UnresolvedImport
+from workerpool import WorkerPool  # @UnresolvedImport
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        context.install()
+        self.a = context.Context('a', MagicMock())
+        self.b = context.Context('b', MagicMock())
+    
+    def test_session_singletons(self):
+        default = Cache.Instance()  # @UndefinedVariable
+        with self.a:
+            cache = Cache.Instance()  # @UndefinedVariable
+            self.assertTrue(self.a is context.current())
+            self.assertTrue(cache is Cache.Instance())  # @UndefinedVariable
+            self.assertTrue(cache is Lib().cache)
+        self.assertTrue(cache is self.a.cache)
+        self.assertFalse(cache is self.b.cache or cache is default)
+        self.assertTrue(default is Cache.Instance())  # @UndefinedVariable
+        self.assertTrue(self.a.configuration is not self.b.configuration)
+    
+    def test_pyrax_state(self):
+        self.a.pyrax['identity'] = MagicMock(tenant_id='a')
+        self.b.pyrax['identity'] = MagicMock(tenant_id='b')
+        dns = self.a.pyrax['cloud_dns'] = MagicMock()
+        self.assertTrue(Lib(self.a).context.cloud_dns is dns)
+        seen = {}
+        barrier = threading.Semaphore(0)
+        
+        def run(ctx):
+            with ctx:
+                barrier.release()
+                # both sessions are active at the same time
+                barrier.acquire()
+                seen[ctx.name] = set(pyrax.identity.tenant_id
+                                     for _ in range(1000))
+        threads = [threading.Thread(target=run, args=(c,))
+                   for c in (self.a, self.b)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual({'a': set(['a']), 'b': set(['b'])}, seen)
+        with self.a:
+            pyrax.cloud_dns.list()
+            pyrax.clear_credentials()
+        dns.list.assert_called_once_with()
+        self.assertEqual(None, self.a.identity)
+        self.assertEqual('b', self.b.identity.tenant_id)
+    
+    def test_connect_to_services(self):
+        self.a.pyrax['identity'] = MagicMock(regions=set(['LON']),
+                                             services={'compute': {}})
+        patches = [patch.object(pyrax, connect, return_value=name)
+                   for name, connect in context.CLIENTS]
+        for p in patches:
+            p.start()
+        try:
+            with self.a:
+                pyrax.connect_to_services(region='LON')
+        finally:
+            for p in patches:
+                p.stop()
+        self.assertEqual('cloudservers', self.a.cloudservers)
+        self.assertEqual(('LON',), self.a.regions)
+        self.assertEqual('LON', self.a.default_region)
+        self.assertEqual(None, self.b.cloudservers)
+    
+    def test_default_region(self):
+        with self.a:
+            pyrax.set_default_region('LON')
+        identity = self.b.pyrax['identity'] = MagicMock()
+        with self.b:
+            pyrax._auth_and_connect(region='ORD', connect=False)
+        identity.authenticate.assert_called_once_with()
+        self.assertEqual('LON', self.a.default_region)
+        self.assertEqual('ORD', self.b.default_region)
+    
+    def test_threads_inherit_context(self):
+        pool = WorkerPool(2)
+        with self.a:
+            tasks = [pool.submit(context.current) for _ in range(4)]
+        tasks.append(pool.submit(context.current))
+        pool.shutdown()
+        self.assertEqual([self.a] * 4, [t.get() for t in tasks[:4]])
+        self.assertFalse(tasks[4].get() is self.a)
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+from mock import MagicMock
+
+import logging
+import os
+import shutil
+import StringIO
+import sys
+import tempfile
+import threading
+import unittest
+import daemon  # @UnresolvedImport
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'daemon.sock')
+        self.lock_file = os.path.join(self.dir, 'daemon.lock')
+        self.shell = MagicMock()
+        self.shell.precmd.side_effect = lambda line: line
+        self.shell.onecmd.side_effect = self.onecmd
+        self.console = logging.StreamHandler(sys.__stdout__)
+        self.console.setLevel(logging.INFO)
+        self.level = logging.getLogger().level
+        logging.getLogger().setLevel(logging.DEBUG)
+        logging.getLogger().addHandler(self.console)
+        self.daemon = daemon.Daemon(self.shell, self.path, self.lock_file,
+                                    idle_timeout=1)
+        self.assertTrue(self.daemon.bind())
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.setDaemon(True)
+        self.thread.start()
+    
+    def tearDown(self):
+        self.thread.join(5)
+        logging.getLogger().removeHandler(self.console)
+        logging.getLogger().setLevel(self.level)
+        shutil.rmtree(self.dir)
+    
+    def onecmd(self, line):
+        # plugins read their own lines, i.e.: 'servers' then 'list'
+        if line == 'servers':
+            logging.info('servers: %s' % sys.stdin.readline().strip())
+        elif line == 'fail':
+            logging.error('failed')
+        elif line == 'crash':
+            raise ValueError('crashed')
+        elif line == 'print':
+            print 'printed'
+            self.shell.stdout.write('written\n')
+            # prompt of a nested command loop
+            sys.stdout.write('RS>')
+        else:
+            logging.info('ran: %s' % line)
+    
+    def serve(self):
+        # bound in setUp
+        self.daemon.bind = lambda: True
+        self.daemon.serve()
+    
+    def run_lines(self, lines):
+        out = StringIO.StringIO()
+        self.failed = daemon.send(daemon.connect(self.path), lines, out)
+        return out.getvalue()
+    
+    def test_serve(self):
+        # nested command loops read their lines, framed as well
+        self.assertEqual('==> auth <==\nran: auth\n'
+                         '==> servers <==\n==> list <==\nservers: list\n',
+                         self.run_lines(['auth', 'servers', 'list']))
+        self.assertEqual([], self.failed)
+        # session ends at 'EOF', the daemon keeps serving
+        self.assertEqual('==> dns <==\nran: dns\n==> EOF <==\n',
+                         self.run_lines(['dns', 'EOF', 'x']))
+        self.assertEqual(1, self.shell.preloop.call_count)
+        # console logging is restored
+        self.assertEqual(sys.__stdout__, self.console.stream)
+    
+    def test_failed(self):
+        out = self.run_lines(['auth', 'fail', 'dns', 'fail'])
+        self.assertIn('==> fail <==\nfailed\n==> dns <==', out)
+        self.assertEqual([2, 4], self.failed)
+    
+    def test_exception(self):
+        # the commands after a raising one still run
+        out = self.run_lines(['crash', 'dns', 'EOF', 'auth'])
+        self.assertIn('==> crash <==\nTraceback', out)
+        self.assertIn('ValueError: crashed\n', out)
+        self.assertIn('==> dns <==\nran: dns\n==> EOF <==\n', out)
+        self.assertNotIn('auth', out)
+        self.assertEqual([1], self.failed)
+    
+    def test_stdout(self):
+        stdout = sys.stdout
+        out = self.run_lines(['print', 'dns'])
+        self.assertEqual('==> print <==\nprinted\nwritten\n'
+                         '==> dns <==\nran: dns\n', out)
+        self.assertEqual(stdout, sys.stdout)
+    
+    def test_command_lines(self):
+        commands = daemon.CommandLines(StringIO.StringIO('a\nb\nc\n'))
+        for line in iter(commands.readline, ''):
+            if line == 'b\n':
+                logging.error('failed')
+        self.assertEqual(3, commands.count)
+        self.assertEqual([2], commands.failed)
+        self.assertEqual(2, commands.exit_status())
+    
+    def test_single_daemon(self):
+        other = daemon.Daemon(self.shell, self.path, self.lock_file)
+        self.assertFalse(other.bind())
+    
+    def test_idle_timeout(self):
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(None, daemon.connect(self.path))
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import unittest
+from domaintrie import DomainTrie  # @UnresolvedImport
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.trie = DomainTrie([ "bar.example.co.uk", "example.co.uk",
+                                 "example.com", "someexample.com",
+                                 "example.bar.com", "bar.example.com"])
+
+    def test_nearest(self):
+        self.assertEqual('bar.example.com',
+                         self.trie.nearest('foo.bar.example.com'))
+        self.assertEqual('bar.example.com',
+                         self.trie.nearest('bar.example.com'))
+        self.assertEqual('example.com',
+                         self.trie.nearest('Foo.Example.COM.'))
+        self.assertEqual(None, self.trie.nearest('example.org'))
+        self.assertEqual(None, self.trie.nearest('com'))
+
+    def test_add_remove(self):
+        self.assertEqual(6, len(self.trie))
+        self.trie.remove('bar.example.com')
+        self.assertFalse('bar.example.com' in self.trie)
+        self.assertTrue('example.com' in self.trie)
+        self.assertEqual('example.com',
+                         self.trie.nearest('foo.bar.example.com'))
+        self.trie.remove('example.com')
+        self.trie.remove('example.com')
+        self.assertEqual(4, len(self.trie))
+        self.assertFalse('example' in self.trie._root['com'])
+        self.trie.add('foo.bar.example.com')
+        self.assertEqual('foo.bar.example.com',
+                         self.trie.nearest('x.foo.bar.example.com'))
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+from mock import MagicMock, patch
+import BaseHTTPServer
+import SocketServer
+import threading
+import unittest
+from httppool import HTTPPool  # @UnresolvedImport
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def do_GET(self):
+        body = '{"path": "%s"}' % self.path
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    
+    # keep-alive connections outlive the tests
+    daemon_threads = True
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.setDaemon(True)
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d' % self.server.server_port
+        self.pool = HTTPPool.Instance()  # @UndefinedVariable
+    
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def test_keep_alive(self):
+        for i in range(5):
+            resp = self.pool.request('GET', '%s/%d' % (self.url, i))
+            self.assertEqual({'path': '/%d' % i}, resp.json())
+        stats = self.pool.stats()[self.url]
+        self.assertEqual(5, stats['requests'])
+        self.assertEqual(1, stats['connections'])
+        self.assertEqual(4, stats['reused'])
+    
+    def test_fit(self):
+        self.pool.request('GET', self.url)
+        size = self.pool.size
+        self.pool.fit(size - 1)
+        self.assertEqual(size, self.pool.size)
+        self.pool.fit(size + 5)
+        self.assertEqual(size + 5, self.pool.size)
+        self.pool.request('GET', self.url)
+        # connections of the replaced adapter are still counted
+        self.assertEqual(2, self.pool.stats()[self.url]['connections'])
+    
+    def test_pyrax_client(self):
+        import pyrax.client
+        class Client(pyrax.client.BaseClient):
+            def _configure_manager(self):
+                pass
+        client = self.pool.attach(Client())
+        # set by pyrax.connect_to_*()
+        client.user_agent = 'pyraxshell'
+        resp, body = client.request(self.url + '/servers', 'GET')
+        self.assertEqual(200, resp.status)
+        self.assertEqual({'path': '/servers'}, body)
+        self.assertEqual(1, self.pool.stats()[self.url]['requests'])
+    
+    def test_identity(self):
+        import pyrax.base_identity
+        identity = self.pool.attach(pyrax.base_identity.BaseAuth())
+        resp = identity.method_get(self.url + '/tokens', std_headers=False)
+        self.assertEqual({'path': '/tokens'}, resp.json())
+        self.assertEqual(1, self.pool.stats()[self.url]['requests'])
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
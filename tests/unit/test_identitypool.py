@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+import unittest
+
+from cache import Cache  # @UnresolvedImport
+from identitypool import IdentityPool, current  # @UnresolvedImport
+from tokenrefresh import TokenRefresh  # @UnresolvedImport
+
+
+class Identity(object):
+    
+    authenticated = True
+    password = ''
+    token = 'token'
+    
+    def __init__(self, expires_in=3600):
+        self.expires = (datetime.datetime.now() +
+                        datetime.timedelta(seconds=expires_in))
+    
+    def authenticate(self):
+        pass
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.pool = IdentityPool.Instance()  # @UndefinedVariable
+        self.pool.max_size = 2
+        self.cache = Cache.Instance()  # @UndefinedVariable
+        self.state = current().pyrax
+        self.identity = self.state['identity']
+
+    def tearDown(self):
+        for ctx in self.pool.list():
+            self.pool.remove(ctx.name)
+        TokenRefresh.Instance().stop()  # @UndefinedVariable
+        self.state['identity'] = self.identity
+
+    def test_switch(self):
+        a, b = Identity(), Identity()
+        self.state['identity'] = a
+        self.pool.add('a')
+        self.cache.set('servers', 'id-a', 'server-a')
+        self.assertFalse(self.pool.switch('b'))
+        self.assertEqual('server-a', self.cache.get('servers', 'id-a'))
+        self.state['identity'] = b
+        self.pool.add('b')
+        self.assertEqual(None, self.cache.get('servers', 'id-a'))
+        self.assertTrue(self.pool.switch('a'))
+        self.assertTrue(current().identity is a)
+        self.assertEqual('server-a', self.cache.get('servers', 'id-a'))
+        self.assertTrue(self.pool.switch('b'))
+        self.assertTrue(current().identity is b)
+
+    def test_switch_failed(self):
+        a = Identity()
+        self.state['identity'] = a
+        self.pool.add('a')
+        self.cache.set('servers', 'id-a', 'server-a')
+        self.assertFalse(self.pool.switch('b'))
+        # authentication of 'b' fails
+        self.state['identity'] = None
+        self.pool.restore()
+        self.assertEqual('a', self.pool.current)
+        self.assertTrue(current().identity is a)
+        self.assertEqual('server-a', self.cache.get('servers', 'id-a'))
+    
+    def test_evict(self):
+        for name in ('a', 'b', 'c'):
+            self.pool.switch(name)
+            self.state['identity'] = Identity()
+            self.pool.add(name)
+        self.assertEqual(['b', 'c'], [c.name for c in self.pool.list()])
+        self.state['identity'] = Identity(60)
+        self.pool.add('d')
+        # expiring identities are not reused
+        self.assertFalse(self.pool.switch('c') and self.pool.switch('d'))
+        self.assertFalse('d' in self.pool)
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
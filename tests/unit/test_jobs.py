@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+from mock import MagicMock, patch
+from mock import MagicMock
+
+import threading
+import time
+import unittest
+from jobs import JobManager  # @UnresolvedImport
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.jobs = JobManager.Instance()  # @UndefinedVariable
+    
+    def test_start_wait(self):
+        job = self.jobs.start('sum', sum, [1, 2])
+        self.assertTrue(job.wait(5))
+        self.assertEqual('done', job.status)
+        self.assertEqual(3, job.result)
+        self.assertIn(job, self.jobs.list())
+    
+    def test_failed(self):
+        job = self.jobs.start('fail', lambda: 1 / 0)
+        job.wait(5)
+        self.assertEqual('failed', job.status)
+        self.assertEqual(ZeroDivisionError, job.exc_info[0])
+    
+    def test_cancel(self):
+        started = threading.Event()
+        
+        def loop():
+            started.set()
+            while True:
+                self.jobs.check()
+                time.sleep(0.01)
+        job = self.jobs.start('loop', loop)
+        started.wait(5)
+        self.assertEqual('running', job.status)
+        self.assertTrue(self.jobs.cancel(job.id))
+        self.assertTrue(job.wait(5))
+        self.assertEqual('cancelled', job.status)
+        self.assertFalse(self.jobs.cancel(0))
+    
+    def test_track(self):
+        on_cancel = MagicMock()
+        job = self.jobs.track('watch servers 1', on_cancel,
+                              progress=lambda: 'BUILD 40')
+        self.assertEqual('BUILD 40', job.progress())
+        self.jobs.cancel(job.id)
+        on_cancel.assert_called_once_with()
+        # finished by its owner
+        self.assertFalse(job.done())
+        job.finish()
+        self.assertEqual('cancelled', job.status)
+    
+    def test_foreground(self):
+        outer = self.jobs.foreground('servers')
+        inner = self.jobs.foreground('list')
+        self.assertIs(inner, self.jobs.current())
+        self.jobs.release(inner)
+        self.assertIs(outer, self.jobs.current())
+        self.assertNotIn(inner, self.jobs.list())
+        self.jobs.release(outer)
+        self.assertEqual(None, self.jobs.current())
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+from mock import MagicMock
+
+import pyrax.exceptions as exc
+import time
+import unittest
+from plugins.lib import Lib  # @UnresolvedImport
+
+
+class TestLib(unittest.TestCase):
+
+
+    def setUp(self):
+        self.lib = Lib()
+        self.lib.cache.clear()
+        self.objects = [MagicMock(id='a'), MagicMock(id='b')]
+    
+    def test_resolve_get(self):
+        get = MagicMock(return_value=self.objects[0])
+        self.assertIs(self.objects[0], self.lib.resolve('servers', 'a', get))
+        # cached
+        self.assertIs(self.objects[0], self.lib.resolve('servers', 'a', get))
+        self.assertEqual(1, get.call_count)
+    
+    def test_resolve_not_found(self):
+        self.lib.cache.index('servers', self.objects, lambda o: o.id)
+        get = MagicMock(side_effect=exc.NotFound(404))
+        self.assertEqual(None, self.lib.resolve('servers', 'a', get))
+        self.assertEqual(None, self.lib.cache.lookup('servers', 'a'))
+    
+    def test_resolve_fallback_to_index(self):
+        self.lib.cache.index('servers', self.objects, lambda o: o.id)
+        get = MagicMock(side_effect=exc.ClientException(500))
+        self.assertIs(self.objects[1], self.lib.resolve('servers', 'b', get))
+        self.assertRaises(exc.ClientException, self.lib.resolve, 'servers',
+                          'c', get)
+    
+    def test_fan_out(self):
+        def region_client(service, region):
+            if region == 'SYD':
+                raise exc.ServiceNotAvailable('not available')
+            return MagicMock(region=region)
+        
+        def fn(client):
+            time.sleep(0.2)
+            return [client.region]
+        
+        self.lib.region_client = region_client
+        started = time.time()
+        results, errors = self.lib.fan_out('cloudservers',
+                                           ['DFW', 'ORD', 'LON', 'SYD'], fn)
+        # concurrent: close to the slowest region, not the sum
+        self.assertTrue(time.time() - started < 0.6)
+        self.assertEqual(['DFW', 'ORD', 'LON'], results.keys())
+        self.assertEqual(['LON'], results['LON'])
+        self.assertEqual(['SYD'], errors.keys())
+    
+    def test_list_regions(self):
+        self.assertEqual(['DFW', 'ORD'], self.lib.list_regions('dfw, ORD'))
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
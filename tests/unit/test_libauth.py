@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+from mock import MagicMock, patch
+
+import StringIO
+import os
+import tempfile
+import threading
+import unittest
+from plugins.libauth import LibAuth  # @UnresolvedImport
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.lib = LibAuth()
+    
+    def test_command_lines(self):
+        self.assertEqual(['servers', 'list', 'EOF', 'dns', 'list_domains',
+                          'EOF', 'version'],
+                         self.lib.command_lines(
+                                'servers list, dns list_domains,version',
+                                ['servers', 'dns']))
+    
+    def test_each_account(self):
+        lock = threading.Lock()
+        lines = []
+        
+        def run_account(stanza, _lines, out):
+            if stanza == 'b':
+                raise OSError('cannot start')
+            out(stanza, 'ok')
+            return stanza != 'c'
+        
+        def out(stanza, line):
+            with lock:
+                lines.append((stanza, line))
+        
+        with patch.object(self.lib, 'run_account', side_effect=run_account):
+            succeeded, failed = self.lib.each_account(['list'],
+                                                      ['a', 'b', 'c', 'd'],
+                                                      2, out)
+        # a failure in one account does not abort the others
+        self.assertEqual(['a', 'd'], succeeded)
+        self.assertEqual(['b', 'c'], failed)
+        self.assertIn(('d', 'ok'), lines)
+        self.assertIn(('b', 'failed: cannot start'), lines)
+    
+    def test_file_key(self):
+        fd, path = tempfile.mkstemp()
+        try:
+            os.write(fd, '[rackspace_cloud]\nusername = a\n')
+            key = self.lib.file_key(path)
+            self.assertEqual(key, self.lib.file_key(path))
+            # an edited credentials file does not match the stored token
+            os.write(fd, 'api_key = b\n')
+            self.assertNotEqual(key, self.lib.file_key(path))
+        finally:
+            os.close(fd)
+            os.remove(path)
+    
+    def test_login_key(self):
+        key = self.lib.login_key('rackspace', 'a', 'k1', 'LON')
+        self.assertTrue(key.startswith('login:rackspace:a:LON:'))
+        self.assertNotIn('k1', key)
+        self.assertEqual(key, self.lib.login_key('rackspace', 'a', 'k1', 'LON'))
+        self.assertNotEqual(key,
+                            self.lib.login_key('rackspace', 'a', 'k2', 'LON'))
+    
+    def test_run_account(self):
+        lines = []
+        out = lambda stanza, line: lines.append(line)
+        process = MagicMock()
+        process.stdout = StringIO.StringIO('1|not an error (INFO)\n\nok\n')
+        process.wait.return_value = 0
+        with patch('subprocess.Popen', return_value=process):
+            # the exit status tells whether a command failed
+            self.assertTrue(self.lib.run_account('a', ['list'], out))
+            process.stdout = StringIO.StringIO('')
+            process.wait.return_value = 4
+            self.assertFalse(self.lib.run_account('a', ['list'], out))
+        self.assertEqual(['1|not an error (INFO)', 'ok'], lines)
+        self.assertEqual('auth\naccount a\nEOF\nlist\n',
+                         ''.join(c[0][0] for c in
+                                 process.stdin.write.call_args_list[:2]))
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -15,13 +15,162 @@
 # You should have received a copy of the GNU General Public License
 # along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
 
+from mock import MagicMock, patch
+
+import pyrax.exceptions as exc
 import unittest
+from pyraxshell.domaintrie import DomainTrie  # @UnresolvedImport
 from pyraxshell.plugins.libdns import LibDNS  # @UnresolvedImport
+from plugins.liblimits import AdmissionError  # @UnresolvedImport
 
 
 class Test(unittest.TestCase):
 
 
+    def test_bulk_records(self):
+        domain = MagicMock(id=1)
+        domain.name = 'example.com'
+        records = []
+        for i in range(5):
+            r = MagicMock(id=i, type='A', data='1.2.3.%d' % i, ttl=300)
+            r.name = 'r%d.example.com' % i
+            records.append(r)
+        dns = MagicMock()
+        calls = []
+        
+        def async_call(uri, **kwargs):
+            calls.append(uri)
+            # batch with record 3 fails, record 3 only fails on its own
+            if 'id=3' in uri:
+                raise exc.DomainRecordDeletionFailed('failed')
+        dns._manager._async_call.side_effect = async_call
+        dns.delete_record.side_effect = (lambda d, r: r.id == 3 and
+                                         self.fail_record())
+        lib = LibDNS()
+        with patch.dict(lib.context.pyrax, cloud_dns=dns), \
+             patch('pyraxshell.plugins.libdns.DNS_BATCH_SIZE', 2):
+            job = lib.bulk_records('delete', domain, records, 1)
+        self.assertEqual('/domains/1/records?id=0&id=1', calls[0])
+        self.assertEqual([0, 1, 2, 4], [r.id for r in job.succeeded()])
+        self.assertEqual([3], [r.id for r, _ in job.failed()])
+        # 3 batches, 2 single record requests
+        self.assertEqual(5, job.requests)
+    
+    def test_bulk_records_per_record(self):
+        # without the private pyrax bulk call, records are sent one by one
+        domain = MagicMock(id=1)
+        records = [MagicMock(id=i) for i in range(3)]
+        dns = MagicMock(spec=['delete_record', 'update_record'])
+        lib = LibDNS()
+        with patch.dict(lib.context.pyrax, cloud_dns=dns):
+            job = lib.bulk_records('update', domain, records, 1, ttl=600)
+        self.assertEqual(3, dns.update_record.call_count)
+        dns.update_record.assert_called_with(domain, records[2], ttl=600)
+        self.assertEqual(3, len(job.succeeded()))
+    
+    def test_bulk_records_timeout(self):
+        domain = MagicMock(id=1)
+        records = [MagicMock(id=i) for i in range(3)]
+        dns = MagicMock()
+        dns._manager._async_call.side_effect = exc.DNSCallTimedOut(
+                                                                'timed out')
+        lib = LibDNS()
+        with patch.dict(lib.context.pyrax, cloud_dns=dns):
+            job = lib.bulk_records('delete', domain, records, 1)
+        # the batch may have completed, records are not deleted one by one
+        self.assertFalse(dns.delete_record.called)
+        self.assertEqual(3, len(job.failed()))
+        self.assertEqual(1, job.requests)
+    
+    def test_bulk_records_deleted(self):
+        domain = MagicMock(id=1)
+        records = [MagicMock(id=i) for i in range(3)]
+        dns = MagicMock()
+        dns.delete_record.side_effect = [None, exc.NotFound(404), None]
+        dns._manager._async_call.side_effect = exc.DomainRecordDeletionFailed(
+                                                                    'failed')
+        lib = LibDNS()
+        with patch.dict(lib.context.pyrax, cloud_dns=dns):
+            job = lib.bulk_records('delete', domain, records, 1)
+        # a record already gone is deleted
+        self.assertEqual(3, dns.delete_record.call_count)
+        self.assertEqual(3, len(job.succeeded()))
+    
+    def test_import_records(self):
+        lib = LibDNS()
+        domains = {}
+        for n in ('example.com', 'bar.example.com'):
+            domains[n] = MagicMock(id=n, emailAddress='a@example.com', ttl=300)
+            domains[n].name = n
+        
+        def create_domain(name, *args):
+            domains[name] = MagicMock(id=name)
+            domains[name].name = name
+            return domains[name]
+        lib.get_domain_trie = MagicMock(return_value=DomainTrie(domains))
+        lib.get_domain_by_name = lambda n: domains.get(n, False)
+        lib.create_domain = MagicMock(side_effect=create_domain)
+        records = [{'name': 'r%d.foo.example.com' % i, 'type': 'A',
+                    'data': '1.2.3.4'} for i in range(250)]
+        records += [{'name': 'www.bar.example.com', 'type': 'A',
+                     'data': '1.2.3.4'},
+                    {'name': 'www.example.org', 'type': 'A',
+                     'data': '1.2.3.4'}]
+        dns = MagicMock()
+        with patch.dict(lib.context.pyrax, cloud_dns=dns):
+            job = lib.import_records(records, 1)
+        # missing subdomain created once
+        lib.create_domain.assert_called_once_with('foo.example.com',
+                                                  'a@example.com', 300, '')
+        # 3 batches for foo.example.com, 1 for bar.example.com
+        self.assertEqual(4, dns.add_records.call_count)
+        self.assertEqual(4, job.requests)
+        self.assertEqual(251, len(job.succeeded()))
+        self.assertEqual([('www.example.org', 'no matching domain')],
+                         [(r['name'], e) for r, e in job.failed()])
+    
+    def test_import_records_limits(self):
+        lib = LibDNS()
+        dom = MagicMock(id='1')
+        dom.name = 'example.com'
+        lib.get_domain_trie = MagicMock(return_value=DomainTrie([dom.name]))
+        lib.get_domain_by_name = lambda n: dom
+        records = [{'name': 'r%d.example.com' % i, 'type': 'A',
+                    'data': '1.2.3.4'} for i in range(2)]
+        dns = MagicMock()
+        dns.get_absolute_limits.return_value = {'records per domain': 10}
+        # records already in the domain count against the limit
+        dns.method_get.return_value = (None, {'totalEntries': 9})
+        with patch.dict(lib.context.pyrax, cloud_dns=dns):
+            self.assertRaises(AdmissionError, lib.import_records, records, 1)
+        dns.method_get.assert_called_once_with('/domains/1/records?limit=1')
+        self.assertFalse(dns.add_records.called)
+    
+    def test_import_records_mixed_case(self):
+        lib = LibDNS()
+        domains = {'example.com': MagicMock(emailAddress='a@example.com',
+                                            ttl=300)}
+        domains['example.com'].name = 'example.com'
+        lib.get_domain_trie = MagicMock(return_value=DomainTrie(domains))
+        lib.get_domain_by_name = lambda n: domains.get(n, False)
+        lib.create_domain = MagicMock()
+        # i.e.: '$ORIGIN Example.com.'
+        records = [{'name': n, 'type': 'A', 'data': '1.2.3.4'}
+                   for n in ('www.Example.com', 'WWW.Foo.EXAMPLE.com')]
+        dns = MagicMock()
+        with patch.dict(lib.context.pyrax, cloud_dns=dns):
+            job = lib.import_records(records, 1)
+        lib.create_domain.assert_called_once_with('foo.example.com',
+                                                  'a@example.com', 300, '')
+        self.assertEqual(['www.Example.com'],
+                         [r['name'] for r in job.succeeded()])
+        self.assertEqual([('WWW.Foo.EXAMPLE.com',
+                           "cannot create domain 'foo.example.com'")],
+                         [(r['name'], e) for r, e in job.failed()])
+    
+    def fail_record(self):
+        raise exc.DomainRecordDeletionFailed('failed')
+    
     def test_missing_subdomains(self):
         record = "foo.bar.example.co.uk"
         domain = "bar.example.com"
@@ -52,6 +201,7 @@ class Test(unittest.TestCase):
         self.assertFalse(libdns.is_parent('foo.bar.com', 'foo.bar.com'))
         self.assertFalse(libdns.is_parent('bar.com', 'foo.bar.com'))
         self.assertFalse(libdns.is_parent('yyy.foo.bar.com', 'bar.co.uk'))
+        self.assertTrue(libdns.is_parent('foo.Bar.COM', 'bar.com'))
 
     def test_nearest_domain(self):
         domains = [ "bar.example.co.uk", "example.co.uk", "example.com",
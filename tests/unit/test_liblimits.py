@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+from mock import MagicMock, patch
+from mock import MagicMock, patch
+
+import unittest
+from plugins.liblimits import (AdmissionError,  # @UnresolvedImport
+                                          LibLimits)
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.lib = LibLimits()
+        self.lib.cache.clear('limits')
+        self.lib.r = MagicMock()
+        self.lib._compute_limits = MagicMock(return_value={
+                    'instances': (10, 8), 'ram': (65536, 1024),
+                    'cores': (-1, 4)})
+    
+    def test_admit(self):
+        self.lib.admit('compute', instances=2, ram=2048, cores=100)
+        try:
+            self.lib.admit('compute', instances=5, ram=2048)
+            self.fail('admitted')
+        except AdmissionError as e:
+            self.assertIn('instances: 5 needed, 2 left', str(e))
+        # fresh limits for every check
+        self.assertEqual(2, self.lib._compute_limits.call_count)
+    
+    def test_admit_unavailable(self):
+        self.lib._dns_limits = MagicMock(side_effect=Exception('503'))
+        self.lib.admit('dns', domains=1000)
+    
+    def test_get_limits_cached(self):
+        self.lib.get_limits('compute')
+        self.lib.get_limits('compute')
+        self.assertEqual(1, self.lib._compute_limits.call_count)
+        self.lib.get_limits('compute', refresh=True)
+        self.assertEqual(2, self.lib._compute_limits.call_count)
+    
+    def test_pool_size(self):
+        limiter = MagicMock()
+        limiter.headroom.side_effect = [None, 3, 3]
+        with patch('plugins.liblimits.RateLimiter.Instance',
+                   return_value=limiter):
+            self.assertEqual(8, self.lib.pool_size('dns', 'PUT', '/domains',
+                                                   8))
+            self.assertEqual(3, self.lib.pool_size('dns', 'PUT', '/domains',
+                                                   8))
+            self.assertEqual(2, self.lib.pool_size('dns', 'PUT', '/domains',
+                                                   2))
+        self.assertEqual('rax:dns', limiter.headroom.call_args[0][0][1])
+    
+    def test_print_pt_limits(self):
+        self.lib._dns_limits = MagicMock(side_effect=Exception('503'))
+        self.lib.print_pt_limits(('compute', 'dns'))
+        self.assertIn('65536', self.lib.r.call_args_list[-1][0][1])
+        self.assertIn('cannot fetch dns limits',
+                      self.lib.r.call_args_list[0][0][1])
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+from mock import MagicMock, patch
+from mock import MagicMock, patch
+
+import unittest
+from libpyraxshell import (Libpyraxshell,  # @UnresolvedImport
+                                      LibpyraxshellError, to_dict)
+
+
+class Resource(object):
+    
+    def __init__(self, info):
+        self._info = info
+        self.manager = MagicMock()
+        for k, v in info.items():
+            setattr(self, k, v)
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.lib = Libpyraxshell()
+        for name in ('auth', 'databases', 'dns', 'loadbalancers', 'servers'):
+            setattr(self.lib, name, MagicMock())
+    
+    def test_to_dict(self):
+        r = Resource({'id': 'srv-1', 'name': 'web'})
+        d = to_dict(r)
+        self.assertEqual({'id': 'srv-1', 'name': 'web'}, d)
+        d['name'] = 'db'
+        self.assertEqual('web', r._info['name'])
+        # objects without '_info', i.e.: load-balancer nodes
+        node = Resource({})
+        del node._info, node.manager
+        node.__dict__.update({'id': 1, 'port': 80, 'parent': object()})
+        self.assertEqual({'id': 1, 'port': 80}, to_dict(node))
+        self.assertEqual(None, to_dict(None))
+    
+    def test_list_servers(self):
+        self.lib.servers.list_cloudservers.return_value = [
+                            Resource({'id': 'srv-%d' % i}) for i in range(3)]
+        self.assertEqual([{'id': 'srv-0'}, {'id': 'srv-1'}, {'id': 'srv-2'}],
+                         self.lib.list_servers())
+        self.lib.servers.get_by_id.side_effect = IndexError
+        self.assertEqual(None, self.lib.get_server('srv-9'))
+    
+    def test_create_server(self):
+        server = Resource({'id': 'srv-1', 'name': 'web'})
+        server.adminPass = 'secret'
+        self.lib.servers.create_server.return_value = server
+        self.assertEqual({'id': 'srv-1', 'name': 'web', 'adminPass': 'secret'},
+                         self.lib.create_server('web', '2', 'img-0'))
+    
+    def test_delete_records(self):
+        rec = Resource({'id': 'A-1', 'type': 'A'})
+        job = MagicMock(action='delete', target='example.com', requests=1)
+        job.succeeded.return_value = [rec]
+        job.failed.return_value = [({'name': 'x'}, 'not done')]
+        self.lib.dns.bulk_records.return_value = job
+        out = self.lib.delete_records('example.com')
+        self.assertEqual([{'id': 'A-1', 'type': 'A'}], out['succeeded'])
+        self.assertEqual([({'name': 'x'}, 'not done')], out['failed'])
+        # SOA and NS records are kept when no filter is given
+        self.assertEqual(('SOA', 'NS'),
+                         self.lib.dns.find_records.call_args[0][4])
+        self.lib.dns.get_domain_by_name.return_value = False
+        self.assertRaises(LibpyraxshellError, self.lib.delete_records,
+                          'example.org')
+    
+    def test_identity(self):
+        with patch.dict(self.lib.context.pyrax, identity=None):
+            self.assertFalse(self.lib.is_authenticated())
+        identity = MagicMock(authenticated=True, username='u', tenant_id='t',
+                             tenant_name='n', region='LON', regions=['LON'])
+        with patch.dict(self.lib.context.pyrax, identity=identity):
+            self.assertEqual('t', self.lib.identity()['tenant_id'])
+        self.lib.auth.switch_account.return_value = False
+        self.assertRaises(LibpyraxshellError, self.lib.switch_account, 'x')
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
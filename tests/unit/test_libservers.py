@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+from mock import MagicMock
+
+import threading
+import time
+import unittest
+from plugins.libservers import LibServers  # @UnresolvedImport
+from plugins.libservers import ServerBuildJob  # @UnresolvedImport
+
+
+class TestLibServers(unittest.TestCase):
+
+
+    def setUp(self):
+        self.libservers = LibServers()
+        self.libservers.r = MagicMock()
+        flavor = MagicMock(id='2')
+        flavor.name = '512MB Standard Instance'
+        image = MagicMock(id='img-0')
+        image.name = 'Debian 7'
+        self.libservers.list_cloudservers_flavors = MagicMock(
+                                                    return_value=[flavor])
+        self.libservers.list_cloudservers_images = MagicMock(
+                                                    return_value=[image])
+        servers = []
+        for i in range(10):
+            s = MagicMock(id='srv-%d' % i, status='ACTIVE', progress=100,
+                          flavor={'id':'2'}, image={'id':'img-0'})
+            s.name = 'srv-%d' % i
+            servers.append(s)
+        self.libservers.list_cloudservers = MagicMock(return_value=servers)
+
+    def test_print_pt_cloudservers_fetches_catalogs_once(self):
+        self.libservers.print_pt_cloudservers()
+        self.assertEqual(1, self.libservers.list_cloudservers_flavors.call_count)
+        self.assertEqual(1, self.libservers.list_cloudservers_images.call_count)
+        self.assertIn('512MB Standard Instance',
+                      self.libservers.r.call_args[0][1])
+    
+    def test_resolve_name(self):
+        flavors = self.libservers.get_cloudserver_flavors_map()
+        self.assertEqual('512MB Standard Instance',
+                         self.libservers.resolve_name({'id':'2'}, flavors))
+        self.assertEqual('-', self.libservers.resolve_name({'id':'9'}, flavors))
+        self.assertEqual('-', self.libservers.resolve_name('', flavors))
+    
+    def test_create_servers(self):
+        running = []
+        peak = [0]
+        lock = threading.Lock()
+        
+        def create(name, flavor_id, image_id, notify):
+            with lock:
+                running.append(name)
+                peak[0] = max(peak[0], len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(name)
+            if name == 'web-3':
+                raise Exception('over limit')
+            return MagicMock(id='id-%s' % name, adminPass='secret')
+        
+        self.libservers.create_server = create
+        names = ['web-%d' % n for n in range(1, 9)]
+        job = self.libservers.create_servers(names, '2', 'img-0', 3)
+        deadline = time.time() + 5
+        while (job.counts().get('QUEUED') and time.time() < deadline):
+            time.sleep(0.01)
+        self.assertTrue(peak[0] <= 3)
+        self.assertEqual({'BUILD': 7, 'FAILED': 1}, job.counts())
+        for name in names:
+            if name != 'web-3':
+                server = MagicMock(status='ACTIVE', progress=100,
+                                   networks={'public': ['1.2.3.4']})
+                job.notify(name)(server, None, ('ACTIVE', 100))
+        self.assertTrue(job.done())
+        self.assertEqual(1, self.libservers.r.call_count)
+        self.assertIn('ACTIVE:7', self.libservers.r.call_args[0][1])
+    
+    def test_server_build_job_reported_once(self):
+        self.libservers.print_pt_server_build_job = MagicMock()
+        job = ServerBuildJob(['web-1', 'web-2'], self.libservers)
+        for s in job.servers.values():
+            s['status'] = 'ACTIVE'
+        threads = [threading.Thread(target=job._progress) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(1, self.libservers.print_pt_server_build_job.call_count)
+        # empty batch
+        job = ServerBuildJob([], self.libservers)
+        job._progress()
+        self.assertEqual(2, self.libservers.print_pt_server_build_job.call_count)
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+from mock import MagicMock, patch
+import threading
+import time
+import unittest
+from msgbox import Mailbox  # @UnresolvedImport
+
+
+class Test(unittest.TestCase):
+
+
+    def test_coalesce(self):
+        mb = Mailbox(10)
+        for i in range(100):
+            mb.put('server a: %d%%' % i, ('servers', 'a'))
+        mb.put('server b: 0%', ('servers', 'b'))
+        mb.put('hello')
+        mb.put('hello')
+        self.assertEqual(4, mb.qsize())
+        self.assertEqual('server a: 99%', mb.get())
+        self.assertEqual('server b: 0%', mb.get())
+        m = mb.metrics()
+        self.assertEqual(103, m['put'])
+        self.assertEqual(99, m['coalesced'])
+        self.assertEqual(2, m['delivered'])
+        self.assertEqual(2, m['depth'])
+    
+    def test_bounded(self):
+        mb = Mailbox(2)
+        for i in range(5):
+            mb.put(i, i)
+        self.assertEqual(3, mb.metrics()['dropped'])
+        self.assertEqual([3, 4], [mb.get(), mb.get()])
+        self.assertEqual(None, mb.get(0))
+    
+    def test_wake_up(self):
+        mb = Mailbox(10)
+        got = []
+        t = threading.Thread(target=lambda: got.append(mb.get(5)))
+        t.start()
+        time.sleep(0.05)
+        started = time.time()
+        mb.put('done', 'job')
+        t.join()
+        self.assertEqual(['done'], got)
+        self.assertTrue(time.time() - started < 1)
+    
+    def test_close(self):
+        mb = Mailbox(10)
+        got = []
+        t = threading.Thread(target=lambda: got.append(mb.get()))
+        t.start()
+        mb.close()
+        t.join(5)
+        self.assertEqual([None], got)
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import mock
+import time
+import unittest
+
+from poller import Poller, status_progress  # @UnresolvedImport
+
+
+class Server(object):
+    def __init__(self, _id, status='BUILD', progress=0):
+        self.id = _id
+        self.status = status
+        self.progress = progress
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.poller = Poller.Instance()  # @UndefinedVariable
+        self.servers = dict((i, Server(i)) for i in range(50))
+        self.lister = mock.Mock(side_effect=lambda: self.servers.values())
+        self.callback = mock.Mock()
+        with mock.patch('threading.Thread.start'):
+            for i in self.servers:
+                self.poller.watch('servers', i, self.callback, self.lister,
+                                  state=status_progress)
+        self.now = time.time() + self.poller.min_interval
+
+    def tearDown(self):
+        for w in self.poller.watching():
+            self.poller.unwatch(w.kind, w.id)
+
+    def test_single_listing(self):
+        self.poller.poll(self.now)
+        self.assertEqual(1, self.lister.call_count)
+        self.assertEqual(50, self.callback.call_count)
+        self.callback.assert_any_call(self.servers[0], None, ('BUILD', 0))
+
+    def test_backoff_and_done(self):
+        self.poller.poll(self.now)
+        # nothing changed: interval doubles
+        self.poller.poll(self.now + self.poller.min_interval)
+        self.assertEqual(50, self.callback.call_count)
+        w = self.poller.watching()[0]
+        self.assertEqual(self.poller.min_interval * self.poller.backoff,
+                         w.interval)
+        # not due yet: no listing
+        calls = self.lister.call_count
+        self.poller.poll(self.now + self.poller.min_interval + 1)
+        self.assertEqual(calls, self.lister.call_count)
+        self.servers[7].status = 'ACTIVE'
+        self.servers[7].progress = 100
+        self.poller.poll(self.now + self.poller.max_interval * 2)
+        self.callback.assert_called_with(self.servers[7], ('BUILD', 0),
+                                         ('ACTIVE', 100))
+        self.assertEqual(49, len(self.poller.watching('servers')))
+
+    def test_gone(self):
+        self.servers.pop(3)
+        for i in range(self.poller.max_misses):
+            self.poller.poll(self.now + self.poller.max_interval * 2 * i)
+        self.callback.assert_any_call(None, None, None)
+        self.assertEqual(49, len(self.poller.watching('servers')))
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
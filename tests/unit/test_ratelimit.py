@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+from mock import MagicMock, patch
+from mock import MagicMock
+
+import pyrax.exceptions as exc
+import time
+import unittest
+from ratelimit import (RateLimiter, TokenBucket,  # @UnresolvedImport
+                                  retry_after)
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.limiter = RateLimiter.Instance()  # @UndefinedVariable
+        self.limiter.jitter = 0
+        self.sleeps = []
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        if seconds < 1:
+            time.sleep(seconds)
+    
+    def test_bucket(self):
+        b = TokenBucket(2, 2)
+        self.assertEqual(0, b.take(b.updated))
+        self.assertEqual(0, b.take(b.updated))
+        self.assertAlmostEqual(0.5, b.take(b.updated))
+        self.assertEqual(0, b.take(b.updated + 0.5))
+        b.block(10)
+        self.assertTrue(b.take() > 9)
+    
+    def test_seed_acquire(self):
+        key = ('tenant', 'rax:dns')
+        self.limiter.seed(key, [{'regex': '^/domains', 'limit': [
+                    {'verb': 'GET', 'value': 600, 'unit': 'MINUTE',
+                     'remaining': 1}]}])
+        self.assertTrue(self.limiter.is_seeded(key))
+        self.limiter.acquire(key, 'GET', '/domains', self.sleep)
+        self.assertEqual([], self.sleeps)
+        # bucket is empty, 10 tokens per second
+        self.limiter.acquire(key, 'GET', '/domains/1', self.sleep)
+        self.assertEqual(1, len(self.sleeps))
+        self.assertTrue(0.09 < self.sleeps[0] <= 0.1)
+        # other verbs are not limited
+        self.limiter.acquire(key, 'POST', '/domains', self.sleep)
+        self.assertEqual(1, len(self.sleeps))
+    
+    def test_call_retry_after(self):
+        key = ('tenant', 'compute')
+        self.limiter.seed(key, [])
+        e = exc.OverLimit(413)
+        e.retry_after = '7'
+        fn = MagicMock(side_effect=[e, 'ok'])
+        self.assertEqual('ok', self.limiter.call(key, 'GET', '/servers', fn,
+                                                 self.sleep))
+        self.assertEqual([7], self.sleeps)
+    
+    def test_call_backoff(self):
+        key = ('tenant', 'compute')
+        self.limiter.seed(key, [])
+        self.limiter.max_retries = 2
+        fn = MagicMock(side_effect=exc.ClientException(503))
+        self.assertRaises(exc.ClientException, self.limiter.call, key, 'GET',
+                          '/servers', fn, self.sleep)
+        self.assertEqual([1, 2], self.sleeps)
+        self.assertEqual(3, fn.call_count)
+        # other errors are not retried
+        fn = MagicMock(side_effect=exc.NotFound(404))
+        self.assertRaises(exc.NotFound, self.limiter.call, key, 'GET',
+                          '/servers', fn, self.sleep)
+        self.assertEqual(1, fn.call_count)
+    
+    def test_headroom(self):
+        key = ('tenant', 'rax:load-balancer')
+        self.assertEqual(None, self.limiter.headroom(key, 'POST', '/x'))
+        self.limiter.seed(key, [{'regex': '^/loadbalancers', 'limit': [
+                    {'verb': 'POST', 'value': 60, 'unit': 'MINUTE',
+                     'remaining': 3}]}])
+        self.assertEqual(3, self.limiter.headroom(key, 'POST',
+                                                  '/loadbalancers'))
+        self.assertEqual(None, self.limiter.headroom(key, 'GET',
+                                                     '/loadbalancers'))
+    
+    def test_retry_after(self):
+        self.assertEqual(5, retry_after('5'))
+        self.assertEqual(10, retry_after('Thu, 01 Jan 1970 00:00:10 GMT', 0))
+        self.assertEqual(None, retry_after('soon'))
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import datetime
+import threading
+import time
+import unittest
+
+from tokenrefresh import TokenRefresh  # @UnresolvedImport
+
+
+class Identity(object):
+    
+    password = 'apikey'
+    calls = 0
+    
+    def __init__(self, expires_in):
+        self.token = 'token-0'
+        self.expires = (datetime.datetime.now() +
+                        datetime.timedelta(seconds=expires_in))
+    
+    def authenticate(self):
+        time.sleep(0.2)
+        self.calls += 1
+        self.token = 'token-%d' % self.calls
+        self.expires = datetime.datetime.now() + datetime.timedelta(hours=24)
+
+
+class Test(unittest.TestCase):
+
+
+    def setUp(self):
+        self.refresh = TokenRefresh.Instance()  # @UndefinedVariable
+        self.refresh.refreshed = 0
+
+    def tearDown(self):
+        self.refresh.stop()
+
+    def test_shared_refresh(self):
+        identity = Identity(7200)
+        self.refresh.install(identity)
+        threads = [threading.Thread(target=identity.authenticate)
+                   for _ in range(5)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        self.assertEqual(1, identity.calls)
+        self.assertEqual('token-1', identity.token)
+
+    def test_next_refresh(self):
+        identity = Identity(7200)
+        self.refresh.install(identity)
+        self.assertTrue(7200 - self.refresh.ahead - 5 <
+                        self.refresh.next_refresh() <=
+                        7200 - self.refresh.ahead)
+        identity.password = ''
+        self.assertEqual(None, self.refresh.next_refresh())
+
+    def test_refresh_ahead(self):
+        identity = Identity(self.refresh.ahead - 1)
+        self.refresh.install(identity)
+        deadline = time.time() + 5
+        while identity.calls == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(1, identity.calls)
+
+    def test_wake_up(self):
+        refresh = TokenRefresh.New()  # @UndefinedVariable
+        refresh.rearm()
+        refresh.stop()
+        start = time.time()
+        refresh.wait(5)
+        # a wake-up is not lost to a wait, it lasts until 'rearm'
+        refresh.wait(5)
+        self.assertTrue(time.time() - start < 1)
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import threading
+import time
+import unittest
+
+from workerpool import WorkerPool  # @UnresolvedImport
+
+
+class Test(unittest.TestCase):
+
+
+    def test_bounded(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+        
+        def task(n):
+            with lock:
+                running.append(n)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.remove(n)
+            return n * n
+        
+        pool = WorkerPool(4)
+        tasks = pool.map(task, range(20))
+        pool.shutdown()
+        self.assertEqual([n * n for n in range(20)], [t.get() for t in tasks])
+        self.assertTrue(max(peak) <= 4)
+
+    def test_exception(self):
+        pool = WorkerPool(2)
+        task = pool.submit(int, 'x')
+        pool.shutdown()
+        self.assertTrue(task.done())
+        self.assertRaises(ValueError, task.get)
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
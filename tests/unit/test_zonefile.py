@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of pyraxshell.
+#
+# pyraxshell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyraxshell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyraxshell. If not, see <http://www.gnu.org/licenses/>.
+
+from mock import MagicMock, patch
+import os
+import shutil
+import tempfile
+import unittest
+from zonefile import parse_csv, parse_ttl, parse_zone  # @UnresolvedImport
+from zonefile import read_records  # @UnresolvedImport
+
+
+ZONE = '''$ORIGIN example.com.
+$TTL 3600
+@   IN SOA ns1.example.com. admin.example.com. (
+        2013010101 ; serial
+        3600 )
+@       IN NS dns1.stabletransit.com.
+        IN MX 10 mail
+www     300 IN A 1.2.3.4
+        IN A 1.2.3.5
+txt     IN TXT "v=spf1; -all"
+foo.bar IN CNAME www
+sub     IN NS ns1.example.net.
+'''
+
+
+class Test(unittest.TestCase):
+
+
+    def test_parse_zone(self):
+        records = parse_zone(ZONE, 'ignored.org')
+        self.assertEqual([
+            {'name': 'example.com', 'type': 'MX', 'priority': 10,
+             'data': 'mail.example.com', 'ttl': 3600},
+            {'name': 'www.example.com', 'type': 'A', 'data': '1.2.3.4',
+             'ttl': 300},
+            {'name': 'www.example.com', 'type': 'A', 'data': '1.2.3.5',
+             'ttl': 3600},
+            {'name': 'txt.example.com', 'type': 'TXT', 'data': 'v=spf1; -all',
+             'ttl': 3600},
+            {'name': 'foo.bar.example.com', 'type': 'CNAME',
+             'data': 'www.example.com', 'ttl': 3600},
+            {'name': 'sub.example.com', 'type': 'NS',
+             'data': 'ns1.example.net', 'ttl': 3600},
+            ], records)
+    
+    def test_parse_zone_txt(self):
+        records = parse_zone('@ 1h TXT "v=spf1 a; b" "second" ; comment\n'
+                             'spf 2d IN SPF "v=spf1 \\"q\\" -all"\n',
+                             'example.com')
+        self.assertEqual([
+            {'name': 'example.com', 'type': 'TXT',
+             'data': '"v=spf1 a; b" "second"', 'ttl': 3600},
+            {'name': 'spf.example.com', 'type': 'SPF',
+             'data': 'v=spf1 "q" -all', 'ttl': 172800},
+            ], records)
+        self.assertRaises(ValueError, parse_zone, '@ TXT "open\n', 'x.com')
+    
+    def test_parse_ttl(self):
+        self.assertEqual(3600, parse_ttl('3600'))
+        self.assertEqual(5400, parse_ttl('1H30m'))
+        self.assertEqual(1209600, parse_ttl('2w'))
+        self.assertRaises(ValueError, parse_ttl, '1y')
+    
+    def test_read_records_origin(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            for name in ('shop.dbank.com.zone', 'db.shop.dbank.com'):
+                path = os.path.join(tmp, name)
+                with open(path, 'w') as f:
+                    f.write('www A 1.2.3.4\n')
+                self.assertEqual('www.shop.dbank.com',
+                                 read_records(path)[0]['name'])
+        finally:
+            shutil.rmtree(tmp)
+    
+    def test_parse_csv(self):
+        lines = ['name,type,data,ttl,priority',
+                 'www,A,1.2.3.4,300',
+                 'example.com.,MX,mail.example.com,,10']
+        self.assertEqual([
+            {'name': 'www.example.com', 'type': 'A', 'data': '1.2.3.4',
+             'ttl': 300},
+            {'name': 'example.com', 'type': 'MX', 'data': 'mail.example.com',
+             'ttl': 900, 'priority': 10},
+            ], parse_csv(lines, 'example.com', 900))
+
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()